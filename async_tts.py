@@ -0,0 +1,367 @@
+"""
+Jalur asyncio untuk TTS, memakai client async SDK (`client.aio`).
+
+Alur request/retry/rotasi key sama dengan `main.make_tts_request_with_retry`,
+tetapi menunggu jaringan, backoff dan kuota dilakukan dengan `await`, sehingga
+satu event loop bisa menjalankan puluhan request chunk sekaligus tanpa satu
+thread per request. Konfigurasi global (API key, ledger, cache audio, pool
+client) tetap diambil dari modul `main`.
+
+Penggunaan:
+
+    main.load_api_keys(ledger_path='key-ledger.sqlite3')
+    asyncio.run(run_and_close(generate_audio_for_chunks_async(...)))
+"""
+import asyncio
+import time
+import logging
+
+import main
+from audio_cache import cache_key
+from rate_limiter import KeySlots, RateLimiterPool, estimate_tokens
+from retry_policy import RetryPolicy, RetryState, QUOTA, FATAL, classify_error
+from hedging import HedgePolicy, HEDGE_POLL_INTERVAL
+from metrics import CACHE_HITS, SLEEP_SECONDS, STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+async def make_tts_request_async(
+    prompt: str,
+    voice: str | dict[str, str],
+    base_filename: str,
+    chunk_index: int,
+    max_retries: int,
+    base_delay: int,
+    key_slots: KeySlots,
+    temperature: float = 0.7,
+    preferred_key_index: int = 0,
+    audio_sink=None,
+    retry_policy: RetryPolicy | None = None,
+    hedge: HedgePolicy | None = None
+):
+    """
+    Versi async dari `main.make_tts_request_with_retry`. Key selalu dipilih
+    lewat `key_slots` (slot in-flight dan, jika `RateLimiterPool`, kuota).
+    Jika `hedge` diberikan, chunk yang lambat dikirim juga ke key lain yang
+    menganggur (lihat hedging.py). Mengembalikan True jika chunk dilayani
+    dari cache audio.
+    """
+    entry_key = None
+    if main.AUDIO_CACHE is not None:
+        entry_key = cache_key(prompt, main.chunk_voice(prompt, voice), temperature, main.TTS_MODEL)
+        cached = await asyncio.to_thread(main.AUDIO_CACHE.get, entry_key)
+        if cached is not None:
+            logger.info(f"♻️ Chunk {chunk_index} diambil dari cache audio.")
+            main.METRICS.inc(CACHE_HITS)
+            await _emit_audio(base_filename, cached, chunk_index, audio_sink)
+            return True
+
+    if not main.API_KEYS_LIST:
+        raise ValueError('Tidak ada API Key yang tersedia untuk digunakan.')
+
+    policy = retry_policy or RetryPolicy(max_attempts=max_retries, base_delay=base_delay)
+    started = time.monotonic()
+    if hedge is None:
+        data = await _synthesize_with_retry(prompt, voice, temperature, key_slots, preferred_key_index, policy)
+    else:
+        progress = {}
+        primary = _synthesize_with_retry(prompt, voice, temperature, key_slots, preferred_key_index, policy, hedge, progress)
+        data = await _synthesize_hedged(primary, progress, prompt, voice, temperature, chunk_index, key_slots, hedge)
+    main.METRICS.observe(STAGE_SECONDS, time.monotonic() - started, stage='synthesize')
+
+    if entry_key is not None:
+        await asyncio.to_thread(main.AUDIO_CACHE.put, entry_key, data)
+
+    await _emit_audio(base_filename, data, chunk_index, audio_sink)
+    return False
+
+
+async def _emit_audio(base_filename: str, pcm_data: bytes, chunk_index: int, audio_sink=None):
+    """
+    `main._emit_audio` di thread lain: tanpa `PostProcessor`, sink default
+    menulis file WAV chunk, dan penulisan file tidak boleh menahan event loop.
+    """
+    await asyncio.to_thread(main._emit_audio, base_filename, pcm_data, chunk_index, audio_sink)
+
+
+async def _call_api_async(
+    api_key: str,
+    key_index: int,
+    prompt: str,
+    voice: str | dict[str, str],
+    temperature: float,
+    tokens: int,
+    hedge: HedgePolicy | None = None
+) -> bytes:
+    """Satu request ke API dengan key tertentu, tanpa retry. Mengembalikan PCM."""
+    if main.KEY_LEDGER is not None:
+        # Request tetap dihitung server meskipun nanti gagal
+        main.KEY_LEDGER.record_usage(api_key, tokens)
+    if main.KEY_LEASES is not None:
+        main.KEY_LEASES.mark_used(key_index)
+
+    main.record_request_sent(prompt, tokens)
+    client = main.CLIENT_POOL.get(api_key)
+    started = time.monotonic()
+    response = await client.aio.models.generate_content(
+        model=main.TTS_MODEL,
+        contents=prompt,
+        config=main.build_tts_config(main.chunk_voice(prompt, voice), temperature)
+    )
+
+    data = main.extract_audio_data(response)
+    latency = time.monotonic() - started
+    main.record_request_success(key_index, latency, data)
+    if hedge is not None:
+        hedge.observe(latency)
+    return data
+
+
+async def _synthesize_with_retry(
+    prompt: str,
+    voice: str | dict[str, str],
+    temperature: float,
+    key_slots: KeySlots,
+    preferred_key_index: int,
+    policy: RetryPolicy,
+    hedge: HedgePolicy | None = None,
+    progress: dict | None = None
+) -> bytes:
+    """
+    Alur retry/rotasi key untuk satu chunk (lihat `retry_policy.RetryState`).
+    Mengembalikan PCM. Jika `progress` diberikan, `progress['sent_at']` berisi
+    waktu (monotonic) request yang sedang berjalan dikirim, atau None.
+    """
+    progress = {} if progress is None else progress
+    state = RetryState(policy, len(main.API_KEYS_LIST), rate_limited=isinstance(key_slots, RateLimiterPool))
+    key_index = preferred_key_index % len(main.API_KEYS_LIST)
+    tokens = estimate_tokens(prompt)
+    attempt = 0
+
+    while True:
+        attempt += 1
+        # Tunggu slot kosong (dan kuota) tanpa memblokir event loop
+        waiting_since = time.monotonic()
+        key_index = await key_slots.acquire_async(key_index, tokens=tokens, exclude=state.excluded)
+        main.METRICS.inc(SLEEP_SECONDS, time.monotonic() - waiting_since, reason='slot')
+        api_key = main.API_KEYS_LIST[key_index]
+        slot_index = key_index
+
+        try:
+            if not api_key:
+                logger.error("API Key saat ini tidak valid atau kosong.")
+                state.excluded.add(key_index)
+                if len(state.excluded) >= len(main.API_KEYS_LIST):
+                    raise ValueError('Semua API Key tidak valid.')
+                key_index = main._next_key(key_index, key_slots, state.excluded)
+                continue
+
+            logger.info(f'Mencoba request async ke Gemini dengan API Key index: {key_index} (Percobaan {attempt})')
+            progress['sent_at'] = time.monotonic()
+            return await _call_api_async(api_key, key_index, prompt, voice, temperature, tokens, hedge)
+
+        except Exception as e:
+            progress['sent_at'] = None
+            kind, rotate, delay = main._handle_request_error(e, state, api_key, key_index, key_slots)
+            if rotate:
+                key_index = main._next_key(key_index, key_slots, state.excluded)
+                continue
+            # Slot dilepas dulu agar key ini bisa dipakai chunk lain selama menunggu
+            key_slots.release(slot_index)
+            slot_index = None
+            await asyncio.sleep(delay)
+
+        finally:
+            if slot_index is not None:
+                key_slots.release(slot_index)
+
+
+async def _hedge_attempt(
+    key_index: int,
+    prompt: str,
+    voice: str | dict[str, str],
+    temperature: float,
+    key_slots: KeySlots,
+    hedge: HedgePolicy
+) -> bytes:
+    """Satu request cadangan pada key yang slotnya sudah diambil; tidak di-retry."""
+    api_key = main.API_KEYS_LIST[key_index]
+    try:
+        return await _call_api_async(api_key, key_index, prompt, voice, temperature, estimate_tokens(prompt), hedge)
+    except Exception as e:
+        kind = classify_error(e)
+        if kind == QUOTA:
+            main._record_quota_exhausted(e, api_key, key_index, key_slots)
+        elif kind != FATAL and main.KEY_HEALTH is not None:
+            main.KEY_HEALTH.record_failure(key_index, kind)
+        logger.warning(f"⚠️ Hedge pada API Key index {key_index} gagal ({kind}): {e}")
+        raise
+    finally:
+        key_slots.release(key_index)
+
+
+async def _synthesize_hedged(
+    primary_coroutine,
+    progress: dict,
+    prompt: str,
+    voice: str | dict[str, str],
+    temperature: float,
+    chunk_index: int,
+    key_slots: KeySlots,
+    hedge: HedgePolicy
+) -> bytes:
+    """
+    Menjalankan request utama; jika request yang sedang berjalan belum
+    selesai setelah `hedge.hedge_delay()` detik sejak dikirim, satu request
+    cadangan dikirim ke key yang menganggur. Hasil pertama yang berhasil
+    dipakai, task lainnya dibatalkan.
+    """
+    primary = asyncio.create_task(primary_coroutine)
+    pending = {primary}
+    try:
+        while not primary.done():
+            delay = hedge.hedge_delay()
+            sent_at = progress.get('sent_at')
+            if delay is None or sent_at is None or time.monotonic() < sent_at + delay:
+                timeout = HEDGE_POLL_INTERVAL if delay is None or sent_at is None else sent_at + delay - time.monotonic()
+                await asyncio.wait(pending, timeout=max(timeout, 0.0))
+                continue
+
+            # Jatah diambil sebelum slot: slot dari pool langsung dicatat ke kuota RPM/TPM/RPD key
+            if not hedge.consume():
+                break
+            key_index = key_slots.try_acquire_idle(estimate_tokens(prompt))
+            if key_index is None:
+                # Belum ada key yang menganggur: cek lagi nanti, chunk lain akan selesai
+                hedge.refund()
+                await asyncio.wait(pending, timeout=HEDGE_POLL_INTERVAL)
+                continue
+
+            logger.info(f"🪂 Chunk {chunk_index} belum selesai setelah {delay:.1f} detik, hedge dikirim ke API Key index {key_index}.")
+            backup = asyncio.create_task(_hedge_attempt(key_index, prompt, voice, temperature, key_slots, hedge))
+            pending.add(backup)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is backup:
+                            hedge.record_win()
+                            logger.info(f"🪂 Chunk {chunk_index}: hedge lebih cepat, request utama dibatalkan.")
+                        return task.result()
+            # Keduanya gagal: error dari request utama yang dilaporkan
+            return primary.result()
+        return await primary
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def generate_audio_for_chunks_async(
+    full_prompt: str,
+    voice: str | dict[str, str],
+    base_filename: str,
+    max_chars_per_chunk: int,
+    max_retries: int,
+    base_delay: int,
+    temperature: float = 0.7,
+    max_in_flight_per_key: int = 1,
+    rate_limit: bool = False,
+    rate_limit_max_wait: float | None = None,
+    resume: bool = False,
+    output_filename: str | None = None,
+    script_mode: bool = False,
+    max_tokens_per_chunk: int | None = None,
+    key_slots: KeySlots | None = None,
+    retry_policy: RetryPolicy | None = None,
+    hedge: HedgePolicy | None = None,
+    normalize_dbfs: float | None = None,
+    smooth_joins: bool = False
+) -> dict[int, float]:
+    """
+    Versi async dari `main.generate_audio_for_chunks`: semua chunk dijalankan
+    sebagai task di event loop yang sama, dibatasi slot per key (selalu
+    konkuren). `key_slots` bisa dibagi antar beberapa job yang berjalan
+    bersamaan di satu event loop agar kuota key dihitung bersama.
+
+    Jika `hedge` diberikan, budget hedge diisi dari sisa kuota harian
+    dikurangi perkiraan request job ini, sehingga hedging hanya memakai
+    kuota yang tidak dibutuhkan.
+
+    Seperti versi sinkronnya, `resume` bersama `output_filename` menimbulkan `ValueError`.
+
+    Mengembalikan jeda [JEDA] per chunk, untuk `main.combine_audio_chunks`.
+    """
+    if resume and output_filename:
+        raise ValueError('resume tidak bisa dipakai bersama output_filename (mode pipeline).')
+    total_chunks, pending, pauses, on_chunk_done = main.plan_chunks(
+        full_prompt, voice, base_filename, max_chars_per_chunk, temperature, resume, script_mode, max_tokens_per_chunk
+    )
+    if key_slots is None:
+        key_slots = main.create_key_slots(max_in_flight_per_key, rate_limit, rate_limit_max_wait)
+
+    retry_policy = retry_policy or RetryPolicy(max_attempts=max_retries, base_delay=base_delay)
+    if hedge is not None:
+        main.set_hedge_budget(hedge, key_slots.num_keys, main.predict_request_count([chunk for _, chunk in pending], voice, temperature))
+    # Pemrosesan dan penulisan PCM di thread worker, sehingga event loop tidak tertahan I/O file
+    writer = main.create_post_processor(output_filename, pauses, normalize_dbfs, smooth_joins) if output_filename else None
+    audio_sink = writer.submit if writer else main.with_pauses(None, pauses, base_filename)
+    num_keys = key_slots.num_keys
+
+    logger.info(f"Mode async: {len(pending)} chunk, {num_keys} API Key.")
+
+    async def run_chunk(chunk_index: int, chunk: str):
+        try:
+            await make_tts_request_async(
+                prompt=chunk,
+                voice=voice,
+                base_filename=base_filename,
+                chunk_index=chunk_index,
+                max_retries=max_retries,
+                base_delay=base_delay,
+                key_slots=key_slots,
+                temperature=temperature,
+                # Sebarkan chunk ke key yang berbeda sejak awal
+                preferred_key_index=chunk_index % num_keys,
+                audio_sink=audio_sink,
+                retry_policy=retry_policy,
+                hedge=hedge
+            )
+        except Exception as e:
+            on_chunk_done(chunk_index, False)
+            logger.error(f"❌ Chunk {chunk_index} gagal: {e}")
+            raise
+        on_chunk_done(chunk_index, True)
+        logger.info(f"--- Chunk {chunk_index} dari {total_chunks} selesai ---")
+
+    try:
+        results = await asyncio.gather(
+            *(run_chunk(chunk_index, chunk) for chunk_index, chunk in pending),
+            return_exceptions=True
+        )
+    finally:
+        retry_policy.report()
+        if hedge is not None:
+            hedge.report()
+        if main.KEY_HEALTH is not None:
+            main.KEY_HEALTH.report()
+        if writer is not None:
+            writer.close()
+            logger.info(f"✅ Audio ditulis langsung ke: {output_filename}")
+
+    # Error dilempar ulang setelah semua chunk tercatat, sama seperti mode konkuren
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    return pauses
+
+
+async def run_and_close(coroutine):
+    """
+    Menjalankan `coroutine` lalu menutup koneksi async di pool client.
+    Koneksi async terikat ke event loop, jadi harus ditutup sebelum loop selesai.
+    """
+    try:
+        return await coroutine
+    finally:
+        await main.CLIENT_POOL.aclose()
@@ -0,0 +1,106 @@
+import hashlib
+import json
+import os
+import threading
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = '.tts-cache'
+DEFAULT_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+
+def cache_key(text: str, voice: str, temperature: float, model: str) -> str:
+    """Hash SHA-256 dari semua parameter yang menentukan hasil audio sebuah chunk."""
+    payload = json.dumps(
+        {'text': text, 'voice': voice, 'temperature': temperature, 'model': model},
+        sort_keys=True,
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class AudioCache:
+    """
+    Cache PCM mentah di disk, dialamatkan berdasarkan isi (content-addressed).
+
+    Chunk yang teks, suara, temperature dan modelnya sama persis tidak perlu
+    dikirim ulang ke API. Ukuran total dibatasi `max_bytes`; jika terlampaui,
+    entri yang paling lama tidak dipakai (LRU) dihapus lebih dulu.
+    """
+
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # key -> ukuran file, urut dari yang paling lama tidak dipakai
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f'{key}.pcm')
+
+    def _load_index(self):
+        files = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith('.pcm'):
+                    path = os.path.join(root, name)
+                    stat = os.stat(path)
+                    files.append((stat.st_mtime, name[:-len('.pcm')], stat.st_size))
+        for _, key, size in sorted(files):
+            self._entries[key] = size
+            self._total_bytes += size
+        logger.info(f"Cache audio: {len(self._entries)} entri ({self._total_bytes / 1024 / 1024:.1f} MB) di '{self.directory}'.")
+
+    def contains(self, key: str) -> bool:
+        """True jika `key` ada di cache (tanpa membaca isinya atau mengubah urutan LRU)."""
+        with self._lock:
+            return key in self._entries
+
+    def get(self, key: str) -> bytes | None:
+        """Mengembalikan PCM untuk `key`, atau None jika belum ada di cache."""
+        with self._lock:
+            if key not in self._entries:
+                return None
+            path = self._path(key)
+            try:
+                with open(path, 'rb') as f:
+                    data = f.read()
+            except FileNotFoundError:
+                self._total_bytes -= self._entries.pop(key)
+                return None
+            self._entries.move_to_end(key)
+            # mtime dipakai sebagai urutan LRU saat index dibangun ulang
+            os.utime(path)
+            return data
+
+    def put(self, key: str, data: bytes):
+        """Menyimpan PCM untuk `key`, lalu mengosongkan entri lama jika melebihi batas ukuran."""
+        if len(data) > self.max_bytes:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._total_bytes -= self._entries.pop(key, 0)
+            self._entries[key] = len(data)
+            self._total_bytes += len(data)
+            self._evict()
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+            logger.debug(f"🗑️ Entri cache dihapus (LRU): {key}")
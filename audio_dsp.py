@@ -0,0 +1,152 @@
+# NumPy opsional (`uv sync --extra dsp`); tanpa NumPy, post_process memakai normalisasi versi stdlib
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+MAX_SAMPLE = 32767
+# Panjang frame untuk mengukur RMS saat mencari batas hening
+FRAME_MS = 10
+# Batas perubahan gain per chunk, agar chunk yang sangat pelan/berisik tidak berubah drastis
+MIN_GAIN = 0.25
+MAX_GAIN = 4.0
+
+
+def numpy_available() -> bool:
+    return np is not None
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("NumPy dibutuhkan untuk audio_dsp. Install dengan: uv sync --extra dsp")
+
+
+def pcm_to_array(pcm_data: bytes):
+    """View int16 (little-endian) atas PCM tanpa menyalin buffer."""
+    _require_numpy()
+    return np.frombuffer(pcm_data, dtype='<i2')
+
+
+def _dbfs_to_amplitude(dbfs: float) -> float:
+    return MAX_SAMPLE * 10 ** (dbfs / 20)
+
+
+def frame_energy(samples, frame: int):
+    """Jumlah kuadrat sampel per frame (int64, tidak overflow). Sisa sampel di akhir diabaikan."""
+    count = len(samples) // frame
+    frames = samples[:count * frame].reshape(count, frame)
+    return np.square(frames, dtype=np.int64).sum(axis=1)
+
+
+def rms(samples) -> float:
+    """RMS sampel int16 (0 untuk buffer kosong)."""
+    if len(samples) == 0:
+        return 0.0
+    return float(np.sqrt(np.square(samples, dtype=np.int64).sum() / len(samples)))
+
+
+def trim_silence(samples, framerate: int = 24000, threshold_dbfs: float = -45.0, keep_ms: float = 60.0):
+    """
+    Membuang hening di awal dan akhir: frame 10 ms yang RMS-nya di bawah
+    `threshold_dbfs` dianggap hening. `keep_ms` hening disisakan di kedua
+    sisi agar awal/akhir kata tidak terpotong. Mengembalikan view (slice).
+    """
+    frame = max(1, framerate * FRAME_MS // 1000)
+    energy = frame_energy(samples, frame)
+    voiced = np.flatnonzero(energy > (_dbfs_to_amplitude(threshold_dbfs) ** 2) * frame)
+    if voiced.size == 0:
+        return samples[:0]
+    keep = int(framerate * keep_ms / 1000)
+    start = max(0, int(voiced[0]) * frame - keep)
+    end = min(len(samples), (int(voiced[-1]) + 1) * frame + keep)
+    return samples[start:end]
+
+
+def apply_gain(samples, gain: float):
+    """Mengalikan sampel dengan `gain` dan memotong ke rentang int16 (satu buffer float32 seukuran chunk)."""
+    if abs(gain - 1.0) < 0.01:
+        return samples
+    scaled = np.multiply(samples, gain, dtype=np.float32)
+    np.clip(scaled, -MAX_SAMPLE - 1, MAX_SAMPLE, out=scaled)
+    return scaled.astype('<i2')
+
+
+def crossfade(tail, head):
+    """Mencampur `tail` (fade out) dan `head` (fade in) yang panjangnya sama secara linear."""
+    ramp = np.linspace(0.0, 1.0, len(head), dtype=np.float32)
+    mixed = np.multiply(head, ramp, dtype=np.float32)
+    mixed += np.multiply(tail, 1.0 - ramp, dtype=np.float32)
+    np.clip(mixed, -MAX_SAMPLE - 1, MAX_SAMPLE, out=mixed)
+    return mixed.astype('<i2')
+
+
+class ChunkJoiner:
+    """
+    Menyambung chunk secara berurutan menjadi satu aliran PCM yang halus.
+    Operasi bekerja langsung pada buffer int16 (`np.frombuffer`, tanpa
+    salinan) dan hanya satu chunk yang diproses sekaligus.
+
+    Setiap chunk dipotong heningnya, gain-nya disamakan dengan `target_dbfs`
+    (atau dengan chunk bersuara pertama jika None), lalu disambung ke chunk
+    sebelumnya dengan crossfade `crossfade_ms`. Ekor chunk terakhir ditahan
+    sampai chunk berikutnya datang (atau `flush`). Jeda [JEDA] ditambahkan
+    sebagai hening tanpa crossfade.
+    """
+
+    def __init__(
+        self,
+        framerate: int = 24000,
+        trim_threshold_dbfs: float = -45.0,
+        keep_silence_ms: float = 60.0,
+        target_dbfs: float | None = None,
+        crossfade_ms: float = 15.0
+    ):
+        _require_numpy()
+        self.framerate = framerate
+        self.trim_threshold_dbfs = trim_threshold_dbfs
+        self.keep_silence_ms = keep_silence_ms
+        self.target_rms = None if target_dbfs is None else _dbfs_to_amplitude(target_dbfs)
+        self.fade_samples = int(framerate * crossfade_ms / 1000)
+        self._tail = np.zeros(0, dtype='<i2')
+
+    def _match_gain(self, samples):
+        level = rms(samples)
+        if level < _dbfs_to_amplitude(self.trim_threshold_dbfs):
+            return samples
+        if self.target_rms is None:
+            # Chunk bersuara pertama menjadi acuan kenyaringan chunk berikutnya
+            self.target_rms = level
+            return samples
+        peak = int(np.abs(samples, dtype=np.int32).max())
+        gain = min(max(self.target_rms / level, MIN_GAIN), MAX_GAIN, MAX_SAMPLE / peak)
+        return apply_gain(samples, gain)
+
+    def process(self, pcm_data: bytes, pause_after: float = 0.0) -> bytes:
+        """Memproses satu chunk dan mengembalikan PCM yang siap ditulis (tanpa ekor yang ditahan)."""
+        samples = trim_silence(pcm_to_array(pcm_data), self.framerate, self.trim_threshold_dbfs, self.keep_silence_ms)
+        samples = self._match_gain(samples)
+
+        parts = []
+        overlap = min(self.fade_samples, len(self._tail), len(samples) // 2)
+        if overlap:
+            parts.append(self._tail[:len(self._tail) - overlap])
+            parts.append(crossfade(self._tail[len(self._tail) - overlap:], samples[:overlap]))
+        else:
+            parts.append(self._tail)
+        body = samples[overlap:]
+
+        if pause_after > 0:
+            # Sambungan setelah jeda tidak di-crossfade
+            parts.append(body)
+            parts.append(np.zeros(int(round(pause_after * self.framerate)), dtype='<i2'))
+            self._tail = body[:0]
+        else:
+            hold = min(self.fade_samples, len(body))
+            parts.append(body[:len(body) - hold])
+            self._tail = body[len(body) - hold:]
+        return b''.join(part.tobytes() for part in parts)
+
+    def flush(self) -> bytes:
+        """Mengembalikan ekor chunk terakhir yang masih ditahan."""
+        tail, self._tail = self._tail, self._tail[:0]
+        return tail.tobytes()
@@ -0,0 +1,248 @@
+"""
+Menjalankan banyak narasi sekaligus dalam satu proses.
+
+Setiap baris file JSONL adalah satu job:
+
+    {"id": "ep01", "text": "...", "voice": "Kore", "output": "ep01.wav", "temperature": 0.7, "script_mode": true}
+
+`id`, `temperature` dan `script_mode` opsional. Untuk dialog, `voice` diisi
+suara per pembicara (`{"Budi": "Puck", "Sari": "Kore"}`) dan `text` berisi
+baris "Budi: ..." / "Sari: ..." (lihat dialogue.py). Semua chunk dari semua job
+dijadwalkan lewat satu pool API key dan satu rate limiter yang sama, lalu
+PCM setiap job langsung ditulis ke file output-nya (mode pipeline). Setiap
+job yang selesai dicatat sebagai satu baris JSON di file status.
+
+Penggunaan:
+
+    uv run batch_runner.py jobs.jsonl --status batch-status.jsonl
+"""
+import argparse
+import json
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+
+import main
+from rate_limiter import FREE_TIER_RPM, FREE_TIER_TPM
+from retry_policy import RetryPolicy
+from post_process import PostProcessor
+from hedging import HedgePolicy
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BatchJob:
+    """Satu narasi di dalam batch."""
+    id: str
+    text: str
+    voice: str | dict[str, str]
+    output: str
+    temperature: float = 0.7
+    script_mode: bool = False
+
+
+@dataclass
+class _JobState:
+    job: BatchJob
+    total_chunks: int
+    pauses: dict
+    started: float
+    normalize_dbfs: float | None = None
+    remaining: int = 0
+    from_cache: int = 0
+    error: Exception | None = None
+    writer: PostProcessor | None = None
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def write_chunk(self, chunk_index: int, pcm_data: bytes):
+        # File output (dan worker-nya) baru dibuka saat chunk pertama datang, agar ratusan job tidak membuka file sekaligus
+        with self.lock:
+            if self.writer is None:
+                self.writer = main.create_post_processor(self.job.output, self.pauses, self.normalize_dbfs)
+        self.writer.submit(chunk_index, pcm_data)
+
+
+def load_jobs(filepath: str) -> list[BatchJob]:
+    """Membaca dan memvalidasi job dari file JSONL (baris kosong dilewati)."""
+    jobs = []
+    with open(filepath, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                payload = json.loads(line)
+                if not isinstance(payload, dict):
+                    raise TypeError('baris harus berisi objek JSON')
+                job = BatchJob(
+                    id=str(payload.get('id', line_number)),
+                    text=payload['text'],
+                    voice=payload['voice'],
+                    output=payload['output'],
+                    temperature=float(payload.get('temperature', 0.7)),
+                    script_mode=bool(payload.get('script_mode', False))
+                )
+            except (ValueError, KeyError, TypeError) as e:
+                raise ValueError(f"Job di baris {line_number} tidak valid: {e}") from e
+            jobs.append(job)
+    logger.info(f"Ditemukan {len(jobs)} job di '{filepath}'.")
+    return jobs
+
+
+def run_batch(
+    jobs: list[BatchJob],
+    status_path: str,
+    max_chars_per_chunk: int = 4800,
+    max_tokens_per_chunk: int | None = FREE_TIER_TPM // FREE_TIER_RPM,
+    max_retries: int = 5,
+    base_delay: int = 5,
+    max_in_flight_per_key: int = 1,
+    rate_limit: bool = True,
+    rate_limit_max_wait: float | None = None,
+    retry_policy: RetryPolicy | None = None,
+    normalize_dbfs: float | None = None,
+    hedge: HedgePolicy | None = None
+) -> dict[str, int]:
+    """
+    Menjalankan semua job lewat satu pool key bersama. Job yang gagal tidak
+    menghentikan job lain. Jika `hedge` diberikan, chunk yang lambat dikirim
+    juga ke key lain yang menganggur, dengan budget dari sisa kuota harian
+    setelah seluruh batch. Mengembalikan jumlah job per status.
+    """
+    key_slots = main.create_key_slots(max_in_flight_per_key, rate_limit, rate_limit_max_wait)
+    retry_policy = retry_policy or RetryPolicy(max_attempts=max_retries, base_delay=base_delay)
+
+    # Chunking semua job dilakukan di depan, tanpa panggilan API
+    states = []
+    tasks = []
+    predicted = 0
+    for job in jobs:
+        with main.METRICS.stage('split'):
+            text_chunks, pauses = main.prepare_chunks(
+                job.text, max_chars_per_chunk, max_tokens_per_chunk, job.script_mode,
+                job.voice if isinstance(job.voice, dict) else None
+            )
+        state = _JobState(job, len(text_chunks), pauses, time.time(), normalize_dbfs, remaining=len(text_chunks))
+        states.append(state)
+        tasks.extend((state, chunk_index, chunk) for chunk_index, chunk in enumerate(text_chunks, start=1))
+        predicted += main.predict_request_count(text_chunks, job.voice, job.temperature)
+    logger.info(f"📋 Rencana batch: {len(jobs)} job, {len(tasks)} chunk, perkiraan {predicted} request ke API.")
+    if hedge is not None:
+        main.set_hedge_budget(hedge, key_slots.num_keys, predicted)
+
+    counts = {'done': 0, 'failed': 0}
+    num_keys = key_slots.num_keys
+    max_workers = max(1, min(len(tasks), num_keys * key_slots.max_in_flight_per_key))
+
+    with open(status_path, 'a', encoding='utf-8') as status_log:
+        def finish(state: _JobState):
+            if state.writer is not None:
+                try:
+                    state.writer.close()
+                except Exception as e:
+                    state.error = state.error or e
+            status = 'failed' if state.error is not None else 'done'
+            counts[status] += 1
+            record = {
+                'id': state.job.id,
+                'output': state.job.output,
+                'status': status,
+                'chunks': state.total_chunks,
+                'from_cache': state.from_cache,
+                'elapsed': round(time.time() - state.started, 3)
+            }
+            if state.error is not None:
+                record['error'] = str(state.error)
+            status_log.write(json.dumps(record, ensure_ascii=False) + '\n')
+            status_log.flush()
+            logger.info(f"{'✅' if status == 'done' else '❌'} Job {state.job.id}: {status}")
+
+        for state in states:
+            if state.total_chunks == 0:
+                state.error = ValueError('Teks kosong.')
+                finish(state)
+
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='batch') as executor:
+            futures = {}
+            for task_number, (state, chunk_index, chunk) in enumerate(tasks):
+                future = executor.submit(
+                    main.make_tts_request_with_retry,
+                    prompt=chunk,
+                    voice=state.job.voice,
+                    base_filename=state.job.output,
+                    chunk_index=chunk_index,
+                    max_retries=max_retries,
+                    base_delay=base_delay,
+                    temperature=state.job.temperature,
+                    key_slots=key_slots,
+                    preferred_key_index=task_number % num_keys,
+                    audio_sink=state.write_chunk,
+                    retry_policy=retry_policy,
+                    hedge=hedge
+                )
+                futures[future] = (state, chunk_index)
+
+            # Status ditulis dari thread ini saja, begitu chunk terakhir sebuah job selesai
+            for future in as_completed(futures):
+                state, chunk_index = futures[future]
+                error = future.exception()
+                if error is not None:
+                    state.error = state.error or error
+                elif future.result():
+                    state.from_cache += 1
+                state.remaining -= 1
+                if state.remaining == 0:
+                    finish(state)
+
+    retry_policy.report()
+    if hedge is not None:
+        hedge.report()
+    if main.KEY_HEALTH is not None:
+        main.KEY_HEALTH.report()
+    main.METRICS.report()
+    logger.info(f"Batch selesai: {counts['done']} berhasil, {counts['failed']} gagal.")
+    return counts
+
+
+def cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('jobs', help='File JSONL berisi job (satu job per baris)')
+    parser.add_argument('--status', default='batch-status.jsonl', help='File JSONL untuk status setiap job')
+    parser.add_argument('--keys', default='api-keys.txt')
+    parser.add_argument('--ledger', default='key-ledger.sqlite3')
+    parser.add_argument('--leases', default=None, help='File lease bersama agar beberapa proses memakai key yang berbeda (lihat key_lease.py)')
+    parser.add_argument('--cache-dir', default='.tts-cache')
+    parser.add_argument('--cache-max-mb', type=int, default=512)
+    parser.add_argument('--max-chars', type=int, default=4800)
+    parser.add_argument('--max-in-flight-per-key', type=int, default=1)
+    parser.add_argument('--max-wait', type=float, default=90, help='Detik maksimal menunggu kuota sebelum chunk dianggap gagal')
+    parser.add_argument('--normalize-dbfs', type=float, default=None, help='Kenyaringan target tiap chunk (misal -20); default tanpa normalisasi')
+    parser.add_argument('--metrics', default=None, help='Simpan metrik di akhir batch: file .prom (Prometheus) atau .json')
+    parser.add_argument('--hedge-after', type=float, default=None, help='Kirim hedge untuk chunk yang lebih lambat dari latensi persentil ini (misal 0.95); default tanpa hedging')
+    args = parser.parse_args()
+
+    main.load_api_keys(args.keys, ledger_path=args.ledger)
+    if args.leases:
+        main.init_key_leases(args.leases)
+    main.init_audio_cache(args.cache_dir, args.cache_max_mb * 1024 * 1024)
+    try:
+        counts = run_batch(
+            load_jobs(args.jobs),
+            args.status,
+            max_chars_per_chunk=args.max_chars,
+            max_in_flight_per_key=args.max_in_flight_per_key,
+            rate_limit_max_wait=args.max_wait,
+            normalize_dbfs=args.normalize_dbfs,
+            hedge=HedgePolicy(args.hedge_after) if args.hedge_after else None
+        )
+    finally:
+        main.close_key_leases()
+    if args.metrics:
+        main.METRICS.export(args.metrics)
+    raise SystemExit(1 if counts['failed'] else 0)
+
+
+if __name__ == '__main__':
+    cli()
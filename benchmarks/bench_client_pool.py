@@ -0,0 +1,77 @@
+"""
+Benchmark overhead per request: `genai.Client` baru di setiap percobaan
+dibandingkan client yang dipakai ulang lewat `ClientPool`.
+
+Request dikirim ke endpoint `generateContent` tiruan di localhost, sehingga
+tidak memakai kuota. Jalankan dari root repo:
+
+    uv run benchmarks/bench_client_pool.py --requests 200
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from google import genai
+from google.genai import types
+
+from client_pool import ClientPool
+from mock_gemini import MockGeminiServer
+
+MODEL = "gemini-2.5-flash-preview-tts"
+
+
+def _config() -> types.GenerateContentConfig:
+    return types.GenerateContentConfig(
+        response_modalities=["AUDIO"],
+        speech_config=types.SpeechConfig(
+            voice_config=types.VoiceConfig(
+                prebuilt_voice_config=types.PrebuiltVoiceConfig(voice_name='Kore')
+            )
+        ),
+    )
+
+
+def _run(label: str, server: MockGeminiServer, get_client, requests: int) -> list[float]:
+    server.reset_stats()
+    latencies = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        client = get_client()
+        client.models.generate_content(model=MODEL, contents='Halo dunia.', config=_config())
+        latencies.append(time.perf_counter() - start)
+    print(
+        f"{label:<22} rata-rata {statistics.mean(latencies) * 1000:7.2f} ms | "
+        f"median {statistics.median(latencies) * 1000:7.2f} ms | "
+        f"koneksi TCP baru: {server.stats()['connections']}"
+    )
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=100)
+    args = parser.parse_args()
+
+    # Tanpa latensi buatan: yang diukur hanya overhead client dan koneksi
+    with MockGeminiServer(latency=0.0, seconds_per_char=0.01) as server:
+        http_options = server.http_options
+        fresh = _run(
+            'Client baru/percobaan',
+            server,
+            lambda: genai.Client(api_key='bench-key', http_options=http_options),
+            args.requests
+        )
+        pool = ClientPool(http_options)
+        pooled = _run('ClientPool', server, lambda: pool.get('bench-key'), args.requests)
+        pool.close()
+
+    saved = statistics.mean(fresh) - statistics.mean(pooled)
+    print(f"Overhead yang dihemat: {saved * 1000:.2f} ms/request (tanpa TLS; dengan TLS ke API asli selisihnya lebih besar)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,198 @@
+"""
+Benchmark `generate_audio_for_chunks` (sekuensial, thread pool, asyncio) dan
+`combine_audio_chunks` terhadap server tiruan `mock_gemini.py`, tanpa kuota.
+
+Untuk setiap mode dilaporkan chunk/detik, efisiensi kuota (chunk berhasil
+dibanding request yang diterima server, termasuk yang ditolak 429) dan
+puncak memori Python (tracemalloc). Seed yang sama memberi pola latensi dan
+error yang sama. Jalankan dari root repo:
+
+    uv run benchmarks/bench_modes.py --keys 3 --chunks 24 --latency 0.5 --error-rate 0.05
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import wave
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+import async_tts
+from client_pool import ClientPool
+from retry_policy import RetryPolicy
+from mock_gemini import MockGeminiServer, synthetic_pcm
+
+MODES = ('sequential', 'threaded', 'async')
+# Satu kalimat ~190 karakter; dengan MAX_CHARS di bawah ini setiap chunk berisi satu kalimat
+SENTENCE = (
+    "Kalimat nomor {i} ini adalah bagian dari narasi uji yang cukup panjang untuk mengisi satu chunk "
+    "penuh, sehingga setiap request ke server tiruan membawa teks dan audio dengan ukuran yang realistis."
+)
+MAX_CHARS = 250
+
+
+def _prepare_keys(directory: str, num_keys: int):
+    path = os.path.join(directory, 'bench-keys.txt')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(f'bench-key-{i}' for i in range(num_keys)))
+    main.load_api_keys(path)
+
+
+def _run_mode(mode: str, text: str, output_filename: str, args) -> float:
+    """Menjalankan satu mode dan mengembalikan durasinya (detik)."""
+    policy = RetryPolicy(max_attempts=args.max_retries, base_delay=args.base_delay)
+    common = dict(
+        full_prompt=text,
+        voice='Kore',
+        base_filename=os.path.splitext(output_filename)[0],
+        max_chars_per_chunk=MAX_CHARS,
+        max_retries=args.max_retries,
+        base_delay=args.base_delay,
+        max_in_flight_per_key=args.max_in_flight_per_key,
+        rate_limit=args.rate_limit,
+        output_filename=output_filename,
+        script_mode=False,
+        retry_policy=policy
+    )
+    started = time.perf_counter()
+    if mode == 'async':
+        asyncio.run(async_tts.run_and_close(async_tts.generate_audio_for_chunks_async(**common)))
+    else:
+        main.generate_audio_for_chunks(concurrent=(mode == 'threaded'), **common)
+    return time.perf_counter() - started
+
+
+def bench_modes(server: MockGeminiServer, modes: list[str], directory: str, args) -> list[dict]:
+    text = ' '.join(SENTENCE.format(i=i) for i in range(1, args.chunks + 1))
+    results = []
+    for mode in modes:
+        # Kondisi awal yang sama untuk setiap mode: key sehat, client baru, kuota server kosong
+        _prepare_keys(directory, args.keys)
+        main.CLIENT_POOL = ClientPool(server.http_options)
+        main.METRICS.reset()
+        server.reset_stats()
+
+        tracemalloc.start()
+        error = None
+        try:
+            elapsed = _run_mode(mode, text, os.path.join(directory, f'bench-{mode}.wav'), args)
+        except Exception as e:
+            elapsed, error = None, e
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        main.CLIENT_POOL.close()
+
+        stats = server.stats()
+        received = stats['requests']
+        results.append({
+            'mode': mode,
+            'chunks': stats['succeeded'],
+            'seconds': round(elapsed, 3) if elapsed is not None else None,
+            'chunks_per_sec': round(stats['succeeded'] / elapsed, 3) if elapsed else None,
+            'requests': received,
+            'rejected_429': stats['injected_errors'] + stats['rate_limited'],
+            'quota_efficiency': round(stats['succeeded'] / received, 3) if received else None,
+            'peak_mb': round(peak / 1024 / 1024, 2),
+            'error': None if error is None else str(error),
+        })
+    return results
+
+
+def bench_combine(directory: str, args) -> list[dict]:
+    """Mengukur `combine_audio_chunks` untuk file chunk sintetis (tanpa server)."""
+    base = os.path.join(directory, 'combine')
+    chunk_pcm = synthetic_pcm(args.combine_chunk_seconds)
+    variants = [('wav', False)]
+    if main.numpy_available():
+        variants.append(('wav+smooth', True))
+    results = []
+    for label, smooth in variants:
+        for i in range(1, args.combine_chunks + 1):
+            with wave.open(main.chunk_output_path(base, i), 'wb') as wf:
+                wf.setnchannels(1)
+                wf.setsampwidth(2)
+                wf.setframerate(24000)
+                wf.writeframes(chunk_pcm)
+        output = os.path.join(directory, f'combine-{label}.wav')
+        tracemalloc.start()
+        started = time.perf_counter()
+        main.combine_audio_chunks(base, output, delete_chunks=True, smooth_joins=smooth)
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        audio_seconds = args.combine_chunks * args.combine_chunk_seconds
+        results.append({
+            'mode': f'combine ({label})',
+            'chunks': args.combine_chunks,
+            'seconds': round(elapsed, 3),
+            'chunks_per_sec': round(args.combine_chunks / elapsed, 1),
+            'audio_x_realtime': round(audio_seconds / elapsed, 1),
+            'peak_mb': round(peak / 1024 / 1024, 2),
+        })
+    return results
+
+
+def _print_table(results: list[dict]):
+    print(f"{'mode':<22}{'chunk':>7}{'detik':>9}{'chunk/s':>9}{'request':>9}{'429':>6}{'efisiensi':>11}{'puncak MB':>11}")
+    for r in results:
+        efficiency = f"{r['quota_efficiency'] * 100:.0f}%" if r.get('quota_efficiency') is not None else '-'
+        print(
+            f"{r['mode']:<22}{r['chunks']:>7}{r['seconds'] if r['seconds'] is not None else '-':>9}"
+            f"{r['chunks_per_sec'] if r['chunks_per_sec'] is not None else '-':>9}{r.get('requests', '-'):>9}"
+            f"{r.get('rejected_429', '-'):>6}{efficiency:>11}{r['peak_mb']:>11}"
+        )
+        if r.get('error'):
+            print(f"  ❌ {r['error']}")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modes', default=','.join(MODES), help=f"Mode yang diukur, dipisah koma ({', '.join(MODES)})")
+    parser.add_argument('--keys', type=int, default=3)
+    parser.add_argument('--chunks', type=int, default=24)
+    parser.add_argument('--max-in-flight-per-key', type=int, default=1)
+    parser.add_argument('--rate-limit', action='store_true', help='Pakai RateLimiterPool (RPM/TPM/RPD free tier) di sisi client')
+    parser.add_argument('--latency', type=float, default=0.5)
+    parser.add_argument('--jitter', type=float, default=0.1)
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Peluang 429 acak dari server')
+    parser.add_argument('--rpm', type=int, default=None, help='Batas request per menit per key di server')
+    parser.add_argument('--rpd', type=int, default=None, help='Batas request per hari per key di server')
+    parser.add_argument('--max-retries', type=int, default=5)
+    parser.add_argument('--base-delay', type=float, default=1.0)
+    parser.add_argument('--combine-chunks', type=int, default=200)
+    parser.add_argument('--combine-chunk-seconds', type=float, default=10.0)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', default=None, help='Simpan hasil ke file JSON')
+    parser.add_argument('--verbose', action='store_true', help='Tampilkan log main.py')
+    args = parser.parse_args()
+
+    modes = [mode.strip() for mode in args.modes.split(',') if mode.strip()]
+    unknown = set(modes) - set(MODES)
+    if unknown:
+        parser.error(f"Mode tidak dikenal: {', '.join(sorted(unknown))}")
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.ERROR)
+
+    with tempfile.TemporaryDirectory(prefix='tts-bench-') as directory:
+        with MockGeminiServer(
+            latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+            rpm=args.rpm, rpd=args.rpd, seed=args.seed
+        ) as server:
+            results = bench_modes(server, modes, directory, args)
+        if args.combine_chunks:
+            results += bench_combine(directory, args)
+
+    _print_table(results)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == '__main__':
+    main_cli()
@@ -0,0 +1,282 @@
+"""
+Server tiruan endpoint `generateContent` Gemini TTS untuk benchmark dan uji
+lokal tanpa kuota.
+
+Respons berisi PCM sintetis (nada sinus 24kHz mono 16-bit) yang panjangnya
+sebanding dengan teks, dengan latensi yang bisa diatur, injeksi error 429
+acak, dan batas RPM/RPD per API key seperti free tier. Error 429 memakai
+format yang sama dengan API asli (RESOURCE_EXHAUSTED + RetryInfo), sehingga
+jalur retry/rotasi key di main.py diuji apa adanya.
+
+Dipakai dari kode:
+
+    with MockGeminiServer(latency=0.3, rpm=10) as server:
+        main.CLIENT_POOL = ClientPool(server.http_options)
+
+Atau dijalankan sendiri (lalu arahkan `HttpOptions(base_url=...)` ke sana):
+
+    uv run benchmarks/mock_gemini.py --port 8765 --latency 0.5 --rpm 10
+"""
+import argparse
+import base64
+import json
+import math
+import random
+import re
+import threading
+import time
+from array import array
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from google.genai import types
+
+SAMPLE_RATE = 24000
+MINUTE = 60.0
+DAY = 24 * 60 * 60.0
+# Satu detik nada 220 Hz pada -20 dBFS, diulang untuk membuat PCM sepanjang apa pun
+_TONE = array('h', (int(3277 * math.sin(2 * math.pi * 220 * i / SAMPLE_RATE)) for i in range(SAMPLE_RATE))).tobytes()
+_MODEL_PATH = re.compile(r'/models/([^/:]+):generateContent$')
+
+
+def synthetic_pcm(seconds: float) -> bytes:
+    """PCM 16-bit little-endian sepanjang `seconds` detik."""
+    size = int(seconds * SAMPLE_RATE) * 2
+    return (_TONE * (size // len(_TONE) + 1))[:size]
+
+
+def _quota_error(message: str, retry_delay: float) -> dict:
+    return {
+        'error': {
+            'code': 429,
+            'message': message,
+            'status': 'RESOURCE_EXHAUSTED',
+            'details': [{'@type': 'type.googleapis.com/google.rpc.RetryInfo', 'retryDelay': f'{math.ceil(retry_delay)}s'}]
+        }
+    }
+
+
+class MockGeminiServer:
+    """
+    Server HTTP lokal yang meniru `models/{model}:generateContent`.
+
+    Args:
+        latency: Detik sebelum setiap respons berhasil dikirim.
+        latency_per_char: Tambahan latensi per karakter teks.
+        jitter: Variasi latensi acak (+- detik).
+        error_rate: Peluang request ditolak dengan 429 walaupun kuota masih ada.
+        rpm, rpd: Batas request per menit/hari per API key (None = tanpa batas).
+        seconds_per_char: Durasi audio yang dihasilkan per karakter teks.
+        seed: Seed untuk jitter dan injeksi error, agar hasil benchmark bisa diulang.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.3,
+        latency_per_char: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        rpm: int | None = None,
+        rpd: int | None = None,
+        seconds_per_char: float = 0.06,
+        seed: int | None = None,
+        host: str = '127.0.0.1',
+        port: int = 0
+    ):
+        self.latency = latency
+        self.latency_per_char = latency_per_char
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rpm = rpm
+        self.rpd = rpd
+        self.seconds_per_char = seconds_per_char
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._minute = {}
+        self._day = {}
+        self._in_flight = {}
+        self.reset_stats()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @property
+    def http_options(self) -> types.HttpOptions:
+        return types.HttpOptions(base_url=self.base_url)
+
+    def reset_stats(self):
+        """Mengosongkan statistik dan hitungan kuota per key."""
+        with self._lock:
+            self.requests = 0
+            self.succeeded = 0
+            self.injected_errors = 0
+            self.rate_limited = 0
+            self.connections = 0
+            self.audio_seconds = 0.0
+            self.peak_in_flight = {}
+            self._minute.clear()
+            self._day.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'succeeded': self.succeeded,
+                'injected_errors': self.injected_errors,
+                'rate_limited': self.rate_limited,
+                'connections': self.connections,
+                'audio_seconds': round(self.audio_seconds, 3),
+                'max_in_flight_per_key': max(self.peak_in_flight.values(), default=0),
+            }
+
+    def _admit(self, api_key: str) -> dict | None:
+        """Mencatat satu request; mengembalikan body error 429 jika ditolak."""
+        now = time.monotonic()
+        with self._lock:
+            self.requests += 1
+            minute = self._minute.setdefault(api_key, deque())
+            day = self._day.setdefault(api_key, deque())
+            while minute and minute[0] <= now - MINUTE:
+                minute.popleft()
+            while day and day[0] <= now - DAY:
+                day.popleft()
+            if self.rpd is not None and len(day) >= self.rpd:
+                self.rate_limited += 1
+                return _quota_error(
+                    f'Quota exceeded for metric: generate_content_free_tier_requests, limit: {self.rpd}, '
+                    f'quotaId: GenerateRequestsPerDayPerProjectPerModel-FreeTier',
+                    day[0] + DAY - now
+                )
+            if self.rpm is not None and len(minute) >= self.rpm:
+                self.rate_limited += 1
+                return _quota_error(
+                    f'Quota exceeded for metric: generate_content_free_tier_requests, limit: {self.rpm}, '
+                    f'quotaId: GenerateRequestsPerMinutePerProjectPerModel-FreeTier',
+                    minute[0] + MINUTE - now
+                )
+            if self._random.random() < self.error_rate:
+                self.injected_errors += 1
+                return _quota_error('Resource has been exhausted (e.g. check quota).', 1)
+            minute.append(now)
+            day.append(now)
+            delay = self.latency + self._random.uniform(-self.jitter, self.jitter)
+        return {'delay': delay}
+
+    def _respond(self, api_key: str, text: str) -> tuple[int, dict]:
+        admitted = self._admit(api_key)
+        if 'error' in admitted:
+            return 429, admitted
+        with self._lock:
+            # Request yang sedang dilayani per key, untuk memeriksa batas in-flight client
+            self._in_flight[api_key] = self._in_flight.get(api_key, 0) + 1
+            self.peak_in_flight[api_key] = max(self.peak_in_flight.get(api_key, 0), self._in_flight[api_key])
+        try:
+            time.sleep(max(0.0, admitted['delay'] + self.latency_per_char * len(text)))
+        finally:
+            with self._lock:
+                self._in_flight[api_key] -= 1
+        seconds = max(0.1, len(text) * self.seconds_per_char)
+        with self._lock:
+            self.succeeded += 1
+            self.audio_seconds += seconds
+        return 200, {
+            'candidates': [{
+                'content': {
+                    'role': 'model',
+                    'parts': [{
+                        'inlineData': {
+                            'mimeType': f'audio/L16;codec=pcm;rate={SAMPLE_RATE}',
+                            'data': base64.b64encode(synthetic_pcm(seconds)).decode('ascii')
+                        }
+                    }]
+                },
+                'finishReason': 'STOP'
+            }]
+        }
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # HTTP/1.1 agar koneksi keep-alive bisa dipakai ulang oleh client
+            protocol_version = 'HTTP/1.1'
+            # Header dan body ditulis terpisah; tanpa ini Nagle menambah ~40 ms per respons
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                with server._lock:
+                    server.connections += 1
+
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                if not _MODEL_PATH.search(self.path.split('?')[0]):
+                    status, body = 404, {'error': {'code': 404, 'message': f'Not found: {self.path}', 'status': 'NOT_FOUND'}}
+                else:
+                    text = ' '.join(
+                        part.get('text', '')
+                        for content in payload.get('contents', [])
+                        for part in content.get('parts', [])
+                    )
+                    status, body = server._respond(self.headers.get('x-goog-api-key', ''), text)
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> 'MockGeminiServer':
+        self._thread = threading.Thread(target=self._server.serve_forever, name='mock-gemini', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.3)
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--rpm', type=int, default=None)
+    parser.add_argument('--rpd', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    server = MockGeminiServer(
+        latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+        rpm=args.rpm, rpd=args.rpd, seed=args.seed, host=args.host, port=args.port
+    )
+    print(f"Mock Gemini berjalan di {server.base_url} (Ctrl+C untuk berhenti)")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._server.server_close()
+        print(json.dumps(server.stats()))
+
+
+if __name__ == '__main__':
+    main()
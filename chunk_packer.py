@@ -0,0 +1,107 @@
+import re
+from itertools import accumulate
+
+from rate_limiter import CHARS_PER_TOKEN
+
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.?!])\s+')
+
+
+def char_budget(max_chars: int, max_tokens: int | None = None) -> int:
+    """
+    Batas karakter efektif per chunk. Token diperkirakan dari jumlah karakter
+    (lihat `rate_limiter.estimate_tokens`), jadi batas token bisa diubah
+    menjadi batas karakter.
+    """
+    if max_tokens is None:
+        return max_chars
+    return min(max_chars, max_tokens * CHARS_PER_TOKEN)
+
+
+def split_long_sentence(sentence: str, max_chars: int) -> list[str]:
+    """Memotong kalimat yang lebih panjang dari batas pada spasi terakhir sebelum batas."""
+    pieces = []
+    while len(sentence) > max_chars:
+        cut = sentence.rfind(' ', 0, max_chars)
+        if cut <= 0:
+            cut = max_chars
+        pieces.append(sentence[:cut].strip())
+        sentence = sentence[cut:].strip()
+    if sentence:
+        pieces.append(sentence)
+    return pieces
+
+
+def split_sentences(text: str, max_chars: int) -> list[str]:
+    """Memecah teks per kalimat; kalimat yang melebihi `max_chars` dipotong per kata."""
+    sentences = []
+    for sentence in SENTENCE_BOUNDARY.split(text.strip()):
+        sentences.extend(split_long_sentence(sentence, max_chars))
+    return sentences
+
+
+class UnitCosts:
+    """
+    Panjang teks sebuah chunk yang tersusun dari unit berurutan (kalimat).
+
+    `lengths[i]` panjang unit i, `join_costs[i]` karakter tambahan saat unit i
+    menyambung unit i-1 di chunk yang sama (spasi, baris kosong, header
+    instruksi), `start_costs[i]` karakter tambahan saat unit i membuka chunk.
+    Dengan prefix sum, panjang chunk [start, end) dihitung dalam O(1).
+    """
+
+    def __init__(self, lengths: list[int], join_costs: list[int], start_costs: list[int]):
+        self.count = len(lengths)
+        self.start_costs = start_costs
+        self.lengths = lengths
+        # _prefix[i] = jumlah (join + panjang) unit 1..i-1 (unit 0 tidak pernah disambung)
+        self._prefix = [0] + list(accumulate(
+            (join_costs[i] + lengths[i]) if i > 0 else 0 for i in range(self.count)
+        ))
+
+    def cost(self, start: int, end: int) -> int:
+        """Panjang chunk yang berisi unit [start, end)."""
+        return self.start_costs[start] + self.lengths[start] + self._prefix[end] - self._prefix[start + 1]
+
+
+def pack_greedy(costs: UnitCosts, limit: int) -> list[tuple[int, int]]:
+    """
+    Mengisi chunk sepenuh mungkin dari depan. Untuk pembagian berurutan ini
+    menghasilkan jumlah chunk paling sedikit, tetapi chunk terakhir sering kecil.
+    """
+    spans = []
+    start = 0
+    for end in range(1, costs.count + 1):
+        if end - start > 1 and costs.cost(start, end) > limit:
+            spans.append((start, end - 1))
+            start = end - 1
+    if start < costs.count:
+        spans.append((start, costs.count))
+    return spans
+
+
+def pack_balanced(costs: UnitCosts, limit: int) -> list[tuple[int, int]]:
+    """
+    Pembagian dengan jumlah chunk (request) paling sedikit yang sama dengan
+    `pack_greedy`, tetapi ukuran chunk dibuat serata mungkin: dicari batas
+    terkecil yang masih menghasilkan jumlah chunk minimum (binary search),
+    sehingga chunk terbesar sekecil mungkin.
+    """
+    if costs.count == 0:
+        return []
+    best = pack_greedy(costs, limit)
+    low = max(costs.cost(i, i + 1) for i in range(costs.count))
+    high = limit
+    while low < high:
+        middle = (low + high) // 2
+        spans = pack_greedy(costs, middle)
+        if len(spans) <= len(best):
+            best, high = spans, middle
+        else:
+            low = middle + 1
+    return best
+
+
+def pack_sentences(sentences: list[str], limit: int) -> list[str]:
+    """Menggabungkan kalimat (dipisah spasi) menjadi chunk seimbang dengan panjang maksimal `limit`."""
+    costs = UnitCosts([len(s) for s in sentences], [1] * len(sentences), [0] * len(sentences))
+    return [' '.join(sentences[start:end]) for start, end in pack_balanced(costs, limit)]
@@ -0,0 +1,47 @@
+import threading
+import logging
+
+from google import genai
+from google.genai import types
+
+logger = logging.getLogger(__name__)
+
+
+class ClientPool:
+    """
+    Satu `genai.Client` per API key, dibuat saat pertama kali dipakai lalu
+    dipakai ulang selama proses berjalan.
+
+    Client SDK menyimpan koneksi HTTP (keep-alive) di dalamnya, sehingga
+    request berikutnya dengan key yang sama tidak perlu membuka koneksi dan
+    melakukan TLS handshake dari awal.
+    """
+
+    def __init__(self, http_options: types.HttpOptions | None = None):
+        self.http_options = http_options
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def get(self, api_key: str) -> genai.Client:
+        """Mengembalikan client untuk `api_key`, membuatnya jika belum ada."""
+        with self._lock:
+            client = self._clients.get(api_key)
+            if client is None:
+                client = genai.Client(api_key=api_key, http_options=self.http_options)
+                self._clients[api_key] = client
+            return client
+
+    def close(self):
+        """Menutup semua koneksi yang masih terbuka."""
+        with self._lock:
+            clients, self._clients = list(self._clients.values()), {}
+        for client in clients:
+            client.close()
+
+    async def aclose(self):
+        """Seperti `close`, tetapi juga menutup koneksi async (`client.aio`) milik event loop yang sedang berjalan."""
+        with self._lock:
+            clients, self._clients = list(self._clients.values()), {}
+        for client in clients:
+            await client.aio.aclose()
+            client.close()
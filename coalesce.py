@@ -0,0 +1,60 @@
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class InFlightRequests:
+    """
+    Menggabungkan pekerjaan identik yang sedang berjalan (single-flight).
+
+    Pemanggil pertama untuk sebuah key menjalankan fungsinya; pemanggil lain
+    dengan key yang sama selama pekerjaan itu belum selesai hanya menunggu
+    dan menerima hasil (atau error) yang sama. Dipakai agar chunk identik dari
+    job berbeda yang berjalan bersamaan hanya dikirim sekali ke API. Begitu
+    selesai, key dilepas; pemanggil berikutnya dilayani cache audio.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def run(self, key: str, fn) -> tuple[object, bool]:
+        """
+        Menjalankan `fn()` untuk `key`, atau menunggu hasil pemanggil lain
+        yang sedang menjalankannya. Mengembalikan (hasil, digabung) dengan
+        digabung True jika hasil berasal dari pemanggil lain.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._calls)
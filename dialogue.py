@@ -0,0 +1,165 @@
+import re
+import logging
+from dataclasses import dataclass
+
+from chunk_packer import char_budget, split_sentences
+from script_parser import IGNORED_LINES, PAUSE_PATTERN
+
+logger = logging.getLogger(__name__)
+
+# Baris giliran bicara: "Budi: teks". Nama maksimal 40 karakter, tanpa tanda baca kalimat
+SPEAKER_PATTERN = re.compile(r'^([^\s:\[\].,?!][^:\[\].,?!]{0,39}?)\s*:\s*(.*)$')
+# Batas API: satu request multi-speaker maksimal dua pembicara
+MAX_SPEAKERS_PER_REQUEST = 2
+
+
+@dataclass
+class DialogueTurn:
+    """Satu giliran bicara dan jeda hening setelahnya."""
+    speaker: str
+    text: str
+    pause_after: float = 0.0
+
+
+@dataclass
+class DialogueChunk:
+    """Satu request TTS multi-speaker: teks siap kirim, pembicara di dalamnya, dan jeda setelahnya."""
+    text: str
+    speakers: list[str]
+    pause_after: float = 0.0
+
+
+def parse_dialogue(script: str, speakers) -> list[DialogueTurn]:
+    """
+    Mengurai script dialog menjadi giliran bicara. Giliran baru hanya dimulai
+    oleh "Nama: teks" dengan nama yang ada di `speakers` (misal kunci peta
+    suara); baris lain, termasuk yang kebetulan berisi titik dua seperti
+    "Catatan: ..." atau URL, melanjutkan giliran sebelumnya. [JEDA: N detik]
+    menambah hening setelah giliran terakhir.
+    """
+    turns = []
+    for raw_line in script.splitlines():
+        line = raw_line.strip()
+        if not line or line in IGNORED_LINES:
+            continue
+
+        match = PAUSE_PATTERN.match(line)
+        if match:
+            if turns:
+                turns[-1].pause_after += float(match.group(1).replace(',', '.'))
+            continue
+
+        match = SPEAKER_PATTERN.match(line)
+        if match and match.group(1) in speakers:
+            turns.append(DialogueTurn(match.group(1), match.group(2)))
+        elif turns:
+            turns[-1].text = f'{turns[-1].text} {line}'.strip()
+        else:
+            raise ValueError(f'Baris dialog tanpa nama pembicara: {line!r}')
+    return [turn for turn in turns if turn.text or turn.pause_after]
+
+
+def _header(speakers: list[str]) -> str:
+    if len(speakers) == 1:
+        return f"Bacakan bagian percakapan berikut oleh {speakers[0]}:\n"
+    return f"Bacakan percakapan berikut antara {' dan '.join(speakers)}:\n"
+
+
+def _render(units: list[tuple[str, str, int]]) -> str:
+    """
+    Menyusun teks request dari unit (pembicara, kalimat, nomor giliran):
+    header berisi nama pembicara, lalu satu baris "Nama: teks" per giliran.
+    """
+    speakers = list(dict.fromkeys(speaker for speaker, _, _ in units))
+    lines = []
+    current_turn = None
+    for speaker, sentence, turn_id in units:
+        if turn_id == current_turn:
+            lines[-1] += f' {sentence}'
+        else:
+            lines.append(f'{speaker}: {sentence}')
+        current_turn = turn_id
+    return _header(speakers) + '\n'.join(lines)
+
+
+def chunk_speakers(text: str) -> list[str]:
+    """Pembicara yang muncul di teks request (urutan kemunculan), dibaca dari baris "Nama: teks"."""
+    speakers = []
+    for line in text.splitlines()[1:]:
+        match = SPEAKER_PATTERN.match(line)
+        if match and match.group(1) not in speakers:
+            speakers.append(match.group(1))
+    return speakers
+
+
+def split_dialogue_into_chunks(
+    script: str,
+    speakers,
+    max_chars_per_chunk: int,
+    max_tokens_per_chunk: int | None = None
+) -> list[DialogueChunk]:
+    """
+    Membagi script dialog (pembicara `speakers`, lihat `parse_dialogue`)
+    menjadi request multi-speaker. Giliran berurutan
+    digabung ke satu request selama pembicaranya tidak lebih dari dua dan
+    teksnya masih muat batas karakter/token; urutan giliran tidak berubah,
+    jadi audio tiap request langsung tersusun sesuai urutan dialog.
+
+    Karena kedua batas itu monoton (potongan dari chunk yang valid juga
+    valid), pengisian greedy sudah menghasilkan jumlah request paling sedikit.
+    Giliran yang terlalu panjang dipecah per kalimat. [JEDA] di batas chunk
+    menjadi `pause_after`, di dalam chunk diabaikan.
+    """
+    turns = parse_dialogue(script, speakers)
+    limit = char_budget(max_chars_per_chunk, max_tokens_per_chunk)
+
+    units = []
+    for turn_id, turn in enumerate(turns):
+        # Sisakan tempat untuk header dan nama pembicara di awal chunk
+        sentence_limit = max(1, limit - len(_header([turn.speaker, turn.speaker])) - len(turn.speaker) - 2)
+        for sentence in split_sentences(turn.text, sentence_limit):
+            units.append((turn.speaker, sentence, turn_id))
+
+    result = []
+    start = 0
+    while start < len(units):
+        end = start + 1
+        while end < len(units):
+            candidate = units[start:end + 1]
+            if len({speaker for speaker, _, _ in candidate}) > MAX_SPEAKERS_PER_REQUEST or len(_render(candidate)) > limit:
+                break
+            end += 1
+        chunk_units = units[start:end]
+        last_turn = chunk_units[-1][2]
+        # Jeda hanya dipakai jika chunk ini benar-benar menutup gilirannya
+        ends_turn = end == len(units) or units[end][2] != last_turn
+        result.append(DialogueChunk(
+            _render(chunk_units),
+            list(dict.fromkeys(speaker for speaker, _, _ in chunk_units)),
+            turns[last_turn].pause_after if ends_turn else 0.0
+        ))
+        start = end
+
+    logger.info(f"Dialog dibagi menjadi {len(result)} request dari {len(turns)} giliran bicara (Max {limit} karakter/chunk).")
+    return result
+
+
+def speaker_voices(text: str, voices: dict[str, str]) -> dict[str, str]:
+    """
+    Suara untuk satu request dialog: pembicara di `text` dipetakan lewat
+    `voices`. Konfigurasi multi-speaker API butuh tepat dua pembicara, jadi
+    request yang hanya berisi satu pembicara dilengkapi pembicara lain dari
+    `voices` (tidak ikut berbicara).
+    """
+    speakers = chunk_speakers(text)
+    missing = [speaker for speaker in speakers if speaker not in voices]
+    if missing:
+        raise ValueError(f"Suara untuk pembicara {', '.join(missing)} belum diatur.")
+    for speaker in voices:
+        if len(speakers) >= MAX_SPEAKERS_PER_REQUEST:
+            break
+        if speaker not in speakers:
+            speakers.append(speaker)
+    if len(speakers) < MAX_SPEAKERS_PER_REQUEST:
+        raise ValueError('Mode dialog butuh suara untuk minimal dua pembicara.')
+    return {speaker: voices[speaker] for speaker in speakers}
@@ -0,0 +1,143 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import logging
+
+from wav_stream import OrderedPcmWriter, iter_wav_blocks, wav_params, BLOCK_FRAMES
+
+logger = logging.getLogger(__name__)
+
+# Argumen encoder per ekstensi output; bitrate default cukup untuk suara mono 24kHz
+CODEC_ARGS = {
+    '.mp3': ['-c:a', 'libmp3lame', '-b:a', '64k'],
+    '.opus': ['-c:a', 'libopus', '-b:a', '32k', '-application', 'voip'],
+    '.ogg': ['-c:a', 'libopus', '-b:a', '32k', '-application', 'voip'],
+    '.m4a': ['-c:a', 'aac', '-b:a', '64k'],
+    '.aac': ['-c:a', 'aac', '-b:a', '64k'],
+    '.flac': ['-c:a', 'flac'],
+}
+
+
+def find_ffmpeg(ffmpeg_path: str | None = None) -> str:
+    """
+    Lokasi executable FFmpeg: `ffmpeg_path`, variabel lingkungan FFMPEG_PATH
+    (diatur main.py), atau `ffmpeg` di PATH sistem.
+    """
+    for candidate in (ffmpeg_path, os.environ.get('FFMPEG_PATH')):
+        if candidate and os.path.exists(candidate):
+            return candidate
+    found = shutil.which('ffmpeg')
+    if found is None:
+        raise FileNotFoundError('FFmpeg tidak ditemukan. Dibutuhkan untuk output selain .wav.')
+    return found
+
+
+def encoder_args(output_filename: str, bitrate: str | None = None) -> list[str]:
+    """Argumen codec FFmpeg untuk format output (dari ekstensi file); `bitrate` menimpa default."""
+    args = list(CODEC_ARGS.get(os.path.splitext(output_filename)[1].lower(), []))
+    if bitrate is not None:
+        if '-b:a' in args:
+            args[args.index('-b:a') + 1] = bitrate
+        else:
+            args += ['-b:a', bitrate]
+    return args
+
+
+class FfmpegEncoder:
+    """
+    Satu proses FFmpeg yang hidup selama output ditulis. PCM mentah (s16le)
+    dikirim lewat stdin begitu tersedia dan langsung di-encode ke format
+    output (MP3/Opus/AAC/FLAC, ditentukan dari ekstensi file), tanpa WAV
+    perantara dan tanpa memuat seluruh audio ke memori.
+    """
+
+    def __init__(
+        self,
+        output_filename: str,
+        ffmpeg_path: str | None = None,
+        nchannels: int = 1,
+        sampwidth: int = 2,
+        framerate: int = 24000,
+        bitrate: str | None = None
+    ):
+        if sampwidth != 2:
+            raise ValueError('Hanya PCM 16-bit yang didukung.')
+        self.output_filename = output_filename
+        # stderr ke file sementara agar pipe tidak penuh dan pesan error tetap bisa dibaca
+        self._stderr = tempfile.TemporaryFile()
+        command = [
+            find_ffmpeg(ffmpeg_path), '-hide_banner', '-loglevel', 'error', '-y',
+            '-f', 's16le', '-ar', str(framerate), '-ac', str(nchannels), '-i', 'pipe:0',
+            *encoder_args(output_filename, bitrate),
+            output_filename
+        ]
+        logger.info(f"🎛️ Encoder FFmpeg dijalankan untuk: {output_filename}")
+        self._process = subprocess.Popen(command, stdin=subprocess.PIPE, stderr=self._stderr)
+
+    def _error(self) -> RuntimeError:
+        self._stderr.seek(0)
+        message = self._stderr.read().decode('utf-8', 'replace').strip()
+        return RuntimeError(f"FFmpeg gagal menulis '{self.output_filename}' (kode {self._process.returncode}): {message}")
+
+    def write(self, pcm_data: bytes):
+        """Mengirim PCM ke encoder."""
+        try:
+            self._process.stdin.write(pcm_data)
+        except BrokenPipeError:
+            self._process.wait()
+            raise self._error() from None
+
+    def close(self):
+        """Menutup stdin dan menunggu FFmpeg selesai menulis file."""
+        try:
+            self._process.stdin.close()
+        except BrokenPipeError:
+            pass
+        returncode = self._process.wait()
+        try:
+            if returncode != 0:
+                raise self._error()
+        finally:
+            self._stderr.close()
+
+
+class OrderedFfmpegWriter(OrderedPcmWriter):
+    """`OrderedWavWriter` untuk format terkompresi: chunk di-encode langsung lewat `FfmpegEncoder`."""
+
+    def __init__(
+        self,
+        output_filename: str,
+        first_chunk_index: int = 1,
+        ffmpeg_path: str | None = None,
+        bitrate: str | None = None
+    ):
+        super().__init__(output_filename, first_chunk_index)
+        self._encoder = FfmpegEncoder(output_filename, ffmpeg_path, bitrate=bitrate)
+
+    def _write_pcm(self, pcm_data: bytes):
+        self._encoder.write(pcm_data)
+
+    def _finish(self):
+        self._encoder.close()
+
+
+def encode_wav_files(
+    file_list: list[str],
+    output_filename: str,
+    ffmpeg_path: str | None = None,
+    bitrate: str | None = None,
+    block_frames: int = BLOCK_FRAMES
+) -> int:
+    """
+    Menggabungkan file WAV chunk langsung ke format terkompresi dalam satu
+    proses FFmpeg, blok demi blok. Mengembalikan jumlah frame yang di-encode.
+    """
+    (nchannels, sampwidth, framerate), total_frames = wav_params(file_list)
+    encoder = FfmpegEncoder(output_filename, ffmpeg_path, nchannels, sampwidth, framerate, bitrate)
+    try:
+        for block in iter_wav_blocks(file_list, block_frames):
+            encoder.write(block)
+    finally:
+        encoder.close()
+    return total_frames
@@ -0,0 +1,82 @@
+import math
+import threading
+import logging
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Jumlah sampel latensi terakhir yang dipakai untuk menghitung persentil
+LATENCY_WINDOW = 200
+# Seberapa sering request yang berjalan dicek untuk hedging (detik)
+HEDGE_POLL_INTERVAL = 0.1
+
+
+class HedgePolicy:
+    """
+    Aturan hedged request: jika sebuah chunk belum selesai setelah latensi
+    persentil `percentile` dari request yang sudah berhasil, chunk yang sama
+    dikirim juga ke key lain yang sedang menganggur. Hasil yang datang lebih
+    dulu dipakai, request satunya dibatalkan.
+
+    Setiap hedge memakai satu request dari kuota harian, jadi jumlahnya
+    dibatasi `budget` (diisi dari sisa RPD yang tidak dibutuhkan job, lihat
+    `set_budget`). Hedge baru aktif setelah ada `min_samples` latensi.
+    """
+
+    def __init__(self, percentile: float = 0.95, min_samples: int = 5, max_hedges: int | None = None):
+        if not 0 < percentile < 1:
+            raise ValueError('percentile harus di antara 0 dan 1.')
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.max_hedges = max_hedges
+        self.budget = 0 if max_hedges is None else max_hedges
+        self.launched = 0
+        self.won = 0
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._lock = threading.Lock()
+
+    def set_budget(self, spare_requests: int):
+        """Mengatur jumlah hedge yang boleh dikirim dari sisa kuota (dan `max_hedges`, jika ada)."""
+        spare_requests = max(0, spare_requests)
+        with self._lock:
+            self.budget = spare_requests if self.max_hedges is None else min(spare_requests, self.max_hedges)
+        logger.info(f"🪂 Hedging aktif: maksimal {self.budget} request cadangan dari sisa kuota harian.")
+
+    def observe(self, latency: float):
+        """Mencatat latensi satu request yang berhasil."""
+        with self._lock:
+            self._latencies.append(latency)
+
+    def hedge_delay(self) -> float | None:
+        """Detik menunggu sebelum hedge dikirim, atau None jika hedging belum/tidak bisa dipakai."""
+        with self._lock:
+            if self.budget <= 0 or len(self._latencies) < self.min_samples:
+                return None
+            ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, math.ceil(self.percentile * len(ordered)) - 1)]
+
+    def consume(self) -> bool:
+        """Memakai satu jatah hedge; False jika budget sudah habis."""
+        with self._lock:
+            if self.budget <= 0:
+                return False
+            self.budget -= 1
+            self.launched += 1
+            return True
+
+    def refund(self):
+        """Mengembalikan jatah yang sudah diambil `consume` tetapi tidak jadi dikirim."""
+        with self._lock:
+            self.budget += 1
+            self.launched -= 1
+
+    def record_win(self):
+        with self._lock:
+            self.won += 1
+
+    def report(self):
+        """Mencatat ringkasan hedging ke log (jika ada hedge yang dikirim)."""
+        with self._lock:
+            launched, won = self.launched, self.won
+        if launched:
+            logger.info(f"🪂 Hedging: {launched} request cadangan dikirim, {won} lebih cepat dari request utama.")
@@ -0,0 +1,95 @@
+import json
+import os
+import threading
+import wave
+import logging
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 1
+
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+
+
+def manifest_path_for(base_filename: str) -> str:
+    """Lokasi manifest untuk sebuah job, di sebelah file output chunk-nya."""
+    return f"{os.path.splitext(base_filename)[0]}.manifest.json"
+
+
+def is_valid_wav(path: str) -> bool:
+    """True jika file ada, bisa dibaca sebagai WAV dan berisi audio."""
+    try:
+        with wave.open(path, 'rb') as wf:
+            return wf.getnframes() > 0
+    except (FileNotFoundError, EOFError, wave.Error):
+        return False
+
+
+class JobManifest:
+    """
+    Checkpoint sebuah job narasi: hash teks, status dan file output tiap chunk.
+
+    Disimpan sebagai JSON di sebelah file output sehingga saat program
+    dijalankan ulang hanya chunk yang belum selesai (atau filenya rusak)
+    yang dikirim ke API.
+    """
+
+    def __init__(self, path: str, chunks: dict | None = None):
+        self.path = path
+        self.chunks = chunks or {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def open(cls, path: str) -> 'JobManifest':
+        """Membaca manifest yang ada, atau membuat yang baru jika belum ada/tidak terbaca."""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                payload = json.load(f)
+            if payload.get('version') == MANIFEST_VERSION:
+                return cls(path, payload.get('chunks', {}))
+            logger.warning(f"⚠️ Versi manifest '{path}' tidak dikenal, memulai dari awal.")
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ Manifest '{path}' tidak bisa dibaca ({e}), memulai dari awal.")
+        return cls(path)
+
+    def is_done(self, chunk_index: int, text_hash: str) -> bool:
+        """True jika chunk sudah selesai untuk teks yang sama dan file output-nya valid."""
+        entry = self.chunks.get(str(chunk_index))
+        return (
+            entry is not None
+            and entry.get('status') == STATUS_DONE
+            and entry.get('text_hash') == text_hash
+            and is_valid_wav(entry.get('output_path', ''))
+        )
+
+    def mark(self, chunk_index: int, text_hash: str, status: str, output_path: str):
+        """Memperbarui status satu chunk lalu langsung menyimpan manifest."""
+        with self._lock:
+            self.chunks[str(chunk_index)] = {
+                'text_hash': text_hash,
+                'status': status,
+                'output_path': output_path
+            }
+            self._save()
+
+    def truncate(self, total_chunks: int) -> list[str]:
+        """
+        Membuang entri chunk di luar `total_chunks` (teks berubah jadi lebih
+        pendek) dan mengembalikan path output lama milik entri tersebut.
+        """
+        with self._lock:
+            stale = [key for key in self.chunks if int(key) > total_chunks]
+            paths = [self.chunks.pop(key).get('output_path') for key in stale]
+            if stale:
+                self._save()
+        return [path for path in paths if path]
+
+    def _save(self):
+        payload = {'version': MANIFEST_VERSION, 'chunks': self.chunks}
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
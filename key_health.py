@@ -0,0 +1,128 @@
+import threading
+import time
+import logging
+from dataclasses import dataclass
+
+from rate_limiter import MINUTE_WINDOW
+from retry_policy import QUOTA, INVALID_KEY
+
+logger = logging.getLogger(__name__)
+
+# Bobot sampel terbaru pada rata-rata bergerak (EWMA) latensi dan error rate
+HEALTH_ALPHA = 0.3
+# Error rate 100% membuat skor key 5x lebih buruk dari latensinya saja
+ERROR_PENALTY = 4.0
+
+
+@dataclass
+class KeyHealth:
+    """Kondisi satu API key menurut request yang sudah dikirim dalam proses ini."""
+    requests: int = 0
+    failures: int = 0
+    latency: float | None = None   # EWMA detik per request yang berhasil
+    error_rate: float = 0.0        # EWMA kegagalan (0..1), tidak termasuk kuota habis
+    last_failure: str | None = None
+    last_failure_at: float | None = None
+    cooldown_until: float = 0.0    # Kuota habis: tidak dipakai sampai waktu ini
+    quarantined: bool = False      # Key ditolak server (salah/dicabut): tidak dipakai lagi
+
+
+class KeyHealthTracker:
+    """
+    Skor kesehatan semua API key untuk memilih key terbaik.
+
+    Setiap request dicatat latensi dan hasilnya. Key yang ditolak karena
+    tidak valid dikarantina sampai proses selesai, key yang kuotanya habis
+    diistirahatkan sampai jendela kuotanya pulih, dan sisanya diurutkan dari
+    yang paling cepat dan paling jarang gagal.
+    """
+
+    def __init__(self, num_keys: int, alpha: float = HEALTH_ALPHA, clock=time.time):
+        self.keys = [KeyHealth() for _ in range(num_keys)]
+        self.alpha = alpha
+        self._clock = clock
+        self._lock = threading.Lock()
+
+    def _ewma(self, current: float | None, sample: float) -> float:
+        return sample if current is None else (1 - self.alpha) * current + self.alpha * sample
+
+    def record_success(self, index: int, latency: float):
+        """Mencatat request yang berhasil beserta lama responsnya."""
+        with self._lock:
+            health = self.keys[index]
+            health.requests += 1
+            health.latency = self._ewma(health.latency, latency)
+            health.error_rate = self._ewma(health.error_rate, 0.0)
+
+    def record_failure(self, index: int, kind: str, cooldown: float | None = None):
+        """
+        Mencatat request yang gagal. QUOTA mengistirahatkan key selama
+        `cooldown` detik (default satu menit), INVALID_KEY mengkarantina key.
+        """
+        with self._lock:
+            health = self.keys[index]
+            now = self._clock()
+            health.requests += 1
+            health.failures += 1
+            health.last_failure = kind
+            health.last_failure_at = now
+            if kind == QUOTA:
+                health.cooldown_until = max(health.cooldown_until, now + (MINUTE_WINDOW if cooldown is None else cooldown))
+                return
+            if kind == INVALID_KEY and not health.quarantined:
+                health.quarantined = True
+                logger.error(f"🚫 API Key index {index} dikarantina (ditolak server). Periksa api-keys.txt.")
+            health.error_rate = self._ewma(health.error_rate, 1.0)
+
+    def cool_down(self, index: int, until: float):
+        """Mengistirahatkan key sampai `until` (misal dari catatan ledger)."""
+        with self._lock:
+            health = self.keys[index]
+            health.cooldown_until = max(health.cooldown_until, until)
+
+    def _score(self, health: KeyHealth, neutral_latency: float) -> float:
+        latency = neutral_latency if health.latency is None else health.latency
+        return latency * (1 + ERROR_PENALTY * health.error_rate)
+
+    def rank(self, order: list[int]) -> list[int]:
+        """
+        Mengurutkan key yang tersedia dari yang paling sehat (skor terkecil).
+        Key yang belum punya data dianggap rata-rata; jika skor sama, urutan
+        `order` dipertahankan.
+        """
+        now = self._clock()
+        with self._lock:
+            known = [health.latency for health in self.keys if health.latency is not None]
+            neutral = sum(known) / len(known) if known else 1.0
+            available = [
+                index for index in order
+                if not self.keys[index].quarantined and self.keys[index].cooldown_until <= now
+            ]
+            return sorted(available, key=lambda index: self._score(self.keys[index], neutral))
+
+    def seconds_until_available(self, exclude=frozenset()) -> float | None:
+        """
+        Detik sampai key berikutnya (di luar `exclude`) selesai istirahat;
+        0 jika ada yang sudah tersedia, None jika semuanya dikarantina.
+        """
+        now = self._clock()
+        with self._lock:
+            waits = [
+                max(0.0, health.cooldown_until - now)
+                for index, health in enumerate(self.keys)
+                if index not in exclude and not health.quarantined
+            ]
+        return min(waits) if waits else None
+
+    def report(self):
+        """Mencatat ringkasan kondisi setiap key ke log."""
+        with self._lock:
+            for index, health in enumerate(self.keys):
+                if not health.requests:
+                    continue
+                latency = '-' if health.latency is None else f'{health.latency:.2f} detik'
+                status = 'dikarantina' if health.quarantined else 'aktif'
+                logger.info(
+                    f"🩺 API Key index {index}: {status}, {health.requests} request, {health.failures} gagal, "
+                    f"latensi {latency}, error rate {health.error_rate:.0%}, gagal terakhir: {health.last_failure or '-'}"
+                )
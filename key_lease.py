@@ -0,0 +1,208 @@
+import math
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+import logging
+
+from key_ledger import key_id
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LEASE_PATH = 'key-leases.sqlite3'
+# Lease yang tidak diperpanjang selama ini dianggap milik worker yang mati
+DEFAULT_LEASE_TTL = 30.0
+
+
+class KeyLeaseCoordinator:
+    """
+    Pembagian API key antar beberapa proses (worker) lewat tabel lease SQLite.
+
+    Setiap worker mendaftar di file yang sama dan menyewa sekumpulan key yang
+    tidak dipakai worker lain: jatah adil `ceil(jumlah key / jumlah worker
+    aktif)`. Thread heartbeat memperpanjang lease setiap `ttl / 3` detik dan
+    menyeimbangkan ulang: worker yang memegang lebih dari jatahnya melepas
+    kelebihannya, worker yang kurang mengambil key yang bebas. Lease worker
+    yang mati (tidak diperpanjang selama `ttl`) otomatis bebas lagi.
+
+    Key hanya disimpan sebagai hash (lihat `key_ledger.key_id`). Semua proses
+    harus membuka file yang sama; untuk beberapa host, file harus berada di
+    filesystem bersama yang mendukung file lock SQLite (bukan sekadar folder
+    sinkronisasi).
+
+    Setiap request dicatat dengan `mark_used`, sehingga key yang dilepas
+    membawa waktu pemakaian terakhirnya. `on_acquire(index, idle_since)`
+    dipanggil untuk setiap key yang baru disewa dengan waktu itu (0 jika
+    belum pernah dipakai), agar pemanggil bisa menunggu jendela RPM-nya bersih.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        api_keys: list[str],
+        ttl: float = DEFAULT_LEASE_TTL,
+        on_acquire=None,
+        clock=time.time
+    ):
+        if not api_keys:
+            raise ValueError('Tidak ada API Key yang bisa dibagi.')
+        self.path = path
+        self.ttl = ttl
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.on_acquire = on_acquire
+        self._clock = clock
+        self._key_ids = [key_id(api_key) for api_key in api_keys]
+        self._held = frozenset()
+        self._last_used = {}
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._stop = threading.Event()
+        self._thread = None
+        # Transaksi diatur sendiri (BEGIN IMMEDIATE) agar rebalancing antar proses tidak saling tumpang tindih
+        self._conn = sqlite3.connect(path, timeout=max(ttl, 5.0), check_same_thread=False, isolation_level=None)
+        with self._lock:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS key_leases ('
+                'key_id TEXT PRIMARY KEY, owner TEXT, expires REAL NOT NULL DEFAULT 0, idle_since REAL NOT NULL DEFAULT 0)'
+            )
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS lease_workers (owner TEXT PRIMARY KEY, heartbeat REAL NOT NULL)'
+            )
+
+    @property
+    def held(self) -> frozenset[int]:
+        """Indeks key yang sedang disewa worker ini."""
+        return self._held
+
+    def holds(self, index: int) -> bool:
+        return index in self._held
+
+    def mark_used(self, index: int):
+        """Mencatat bahwa key `index` baru saja dipakai untuk request."""
+        self._last_used[index] = self._clock()
+
+    def start(self, wait: float | None = None) -> 'KeyLeaseCoordinator':
+        """
+        Mendaftarkan worker, menyewa jatah key pertama dan menjalankan heartbeat.
+        Menunggu sampai ada minimal satu key (worker lebih banyak dari key
+        harus antre); `TimeoutError` jika lebih lama dari `wait` detik.
+        """
+        self.rebalance()
+        self._thread = threading.Thread(target=self._heartbeat, name='key-lease', daemon=True)
+        self._thread.start()
+        deadline = None if wait is None else time.monotonic() + wait
+        with self._changed:
+            while not self._held:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError(f'Tidak ada API Key bebas dalam {wait:.0f} detik (semua disewa worker lain).')
+                logger.info("⏳ Semua API Key sedang disewa worker lain, menunggu giliran...")
+                self._changed.wait(remaining)
+        return self
+
+    def _heartbeat(self):
+        # Selama belum memegang key, cek lebih sering agar cepat mendapat key yang dilepas worker lain
+        while not self._stop.wait(self.ttl / 3 if self._held else min(1.0, self.ttl / 3)):
+            try:
+                self.rebalance()
+            except sqlite3.Error as e:
+                logger.error(f"❌ Gagal memperpanjang lease API Key: {e}")
+
+    def rebalance(self) -> tuple[set[int], set[int]]:
+        """
+        Memperpanjang lease dan menyesuaikan jumlah key dengan jatah adil.
+        Mengembalikan (key yang baru disewa, key yang dilepas).
+        """
+        now = self._clock()
+        index_of = {kid: index for index, kid in enumerate(self._key_ids)}
+        acquired = {}
+        with self._lock:
+            conn = self._conn
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.execute(
+                    'INSERT INTO lease_workers (owner, heartbeat) VALUES (?, ?) '
+                    'ON CONFLICT(owner) DO UPDATE SET heartbeat = excluded.heartbeat',
+                    (self.owner, now)
+                )
+                conn.execute('DELETE FROM lease_workers WHERE heartbeat <= ?', (now - self.ttl,))
+                # Lease kedaluwarsa dibebaskan; pemakaian terakhirnya paling lambat saat kedaluwarsa
+                conn.execute(
+                    'UPDATE key_leases SET owner = NULL, idle_since = expires WHERE owner IS NOT NULL AND expires <= ?',
+                    (now,)
+                )
+                conn.executemany(
+                    'INSERT OR IGNORE INTO key_leases (key_id, owner, expires, idle_since) VALUES (?, NULL, 0, 0)',
+                    [(kid,) for kid in self._key_ids]
+                )
+                workers = conn.execute('SELECT COUNT(*) FROM lease_workers').fetchone()[0]
+                share = math.ceil(len(self._key_ids) / max(1, workers))
+
+                mine = [kid for (kid,) in conn.execute('SELECT key_id FROM key_leases WHERE owner = ?', (self.owner,))
+                        if kid in index_of]
+                released = sorted(mine, key=index_of.get)[share:]
+                for kid in released:
+                    conn.execute(
+                        'UPDATE key_leases SET owner = NULL, idle_since = ? WHERE key_id = ? AND owner = ?',
+                        (self._last_used.get(index_of[kid], 0.0), kid, self.owner)
+                    )
+                kept = [kid for kid in mine if kid not in released]
+                conn.execute('UPDATE key_leases SET expires = ? WHERE owner = ?', (now + self.ttl, self.owner))
+
+                if len(kept) < share:
+                    # Key yang paling lama menganggur diambil lebih dulu
+                    free = conn.execute(
+                        'SELECT key_id, idle_since FROM key_leases WHERE owner IS NULL ORDER BY idle_since'
+                    ).fetchall()
+                    for kid, idle_since in free:
+                        if len(kept) >= share:
+                            break
+                        if kid not in index_of:
+                            continue
+                        conn.execute(
+                            'UPDATE key_leases SET owner = ?, expires = ? WHERE key_id = ?',
+                            (self.owner, now + self.ttl, kid)
+                        )
+                        kept.append(kid)
+                        acquired[index_of[kid]] = idle_since
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+
+            before = self._held
+            self._held = frozenset(index_of[kid] for kid in kept)
+            lost = set(before - self._held)
+            gained = set(self._held - before)
+            self._changed.notify_all()
+
+        if gained or lost:
+            logger.info(
+                f"🔑 Lease API Key: memegang {sorted(self._held)} dari {len(self._key_ids)} key "
+                f"({workers} worker aktif, jatah {share})."
+            )
+        if self.on_acquire is not None:
+            for index in gained:
+                self.on_acquire(index, acquired.get(index, 0.0))
+        return gained, lost
+
+    def close(self):
+        """Menghentikan heartbeat dan melepas semua lease agar langsung bisa dipakai worker lain."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        with self._lock:
+            try:
+                self._conn.execute('BEGIN IMMEDIATE')
+                self._conn.executemany(
+                    'UPDATE key_leases SET owner = NULL, idle_since = ? WHERE key_id = ? AND owner = ?',
+                    [(self._last_used.get(index, 0.0), kid, self.owner) for index, kid in enumerate(self._key_ids)]
+                )
+                self._conn.execute('DELETE FROM lease_workers WHERE owner = ?', (self.owner,))
+                self._conn.execute('COMMIT')
+            finally:
+                self._held = frozenset()
+                self._conn.close()
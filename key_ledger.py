@@ -0,0 +1,113 @@
+import hashlib
+import sqlite3
+import threading
+import time
+import logging
+
+from rate_limiter import DAY_WINDOW, FREE_TIER_RPD
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LEDGER_PATH = 'key-ledger.sqlite3'
+
+
+def key_id(api_key: str) -> str:
+    """
+    Identitas API key untuk disimpan di disk. Key asli tidak pernah ditulis,
+    hanya potongan hash SHA-256-nya.
+    """
+    return hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:16]
+
+
+class KeyLedger:
+    """
+    Catatan pemakaian kuota per API key yang bertahan setelah proses restart.
+
+    Setiap request yang dikirim dan setiap penolakan RESOURCE_EXHAUSTED
+    disimpan di SQLite dengan timestamp, lalu dibaca kembali dalam jendela
+    geser 24 jam untuk mengetahui key mana yang sudah habis kuota hariannya.
+    Penolakan kuota harian dicatat terpisah dari blokir singkat (RPM/TPM),
+    yang hanya menahan key sebentar dan tidak membuatnya dianggap habis.
+    """
+
+    def __init__(self, path: str = DEFAULT_LEDGER_PATH, rpd: int = FREE_TIER_RPD, clock=time.time):
+        self.path = path
+        self.rpd = rpd
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS usage (key_id TEXT NOT NULL, timestamp REAL NOT NULL, tokens INTEGER NOT NULL)'
+            )
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS exhaustion ('
+                'key_id TEXT NOT NULL, timestamp REAL NOT NULL, until REAL NOT NULL, daily INTEGER NOT NULL DEFAULT 0)'
+            )
+            self._conn.execute('CREATE INDEX IF NOT EXISTS usage_key_time ON usage (key_id, timestamp)')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS exhaustion_key_until ON exhaustion (key_id, until)')
+        self.prune()
+
+    def record_usage(self, api_key: str, tokens: int = 0, timestamp: float | None = None):
+        """Mencatat satu request yang dikirim dengan key ini (berhasil atau tidak, tetap dihitung server)."""
+        timestamp = self._clock() if timestamp is None else timestamp
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT INTO usage (key_id, timestamp, tokens) VALUES (?, ?, ?)',
+                (key_id(api_key), timestamp, tokens)
+            )
+
+    def record_exhausted(self, api_key: str, until: float, timestamp: float | None = None, daily: bool = False):
+        """
+        Mencatat penolakan kuota; key ditahan sampai `until`. Hanya penolakan
+        `daily` (kuota harian) yang membuat key dianggap habis.
+        """
+        timestamp = self._clock() if timestamp is None else timestamp
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT INTO exhaustion (key_id, timestamp, until, daily) VALUES (?, ?, ?, ?)',
+                (key_id(api_key), timestamp, until, int(daily))
+            )
+
+    def usage_events(self, api_key: str, window: float = DAY_WINDOW) -> list[tuple[float, int]]:
+        """Daftar (timestamp, tokens) pemakaian key dalam jendela waktu terakhir, urut dari terlama."""
+        since = self._clock() - window
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT timestamp, tokens FROM usage WHERE key_id = ? AND timestamp > ? ORDER BY timestamp',
+                (key_id(api_key), since)
+            ).fetchall()
+        return [(timestamp, tokens) for timestamp, tokens in rows]
+
+    def blocked_until(self, api_key: str, daily_only: bool = False) -> float:
+        """
+        Timestamp hingga key ditahan karena penolakan kuota (0 jika tidak
+        ditahan); dengan `daily_only` hanya penolakan kuota harian yang dihitung.
+        """
+        query = 'SELECT MAX(until) FROM exhaustion WHERE key_id = ?'
+        if daily_only:
+            query += ' AND daily = 1'
+        with self._lock:
+            row = self._conn.execute(query, (key_id(api_key),)).fetchone()
+        return row[0] or 0.0
+
+    def is_exhausted(self, api_key: str) -> bool:
+        """
+        True jika kuota harian key habis: seluruh RPD sudah terpakai dalam
+        24 jam terakhir, atau server menolak karena kuota harian. Blokir
+        singkat (RPM/TPM) tidak dihitung; lihat `blocked_until`.
+        """
+        if self.blocked_until(api_key, daily_only=True) > self._clock():
+            return True
+        return len(self.usage_events(api_key)) >= self.rpd
+
+    def prune(self):
+        """Menghapus catatan yang sudah keluar dari jendela 24 jam."""
+        now = self._clock()
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM usage WHERE timestamp <= ?', (now - DAY_WINDOW,))
+            self._conn.execute('DELETE FROM exhaustion WHERE until <= ?', (now,))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
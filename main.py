@@ -1,4 +1,3 @@
-from google import genai
 from google.genai import types
 from google.genai.errors import APIError
 import wave
@@ -6,6 +5,10 @@ import time
 import logging
 import os
 import glob
+import re
+import threading
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed, wait
 
 # Konfigurasi Logger
 logger = logging.getLogger(__name__)
@@ -21,31 +24,83 @@ logging.basicConfig(
 FFMPEG_EXECUTABLE_PATH = r"ffmpeg.exe" 
 # Jika Anda menggunakan Linux/macOS, path mungkin seperti: r"/usr/local/bin/ffmpeg"
 
-# Atur variabel lingkungan agar pydub dapat menemukan FFmpeg
+# Atur variabel lingkungan agar encoder FFmpeg (ffmpeg_stream.py) dapat menemukan FFmpeg
 try:
     if os.path.exists(FFMPEG_EXECUTABLE_PATH):
         os.environ["FFMPEG_PATH"] = FFMPEG_EXECUTABLE_PATH
-        # Tambahkan folder bin-nya ke PATH agar pydub menemukannya dengan mudah
+        # Tambahkan folder bin-nya ke PATH agar FFmpeg ditemukan dengan mudah
         os.environ["PATH"] += os.pathsep + os.path.dirname(FFMPEG_EXECUTABLE_PATH)
         logging.info("✅ Path FFmpeg berhasil diatur secara manual.")
     else:
         logging.warning(f"⚠️ FFmpeg tidak ditemukan di path yang ditentukan: {FFMPEG_EXECUTABLE_PATH}")
-        logging.warning("Pydub mungkin gagal jika FFmpeg tidak ada di PATH sistem.")
+        logging.warning("Output selain .wav akan gagal jika FFmpeg tidak ada di PATH sistem.")
 
 except Exception as e:
     logging.error(f"❌ Gagal mengatur variabel lingkungan FFmpeg: {e}")
 
-from pydub import AudioSegment
+from rate_limiter import (
+    KeySlots, RateLimiterPool, RateLimitExceeded, estimate_tokens,
+    DAY_WINDOW, MINUTE_WINDOW, FREE_TIER_RPM, FREE_TIER_TPM, FREE_TIER_RPD, LEASE_POLL_INTERVAL
+)
+from key_ledger import KeyLedger
+from key_lease import KeyLeaseCoordinator, DEFAULT_LEASE_PATH, DEFAULT_LEASE_TTL
+from audio_cache import AudioCache, cache_key, DEFAULT_CACHE_DIR, DEFAULT_CACHE_MAX_BYTES
+from client_pool import ClientPool
+from job_manifest import JobManifest, manifest_path_for, is_valid_wav, STATUS_DONE, STATUS_FAILED
+from wav_stream import concat_wav_files, wav_params, OrderedWavWriter, SegmentedWavWriter, PLAYLIST_EXTENSIONS, silence_pcm
+from ffmpeg_stream import OrderedFfmpegWriter, encode_wav_files
+from script_parser import split_script_into_chunks
+from dialogue import split_dialogue_into_chunks, speaker_voices
+from chunk_packer import char_budget, pack_sentences, split_sentences
+from retry_policy import (
+    RetryPolicy, RetryState, RetryExhausted, AudioParseError, QUOTA, INVALID_KEY, FATAL,
+    classify_error, server_retry_delay
+)
+from key_health import KeyHealthTracker
+from post_process import PostProcessor
+from audio_dsp import ChunkJoiner, numpy_available
+from metrics import (
+    Metrics, REQUESTS, REQUEST_SECONDS, PCM_BYTES, CHARS_SENT, TOKENS_SENT,
+    RETRIES, KEY_ROTATIONS, SLEEP_SECONDS, CACHE_HITS, COALESCED, STAGE_SECONDS
+)
+from coalesce import InFlightRequests
+from hedging import HedgePolicy, HEDGE_POLL_INTERVAL
+
+# Model TTS yang dipakai untuk semua request
+TTS_MODEL = "gemini-2.5-flash-preview-tts"
 
 # --- Konfigurasi Global dan API Key Management ---
 # Variabel Global untuk Rotasi Key
 # Asumsi: API keys dimuat dari file 'api-keys.txt' (satu key per baris)
 API_KEYS_LIST = []
 current_api_key_index = 0
+# Ledger kuota persisten (None jika tidak dipakai), lihat key_ledger.py
+KEY_LEDGER: KeyLedger | None = None
+# Client Gemini per key, dipakai ulang agar koneksi HTTP tetap hidup (keep-alive)
+CLIENT_POOL = ClientPool()
+# Cache PCM berbasis isi chunk (None jika tidak dipakai), lihat audio_cache.py
+AUDIO_CACHE: AudioCache | None = None
+# Skor kesehatan per key (latensi, error rate, karantina), dibuat oleh load_api_keys
+KEY_HEALTH: KeyHealthTracker | None = None
+# Lease key bersama antar proses (None jika hanya satu proses), lihat key_lease.py
+KEY_LEASES: KeyLeaseCoordinator | None = None
+# Counter dan histogram request/tahap pipeline, diekspor di akhir job (lihat metrics.py)
+METRICS = Metrics()
+# Request chunk yang sedang berjalan, agar chunk identik dari job lain tidak dikirim dua kali
+IN_FLIGHT = InFlightRequests()
+# Penjadwal kuota yang sedang hidup, di-seed ulang dari ledger saat key diambil alih proses lain
+RATE_LIMITERS = weakref.WeakSet()
 
-def load_api_keys(filepath='api-keys.txt'):
-    """Memuat daftar API Key dari file teks."""
-    global API_KEYS_LIST
+def load_api_keys(filepath='api-keys.txt', ledger_path: str | None = None):
+    """
+    Memuat daftar API Key dari file teks.
+
+    Jika `ledger_path` diberikan, ledger kuota dibuka dan key yang kuota
+    hariannya sudah habis (menurut catatan 24 jam terakhir) dilewati sejak awal.
+    Key yang hanya terkena blokir singkat (RPM/TPM) tetap dimuat dan
+    diistirahatkan sampai blokirnya selesai.
+    """
+    global API_KEYS_LIST, KEY_LEDGER, KEY_HEALTH, current_api_key_index
     try:
         with open(filepath, 'r') as f:
             # Membaca semua baris dan menghilangkan spasi/newline
@@ -53,17 +108,111 @@ def load_api_keys(filepath='api-keys.txt'):
             if not keys:
                 raise ValueError("File 'api-keys.txt' kosong atau tidak berisi key.")
             API_KEYS_LIST = keys
+            KEY_HEALTH = KeyHealthTracker(len(keys))
             logger.info(f"Ditemukan {len(API_KEYS_LIST)} API Key.")
     except FileNotFoundError:
         raise FileNotFoundError(f"File '{filepath}' tidak ditemukan. Buat file dan isi key di dalamnya.")
 
+    if ledger_path:
+        KEY_LEDGER = KeyLedger(ledger_path)
+        for index, key in enumerate(API_KEYS_LIST):
+            KEY_HEALTH.cool_down(index, KEY_LEDGER.blocked_until(key))
+        available = [i for i, key in enumerate(API_KEYS_LIST) if not KEY_LEDGER.is_exhausted(key)]
+        if not available:
+            raise ValueError('Semua API Key sudah habis kuotanya dalam 24 jam terakhir (menurut ledger).')
+        skipped = len(API_KEYS_LIST) - len(available)
+        if skipped:
+            logger.warning(f"⚠️ {skipped} API Key dilewati karena kuotanya habis menurut ledger.")
+        # Mulai dari key yang paling cepat lepas dari blokir singkat; menunggunya urusan penjadwal
+        current_api_key_index = min(available, key=lambda index: KEY_LEDGER.blocked_until(API_KEYS_LIST[index]))
+
+def init_key_leases(path: str = DEFAULT_LEASE_PATH, ttl: float = DEFAULT_LEASE_TTL, wait: float | None = None):
+    """
+    Membagi key dengan proses lain yang memakai file lease `path` yang sama:
+    proses ini hanya memakai key yang sedang disewanya (lihat key_lease.py).
+    Panggil setelah `load_api_keys`. Menunggu sampai minimal satu key disewa.
+    """
+    global KEY_LEASES
+    if KEY_LEASES is not None:
+        KEY_LEASES.close()
+    KEY_LEASES = KeyLeaseCoordinator(path, API_KEYS_LIST, ttl, on_acquire=_on_key_leased).start(wait)
+
+def close_key_leases():
+    """Melepas semua lease agar key langsung bisa dipakai proses lain."""
+    global KEY_LEASES
+    if KEY_LEASES is not None:
+        KEY_LEASES.close()
+        KEY_LEASES = None
+
+def _on_key_leased(key_index: int, idle_since: float):
+    """
+    Key yang baru saja dipakai proses lain diistirahatkan sampai jendela
+    1 menitnya bersih, agar RPM/TPM proses itu tidak terbawa ke sini. Jika
+    ledger aktif, hitungan RPD penjadwal kuota yang sedang berjalan di-seed
+    ulang dari ledger, dan key yang kuota hariannya habis tidak dipakai.
+    """
+    api_key = API_KEYS_LIST[key_index]
+    until = idle_since + MINUTE_WINDOW
+    if KEY_HEALTH is not None and until > time.time():
+        logger.info(f"🔑 API Key index {key_index} baru dipakai proses lain, dipakai lagi setelah {until - time.time():.0f} detik.")
+        KEY_HEALTH.cool_down(key_index, until)
+    if KEY_LEDGER is None:
+        return
+    blocked_until = KEY_LEDGER.blocked_until(api_key)
+    if KEY_LEDGER.is_exhausted(api_key):
+        logger.warning(f"⚠️ API Key index {key_index} yang diambil alih sudah kehabisan kuota, tidak dipakai dulu.")
+    if KEY_HEALTH is not None:
+        KEY_HEALTH.cool_down(key_index, blocked_until)
+    events = KEY_LEDGER.usage_events(api_key)
+    for rate_limiter in list(RATE_LIMITERS):
+        rate_limiter.seed(key_index, events, blocked_until)
+
+def init_audio_cache(directory: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_CACHE_MAX_BYTES):
+    """Mengaktifkan cache audio sehingga chunk yang identik tidak perlu request ulang ke API."""
+    global AUDIO_CACHE
+    AUDIO_CACHE = AudioCache(directory, max_bytes)
+
 def get_current_api_key():
-    """Mengembalikan API Key yang saat ini digunakan."""
+    """
+    Mengembalikan API Key yang saat ini digunakan. Key yang dikarantina,
+    sedang diistirahatkan, atau (jika ledger aktif) kuotanya habis dilewati;
+    jika key lain lebih sehat, indeks global dipindahkan ke key tersebut.
+
+    Jika semua key yang tersisa hanya sedang diistirahatkan, fungsi ini
+    menunggu key yang paling cepat pulih. `RateLimitExceeded` jika semua key
+    kehabisan kuota harian; None hanya jika semua key dikarantina.
+    """
+    global current_api_key_index
     if not API_KEYS_LIST:
         return None
-    # Pastikan indeks berada dalam batas
-    index = current_api_key_index % len(API_KEYS_LIST)
-    return API_KEYS_LIST[index]
+    while True:
+        # Pastikan indeks berada dalam batas
+        index = current_api_key_index % len(API_KEYS_LIST)
+        order = [(index + offset) % len(API_KEYS_LIST) for offset in range(len(API_KEYS_LIST))]
+        unusable = set()
+        if KEY_LEDGER is not None:
+            unusable.update(candidate for candidate in order if KEY_LEDGER.is_exhausted(API_KEYS_LIST[candidate]))
+        if KEY_LEASES is not None:
+            unusable.update(candidate for candidate in order if not KEY_LEASES.holds(candidate))
+        if KEY_HEALTH is not None:
+            order = KEY_HEALTH.rank(order)
+        order = [candidate for candidate in order if candidate not in unusable]
+        if order:
+            current_api_key_index = order[0]
+            return API_KEYS_LIST[current_api_key_index]
+
+        if KEY_LEASES is not None and not KEY_LEASES.held:
+            # Key yang disewa bisa berganti di heartbeat berikutnya
+            time.sleep(LEASE_POLL_INTERVAL)
+            continue
+        wait = KEY_HEALTH.seconds_until_available(unusable) if KEY_HEALTH is not None else None
+        if wait is None:
+            if KEY_HEALTH is not None and all(health.quarantined for health in KEY_HEALTH.keys):
+                logger.error("❌ Semua API Key dikarantina (ditolak server).")
+                return None
+            raise RateLimitExceeded('Semua API Key kehabisan kuota harian (menurut ledger).')
+        logger.info(f"⏳ Semua API Key sedang diistirahatkan, menunggu {wait:.0f} detik...")
+        time.sleep(max(wait, 0.01))
 
 def rotate_api_key():
     """Memutar indeks ke API Key berikutnya."""
@@ -71,11 +220,98 @@ def rotate_api_key():
     current_api_key_index = (current_api_key_index + 1) % len(API_KEYS_LIST)
     logger.warning(f"API Key diputar. Index berikutnya: {current_api_key_index}")
 
+def _rotate_key(key_index: int, key_slots: KeySlots | None) -> int:
+    """
+    Rotasi key untuk satu request. Mode sekuensial memutar indeks global,
+    mode konkuren hanya memindahkan key pilihan worker tersebut.
+    """
+    if key_slots is None:
+        rotate_api_key()
+        return current_api_key_index
+    next_index = (key_index + 1) % len(API_KEYS_LIST)
+    logger.warning(f"API Key diputar (lokal). Index berikutnya: {next_index}")
+    return next_index
+
+def _quota_block_seconds(error: APIError) -> float:
+    """
+    Lama key ditahan setelah RESOURCE_EXHAUSTED: sehari penuh jika yang habis
+    kuota harian, selain itu sesuai jeda dari server (atau satu menit).
+    """
+    if 'PerDay' in str(error):
+        return DAY_WINDOW
+    delay = server_retry_delay(error)
+    return MINUTE_WINDOW if delay is None else delay
+
+def _record_quota_exhausted(error: APIError, api_key: str, key_index: int, key_slots: KeySlots | None):
+    """Menahan key yang kuotanya habis di rate limiter, skor kesehatan dan ledger (jika aktif)."""
+    block_seconds = _quota_block_seconds(error)
+    if KEY_HEALTH is not None:
+        KEY_HEALTH.record_failure(key_index, QUOTA, cooldown=block_seconds)
+    if isinstance(key_slots, RateLimiterPool):
+        key_slots.block_key(key_index, block_seconds)
+    if KEY_LEDGER is not None:
+        KEY_LEDGER.record_exhausted(api_key, time.time() + block_seconds, daily=block_seconds >= DAY_WINDOW)
+
+# --- Request & Respons TTS ---
+def build_tts_config(voice: str | dict[str, str], temperature: float = 0.7) -> types.GenerateContentConfig:
+    """
+    Konfigurasi permintaan TTS untuk satu suara, atau untuk dialog jika
+    `voice` berupa {nama pembicara: suara} (lihat `chunk_voice`).
+    """
+    if isinstance(voice, dict):
+        speech_config = types.SpeechConfig(
+            multi_speaker_voice_config=types.MultiSpeakerVoiceConfig(
+                speaker_voice_configs=[
+                    types.SpeakerVoiceConfig(
+                        speaker=speaker,
+                        voice_config=types.VoiceConfig(
+                            prebuilt_voice_config=types.PrebuiltVoiceConfig(voice_name=voice_name)
+                        )
+                    )
+                    for speaker, voice_name in voice.items()
+                ]
+            )
+        )
+    else:
+        speech_config = types.SpeechConfig(
+            voice_config=types.VoiceConfig(
+                prebuilt_voice_config=types.PrebuiltVoiceConfig(
+                    voice_name=voice,
+                )
+            )
+        )
+    return types.GenerateContentConfig(
+        temperature=temperature,    
+        response_modalities=["AUDIO"],
+        speech_config=speech_config,
+    )
+
+def chunk_voice(prompt: str, voice: str | dict[str, str]) -> str | dict[str, str]:
+    """
+    Suara untuk satu chunk. Di mode dialog `voice` berisi suara semua
+    pembicara, dan yang dipakai hanya dua pembicara chunk ini (lihat
+    `dialogue.speaker_voices`); selain itu `voice` apa adanya.
+    """
+    return speaker_voices(prompt, voice) if isinstance(voice, dict) else voice
+
+def extract_audio_data(response) -> bytes:
+    """Mengambil PCM dari respons Gemini."""
+    try:
+        return response.candidates[0].content.parts[0].inline_data.data
+    except (AttributeError, IndexError, TypeError) as e:
+        # Dicoba lagi sesuai retry policy (lihat retry_policy.py)
+        logger.error(f'❌ Gagal mengambil data audio. Error: {e}')
+        raise AudioParseError("Gagal parsing respons audio.") from e
+
 # --- Fungsi Utility WAV (Diperbarui) ---
+def chunk_output_path(filename: str, chunk_index: int) -> str:
+    """Nama file WAV untuk satu chunk, misal: 'out_rotated_01.wav'."""
+    return f"{os.path.splitext(filename)[0]}_{chunk_index:02d}.wav"
+
 def save_audio_to_wav(filename: str, pcm_data: bytes, chunk_index: int):
     """Menulis data PCM audio biner ke file WAV dengan indeks chunk."""
     # Menghasilkan nama file yang unik, misal: 'out_rotated_01.wav'
-    final_filename = f"{os.path.splitext(filename)[0]}_{chunk_index:02d}.wav"
+    final_filename = chunk_output_path(filename, chunk_index)
     
     # ... (sisa implementasi wave.open tetap sama)
     try:
@@ -88,220 +324,905 @@ def save_audio_to_wav(filename: str, pcm_data: bytes, chunk_index: int):
     except Exception as e:
         logger.error(f"❌ Error saat menyimpan file WAV: {e}")
 
+def _emit_audio(base_filename: str, pcm_data: bytes, chunk_index: int, audio_sink=None):
+    """Menyerahkan PCM satu chunk ke `audio_sink` jika ada, atau menyimpannya sebagai file chunk."""
+    with METRICS.stage('save'):
+        if audio_sink is None:
+            save_audio_to_wav(base_filename, pcm_data, chunk_index)
+        else:
+            audio_sink(chunk_index, pcm_data)
+
 # --- Fungsi Pembagi Teks ---
-def split_text_into_chunks_by_chars(full_text: str, max_chars_per_chunk: int) -> list[str]:
+def split_text_into_chunks_by_chars(
+    full_text: str,
+    max_chars_per_chunk: int,
+    max_tokens_per_chunk: int | None = None
+) -> list[str]:
     """
-    Membagi teks menjadi chunk berdasarkan batas karakter yang diterima sebagai argumen, 
-    berusaha memecah pada akhir kalimat.
+    Membagi teks menjadi chunk berdasarkan batas karakter (dan token, jika
+    diberikan) yang diterima sebagai argumen, selalu memecah pada akhir kalimat.
+
+    Jumlah chunk dibuat sesedikit mungkin (setiap chunk = 1 request dari
+    jatah RPD), lalu ukurannya diratakan agar tidak ada chunk terakhir yang
+    kecil. Lihat `chunk_packer.pack_balanced`.
     """
     
     # Menghilangkan spasi berlebihan dan mempersingkat teks
     clean_text = ' '.join(full_text.split())
-    
-    chunks = []
-    current_start = 0
-    total_length = len(clean_text)
-
-    while current_start < total_length:
-        remaining_length = total_length - current_start
-        
-        # Jika sisa teks kurang dari batas maksimum, ambil semuanya
-        if remaining_length <= max_chars_per_chunk:
-            chunk = clean_text[current_start:]
-            chunks.append(chunk)
-            break
-            
-        # Tentukan titik potong maksimum
-        max_end = current_start + max_chars_per_chunk
-        
-        # Cari titik potong yang 'bersih' (akhir kalimat: '.', '!', '?')
-        split_point = -1
-        
-        # Cari tanda titik/tanya/seru dalam 200 karakter terakhir sebelum batas
-        search_area_start = max_end - 200
-        if search_area_start < current_start:
-             search_area_start = current_start
+    if not clean_text:
+        return []
 
-        match = re.search(r'[.?!]\s', clean_text[search_area_start:max_end], re.DOTALL | re.IGNORECASE)
-        
-        if match:
-            # Hitung posisi absolut titik potong
-            relative_index = match.end()
-            split_point = search_area_start + relative_index
-        
-        # Jika tidak ditemukan titik potong yang bagus, potong saja pada batas maksimum
-        if split_point == -1 or split_point <= current_start:
-            split_point = max_end
-            
-        chunk = clean_text[current_start:split_point].strip()
-        chunks.append(chunk)
-        
-        # Update posisi awal untuk chunk berikutnya
-        current_start = split_point
+    limit = char_budget(max_chars_per_chunk, max_tokens_per_chunk)
+    chunks = pack_sentences(split_sentences(clean_text, limit), limit)
         
-    logger.info(f"Teks dibagi menjadi {len(chunks)} chunk (Max {max_chars_per_chunk} karakter/chunk) untuk menghemat RPD.")
+    logger.info(f"Teks dibagi menjadi {len(chunks)} chunk (Max {limit} karakter/chunk) untuk menghemat RPD.")
     return chunks
 
+def prepare_chunks(
+    full_prompt: str,
+    max_chars_per_chunk: int,
+    max_tokens_per_chunk: int | None = None,
+    script_mode: bool = False,
+    speaker_voices_map: dict[str, str] | None = None
+) -> tuple[list[str], dict[int, float]]:
+    """
+    Membagi teks menjadi chunk siap kirim tanpa memanggil API. Jika
+    `speaker_voices_map` diberikan, teks diurai sebagai dialog "Nama: teks"
+    (lihat dialogue.py) dan setiap pembicara harus punya suara.
+
+    Returns:
+        Daftar teks chunk dan dict {indeks chunk (mulai 1): detik hening setelahnya}.
+    """
+    if speaker_voices_map is not None:
+        script_chunks = split_dialogue_into_chunks(full_prompt, speaker_voices_map, max_chars_per_chunk, max_tokens_per_chunk)
+        for chunk in script_chunks:
+            speaker_voices(chunk.text, speaker_voices_map)
+    elif not script_mode:
+        return split_text_into_chunks_by_chars(full_prompt, max_chars_per_chunk, max_tokens_per_chunk), {}
+    else:
+        script_chunks = split_script_into_chunks(full_prompt, max_chars_per_chunk, max_tokens_per_chunk)
+    pauses = {i: chunk.pause_after for i, chunk in enumerate(script_chunks, start=1) if chunk.pause_after > 0}
+    return [chunk.text for chunk in script_chunks], pauses
+
+def predict_request_count(text_chunks: list[str], voice: str | dict[str, str], temperature: float = 0.7) -> int:
+    """Perkiraan jumlah request ke API untuk chunk ini (chunk yang sudah ada di cache audio tidak dihitung)."""
+    if AUDIO_CACHE is None:
+        return len(text_chunks)
+    return sum(
+        1 for chunk in text_chunks
+        if not AUDIO_CACHE.contains(cache_key(chunk, chunk_voice(chunk, voice), temperature, TTS_MODEL))
+    )
+
+def _report_request_plan(pending: list[tuple[int, str]], total_chunks: int, voice: str | dict[str, str], temperature: float):
+    """Mencatat perkiraan jumlah request sebelum ada panggilan API, dan memperingatkan jika melebihi sisa RPD."""
+    predicted = predict_request_count([chunk for _, chunk in pending], voice, temperature)
+    logger.info(
+        f"📋 Rencana: {total_chunks} chunk, {len(pending)} perlu diproses, "
+        f"perkiraan {predicted} request ke API (sisanya dari cache)."
+    )
+    remaining = remaining_daily_requests()
+    if remaining is not None and predicted > remaining:
+        logger.warning(f"⚠️ Sisa kuota harian semua key hanya {remaining} request, job ini butuh {predicted}.")
+
+def set_hedge_budget(hedge: HedgePolicy, num_keys: int, predicted_requests: int):
+    """
+    Budget hedge = sisa kuota harian dikurangi perkiraan request job ini, agar
+    hedging hanya memakai kuota yang tidak dibutuhkan. Tanpa ledger, kuota
+    harian dianggap masih penuh.
+    """
+    remaining = remaining_daily_requests()
+    if remaining is None:
+        remaining = num_keys * FREE_TIER_RPD
+    hedge.set_budget(remaining - predicted_requests)
+
+def remaining_daily_requests() -> int | None:
+    """
+    Sisa kuota harian semua key (tanpa key yang dikarantina, dan hanya key
+    yang disewa jika lease aktif) menurut ledger, atau None jika ledger tidak aktif.
+    """
+    if KEY_LEDGER is None:
+        return None
+    return sum(
+        max(0, KEY_LEDGER.rpd - len(KEY_LEDGER.usage_events(key)))
+        for index, key in enumerate(API_KEYS_LIST)
+        if (KEY_HEALTH is None or not KEY_HEALTH.keys[index].quarantined)
+        and (KEY_LEASES is None or KEY_LEASES.holds(index))
+    )
+
+def create_rate_limiter(max_in_flight_per_key: int = 1, max_wait: float | None = None) -> RateLimiterPool:
+    """Membuat penjadwal kuota untuk semua key; riwayat pemakaian dari ledger (jika aktif) ikut dimuat."""
+    rate_limiter = RateLimiterPool(
+        len(API_KEYS_LIST),
+        max_in_flight_per_key=max_in_flight_per_key,
+        max_wait=max_wait,
+        health=KEY_HEALTH,
+        leases=KEY_LEASES
+    )
+    if KEY_LEDGER is not None:
+        # Lanjutkan hitungan kuota dari run sebelumnya
+        for index, key in enumerate(API_KEYS_LIST):
+            rate_limiter.seed(index, KEY_LEDGER.usage_events(key), KEY_LEDGER.blocked_until(key))
+    RATE_LIMITERS.add(rate_limiter)
+    return rate_limiter
+
+def create_key_slots(
+    max_in_flight_per_key: int = 1,
+    rate_limit: bool = False,
+    max_wait: float | None = None
+) -> KeySlots:
+    """Slot per key untuk mode konkuren: penjadwal kuota jika `rate_limit`, selain itu hanya batas in-flight."""
+    if rate_limit:
+        return create_rate_limiter(max_in_flight_per_key, max_wait)
+    return KeySlots(len(API_KEYS_LIST), max_in_flight_per_key, health=KEY_HEALTH, max_wait=max_wait, leases=KEY_LEASES)
+
+def open_ordered_writer(output_filename: str):
+    """
+    Penulis chunk berurutan: WAV yang sudah bisa diputar selagi ditulis,
+    .m3u/.m3u8 sebagai segmen WAV per chunk plus playlist, format lain
+    (.mp3, .opus, ...) langsung di-encode FFmpeg.
+    """
+    extension = os.path.splitext(output_filename)[1].lower()
+    if extension == '.wav':
+        return OrderedWavWriter(output_filename)
+    if extension in PLAYLIST_EXTENSIONS:
+        return SegmentedWavWriter(output_filename)
+    return OrderedFfmpegWriter(output_filename)
+
+def create_chunk_joiner(target_dbfs: float | None = None) -> ChunkJoiner | None:
+    """
+    Penghalus sambungan chunk (potong hening, samakan gain, crossfade), atau
+    None jika NumPy tidak terinstal.
+    """
+    if not numpy_available():
+        logger.warning("⚠️ NumPy tidak terinstal, sambungan chunk tidak dihaluskan. Install dengan: uv sync --extra dsp")
+        return None
+    return ChunkJoiner(target_dbfs=target_dbfs)
+
+def create_post_processor(
+    output_filename: str,
+    pauses: dict[int, float],
+    normalize_dbfs: float | None = None,
+    smooth_joins: bool = False
+) -> PostProcessor:
+    """
+    Worker mode pipeline yang menulis chunk ke `output_filename` sesuai urutan.
+    Jika `smooth_joins`, sambungan chunk dihaluskan dengan `audio_dsp.ChunkJoiner`.
+    """
+    joiner = create_chunk_joiner(normalize_dbfs) if smooth_joins else None
+    return PostProcessor(open_ordered_writer(output_filename), pauses, normalize_dbfs, joiner, metrics=METRICS)
+
+def with_pauses(audio_sink, pauses: dict[int, float], base_filename: str):
+    """
+    Membungkus `audio_sink` agar hening [JEDA] ditambahkan setelah chunk yang
+    punya jeda. Cache audio tetap menyimpan PCM asli dari API.
+    """
+    if not pauses:
+        return audio_sink
+
+    def sink(chunk_index: int, pcm_data: bytes):
+        if chunk_index in pauses:
+            pcm_data += silence_pcm(pauses[chunk_index])
+        _emit_audio(base_filename, pcm_data, chunk_index, audio_sink)
+
+    return sink
+
+def plan_chunks(
+    full_prompt: str,
+    voice: str | dict[str, str],
+    base_filename: str,
+    max_chars_per_chunk: int,
+    temperature: float = 0.7,
+    resume: bool = False,
+    script_mode: bool = False,
+    max_tokens_per_chunk: int | None = None
+):
+    """
+    Membagi teks menjadi chunk dan, jika `resume=True`, membuang chunk yang
+    sudah selesai menurut manifest job. Belum ada panggilan API di sini.
+
+    Returns:
+        Jumlah chunk, daftar (indeks chunk, teks) yang perlu diproses, dict
+        jeda per chunk, dan callback `on_chunk_done(chunk_index, succeeded)`
+        yang mencatat hasil setiap chunk ke manifest.
+    """
+    with METRICS.stage('split'):
+        text_chunks, pauses = prepare_chunks(
+            full_prompt, max_chars_per_chunk, max_tokens_per_chunk, script_mode,
+            voice if isinstance(voice, dict) else None
+        )
+    
+    total_chunks = len(text_chunks)
+    pending = list(enumerate(text_chunks, start=1))
+
+    manifest = None
+    chunk_hashes = {}
+    if resume:
+        manifest = JobManifest.open(manifest_path_for(base_filename))
+        # Chunk lama di luar jumlah chunk sekarang akan ikut tergabung jika dibiarkan
+        for stale_path in manifest.truncate(total_chunks):
+            if os.path.exists(stale_path):
+                os.remove(stale_path)
+                logger.info(f"🗑️ File chunk lama dihapus: {stale_path}")
+        # Jeda lokal ikut di-hash karena ikut tersimpan di file chunk
+        chunk_hashes = {
+            i: cache_key(
+                f"{chunk}\n[JEDA: {pauses[i]}]" if i in pauses else chunk, chunk_voice(chunk, voice), temperature, TTS_MODEL
+            )
+            for i, chunk in pending
+        }
+        pending = [(i, chunk) for i, chunk in pending if not manifest.is_done(i, chunk_hashes[i])]
+        skipped = total_chunks - len(pending)
+        if skipped:
+            logger.info(f"⏭️ {skipped} dari {total_chunks} chunk sudah selesai sebelumnya, dilewati.")
+
+    _report_request_plan(pending, total_chunks, voice, temperature)
+
+    def on_chunk_done(chunk_index: int, succeeded: bool):
+        if manifest is None:
+            return
+        output_path = chunk_output_path(base_filename, chunk_index)
+        status = STATUS_DONE if succeeded and is_valid_wav(output_path) else STATUS_FAILED
+        manifest.mark(chunk_index, chunk_hashes[chunk_index], status, output_path)
+
+    return total_chunks, pending, pauses, on_chunk_done
+
 # --- Fungsi Iterasi Utama ---
 def generate_audio_for_chunks(
     full_prompt: str, 
-    voice: str, 
+    voice: str | dict[str, str], 
     base_filename: str, 
     max_chars_per_chunk: int,
     max_retries: int,          # ARGUMEN BARU
     base_delay: int,           # ARGUMEN BARU
-    temperature: float = 0.7
-):
+    temperature: float = 0.7,
+    concurrent: bool = False,
+    max_in_flight_per_key: int = 1,
+    rate_limit: bool = False,
+    rate_limit_max_wait: float | None = None,
+    resume: bool = False,
+    output_filename: str | None = None,
+    script_mode: bool = False,
+    max_tokens_per_chunk: int | None = None,
+    retry_policy: RetryPolicy | None = None,
+    normalize_dbfs: float | None = None,
+    smooth_joins: bool = False,
+    key_slots: KeySlots | None = None,
+    hedge: HedgePolicy | None = None
+) -> dict[int, float]:
     """
     Memecah teks menjadi chunk dan menghasilkan audio untuk setiap chunk 
-    dengan mekanisme rotasi API key.
+    dengan mekanisme rotasi API key. Satu `retry_policy` dipakai untuk semua
+    chunk (dibuat dari `max_retries`/`base_delay` jika tidak diberikan) dan
+    total waktu tunggu retry dilaporkan di akhir.
+
+    Jika `concurrent=True`, chunk dikirim paralel lewat thread pool yang
+    tersebar ke semua API key (maksimal `max_in_flight_per_key` request per
+    key). Nama file `_NN.wav` tetap mengikuti urutan chunk sehingga
+    `combine_audio_chunks` tidak perlu diubah.
+
+    Jika `output_filename` diberikan (mode pipeline), setiap chunk yang
+    datang langsung divalidasi, dinormalisasi ke `normalize_dbfs` (jika
+    diberikan), diberi hening [JEDA] dan ditulis ke file final oleh thread
+    worker selagi request lain masih berjalan (lihat post_process.py).
+    `smooth_joins` menghaluskan sambungan antar chunk (lihat audio_dsp.py).
+
+    `key_slots` yang diberikan (misal satu pool bersama untuk beberapa job
+    yang berjalan bersamaan, lihat tts_server.py) dipakai menggantikan rate
+    limiter/slot baru, sehingga `rate_limit` dan `max_in_flight_per_key`
+    diabaikan.
+
+    Jika `voice` berupa {nama pembicara: suara}, teks diperlakukan sebagai
+    dialog: giliran berurutan dikirim maksimal dua pembicara per request
+    dengan konfigurasi multi-speaker (lihat dialogue.py).
+
+    Jika `hedge` diberikan (butuh mode konkuren atau rate limiter), chunk yang
+    lambat dikirim juga ke key lain yang menganggur (lihat hedging.py); budget
+    hedge diisi dari sisa kuota harian dikurangi perkiraan request job ini.
+
+    Mode pipeline tidak bisa dilanjutkan (`resume`): chunk lama tidak ada di
+    file final, jadi keduanya sekaligus menimbulkan `ValueError`.
+
+    Mengembalikan jeda [JEDA] per chunk, untuk `combine_audio_chunks`.
     """
-    
+    if resume and output_filename:
+        raise ValueError('resume tidak bisa dipakai bersama output_filename (mode pipeline).')
+
     # 1. Membagi Teks
-    text_chunks = split_text_into_chunks_by_chars(full_prompt, max_chars_per_chunk)
-    
-    total_chunks = len(text_chunks)
-    
+    total_chunks, pending, pauses, on_chunk_done = plan_chunks(
+        full_prompt, voice, base_filename, max_chars_per_chunk, temperature, resume, script_mode, max_tokens_per_chunk
+    )
+
+    if key_slots is not None:
+        rate_limiter = key_slots
+    else:
+        rate_limiter = create_rate_limiter(max_in_flight_per_key, rate_limit_max_wait) if rate_limit else None
+    retry_policy = retry_policy or RetryPolicy(max_attempts=max_retries, base_delay=base_delay)
+    if hedge is not None:
+        set_hedge_budget(hedge, len(API_KEYS_LIST), predict_request_count([chunk for _, chunk in pending], voice, temperature))
+
+    # Mode pipeline: PCM langsung diproses dan ditulis ke file final oleh thread worker, tanpa file chunk
+    writer = create_post_processor(output_filename, pauses, normalize_dbfs, smooth_joins) if output_filename else None
+    audio_sink = writer.submit if writer else with_pauses(None, pauses, base_filename)
+
+    try:
+        if concurrent:
+            _generate_audio_concurrently(
+                pending=pending,
+                total_chunks=total_chunks,
+                voice=voice,
+                base_filename=base_filename,
+                max_retries=max_retries,
+                base_delay=base_delay,
+                temperature=temperature,
+                key_slots=rate_limiter or create_key_slots(max_in_flight_per_key, max_wait=rate_limit_max_wait),
+                on_chunk_done=on_chunk_done,
+                audio_sink=audio_sink,
+                retry_policy=retry_policy,
+                hedge=hedge
+            )
+        else:
+            _generate_audio_sequentially(
+                pending=pending,
+                total_chunks=total_chunks,
+                voice=voice,
+                base_filename=base_filename,
+                max_retries=max_retries,
+                base_delay=base_delay,
+                temperature=temperature,
+                rate_limiter=rate_limiter,
+                on_chunk_done=on_chunk_done,
+                audio_sink=audio_sink,
+                retry_policy=retry_policy,
+                hedge=hedge
+            )
+    finally:
+        retry_policy.report()
+        if hedge is not None:
+            hedge.report()
+        if KEY_HEALTH is not None:
+            KEY_HEALTH.report()
+        if writer is not None:
+            writer.close()
+            logger.info(f"✅ Audio ditulis langsung ke: {output_filename}")
+    return pauses
+
+def _generate_audio_sequentially(
+    pending: list[tuple[int, str]],
+    total_chunks: int,
+    voice: str | dict[str, str],
+    base_filename: str,
+    max_retries: int,
+    base_delay: int,
+    temperature: float,
+    rate_limiter: RateLimiterPool | None,
+    on_chunk_done,
+    audio_sink=None,
+    retry_policy: RetryPolicy | None = None,
+    hedge: HedgePolicy | None = None
+):
+    """Menjalankan request TTS chunk `pending` satu per satu dengan rotasi key global."""
     # 2. Iterasi dan Generasi Audio
-    for i, chunk in enumerate(text_chunks):
-        logger.info(f"\n--- Memproses Chunk {i + 1} dari {total_chunks} ---")
+    for chunk_index, chunk in pending:
+        logger.info(f"\n--- Memproses Chunk {chunk_index} dari {total_chunks} ---")
         
         # Panggil fungsi TTS dengan retry dan rotasi
-        make_tts_request_with_retry(
-            prompt=chunk, 
-            voice=voice, 
-            base_filename=base_filename,
-            chunk_index=i + 1,
-            max_retries=max_retries,     # DITERUSKAN
-            base_delay=base_delay,       # DITERUSKAN
-            temperature=temperature
-        )        
+        try:
+            from_cache = make_tts_request_with_retry(
+                prompt=chunk, 
+                voice=voice, 
+                base_filename=base_filename,
+                chunk_index=chunk_index,
+                max_retries=max_retries,     # DITERUSKAN
+                base_delay=base_delay,       # DITERUSKAN
+                temperature=temperature,
+                key_slots=rate_limiter,
+                preferred_key_index=current_api_key_index,
+                audio_sink=audio_sink,
+                retry_policy=retry_policy,
+                hedge=hedge
+            )
+        except Exception:
+            on_chunk_done(chunk_index, False)
+            raise
+        on_chunk_done(chunk_index, True)
         
         # Opsional: Jeda singkat antar permintaan untuk menghindari rate-limit
-        time.sleep(0.5)
+        # (tidak perlu jika rate limiter sudah menjadwalkan request atau chunk dari cache)
+        if rate_limiter is None and not from_cache:
+            time.sleep(0.5)
+
+def _generate_audio_concurrently(
+    pending: list[tuple[int, str]],
+    total_chunks: int,
+    voice: str | dict[str, str],
+    base_filename: str,
+    max_retries: int,
+    base_delay: int,
+    temperature: float,
+    key_slots: KeySlots,
+    on_chunk_done=None,
+    audio_sink=None,
+    retry_policy: RetryPolicy | None = None,
+    hedge: HedgePolicy | None = None
+):
+    """
+    Menjalankan request TTS chunk `pending` (pasangan indeks chunk dan teks)
+    secara paralel di atas pool API key. `on_chunk_done(chunk_index, succeeded)`
+    dipanggil dari thread pemanggil setiap kali satu chunk selesai.
+    """
+    if not pending:
+        return
+    num_keys = len(API_KEYS_LIST)
+    max_workers = max(1, min(len(pending), num_keys * key_slots.max_in_flight_per_key))
+
+    logger.info(f"Mode konkuren: {len(pending)} chunk, {max_workers} worker, {num_keys} API Key.")
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='tts') as executor:
+        futures = {
+            executor.submit(
+                make_tts_request_with_retry,
+                prompt=chunk,
+                voice=voice,
+                base_filename=base_filename,
+                chunk_index=chunk_index,
+                max_retries=max_retries,
+                base_delay=base_delay,
+                temperature=temperature,
+                key_slots=key_slots,
+                # Sebarkan chunk ke key yang berbeda sejak awal
+                preferred_key_index=chunk_index % num_keys,
+                audio_sink=audio_sink,
+                retry_policy=retry_policy,
+                hedge=hedge
+            ): chunk_index
+            for chunk_index, chunk in pending
+        }
+
+        first_error = None
+        for future in as_completed(futures):
+            chunk_index = futures[future]
+            error = future.exception()
+            if on_chunk_done is not None:
+                on_chunk_done(chunk_index, error is None)
+            if error is not None:
+                logger.error(f"❌ Chunk {chunk_index} gagal: {error}")
+                first_error = first_error or error
+                continue
+            logger.info(f"--- Chunk {chunk_index} dari {total_chunks} selesai ---")
+
+    # Error dari worker dilempar ulang di sini (setelah semua chunk tercatat), sama seperti mode sekuensial
+    if first_error is not None:
+        raise first_error
 
 # --- Fungsi Utama dengan Rotasi Key ---
 def make_tts_request_with_retry(
     prompt: str, 
-    voice: str, 
+    voice: str | dict[str, str], 
     base_filename: str, 
     chunk_index: int, 
     max_retries: int,          # ARGUMEN BARU
     base_delay: int,           # ARGUMEN BARU
-    temperature: float = 0.7
+    temperature: float = 0.7,
+    key_slots: KeySlots | None = None,
+    preferred_key_index: int = 0,
+    audio_sink=None,
+    retry_policy: RetryPolicy | None = None,
+    hedge: HedgePolicy | None = None
 ):
     """
-    Melakukan permintaan TTS dengan mekanisme retry dan rotasi API key
-    jika terjadi ResourceExhaustedError (Kuota Habis).
+    Melakukan permintaan TTS dengan mekanisme retry dan rotasi API key.
+
+    Error diklasifikasikan oleh `retry_policy` (lihat retry_policy.py): kuota
+    habis atau key tidak valid langsung pindah key tanpa menunggu, error
+    sementara dan respons tanpa audio dicoba lagi dengan backoff + jitter
+    (atau jeda dari server), error lain langsung dilempar. Tanpa
+    `retry_policy`, dibuat dari `max_retries` dan `base_delay`.
+
+    Jika `key_slots` diberikan (mode konkuren atau rate limiter), key dipilih
+    lewat slot per key dan rotasi dilakukan secara lokal tanpa mengubah
+    indeks global.
+
+    Jika cache audio aktif dan chunk yang sama pernah dibuat, PCM diambil
+    dari cache tanpa request ke API. Chunk identik (teks, suara, temperature)
+    yang sedang diminta thread lain, misal dari job lain, tidak dikirim
+    ulang: hasil request itu dipakai bersama (lihat coalesce.py).
+    Mengembalikan True jika chunk dilayani dari cache atau request lain.
+    Jika semua percobaan gagal, `RetryExhausted` dilempar.
+
+    Jika `hedge` dan `key_slots` diberikan, chunk yang lambat dikirim juga
+    ke key lain yang menganggur (lihat `_synthesize_hedged`).
+
+    Secara default PCM disimpan ke `<base_filename>_NN.wav`; jika
+    `audio_sink(chunk_index, pcm_data)` diberikan, PCM diserahkan ke sana.
     """
-    
-    max_retries = len(API_KEYS_LIST)
-    if max_retries == 0:
-        raise ValueError('Tidak ada API Key yang tersedia untuk digunakan.')
 
-    for attempt in range(max_retries):
-        api_key = get_current_api_key()
-        
-        if not api_key:
-            logger.error("API Key saat ini tidak valid atau kosong.")
-            if attempt + 1 < max_retries:
-                rotate_api_key()
-                continue
-            else:
-                raise ValueError('Semua API Key tidak valid.')
+    entry_key = cache_key(prompt, chunk_voice(prompt, voice), temperature, TTS_MODEL)
 
-        try:
-            logger.info(f'Mencoba request ke Gemini dengan API Key index: {current_api_key_index} key: {api_key} (Percobaan {attempt + 1}/{max_retries})')
-            
-            # Inisialisasi Klien Gemini
-            client = genai.Client(api_key=api_key)
-            
-            # Konfigurasi Permintaan
-            config = types.GenerateContentConfig(
-                temperature=temperature,    
-                response_modalities=["AUDIO"],
-                speech_config=types.SpeechConfig(
-                    voice_config=types.VoiceConfig(
-                        prebuilt_voice_config=types.PrebuiltVoiceConfig(
-                            voice_name=voice,
-                        )
-                    )
-                ),
+    def fetch() -> tuple[bytes, bool]:
+        if AUDIO_CACHE is not None:
+            cached = AUDIO_CACHE.get(entry_key)
+            if cached is not None:
+                return cached, True
+        if hedge is not None and key_slots is not None:
+            data = _synthesize_hedged(
+                prompt, voice, chunk_index, max_retries, base_delay, temperature, key_slots, preferred_key_index,
+                retry_policy, hedge
             )
-            
-            # Panggilan API
-            response = client.models.generate_content(
-                model="gemini-2.5-flash-preview-tts",
-                contents=prompt,
-                config=config
+        else:
+            data = _synthesize_chunk(
+                prompt, voice, max_retries, base_delay, temperature, key_slots, preferred_key_index, retry_policy
             )
+        if AUDIO_CACHE is not None:
+            AUDIO_CACHE.put(entry_key, data)
+        return data, False
+
+    (pcm_data, from_cache), coalesced = IN_FLIGHT.run(entry_key, fetch)
+    if from_cache:
+        logger.info(f"♻️ Chunk {chunk_index} diambil dari cache audio.")
+        METRICS.inc(CACHE_HITS)
+    elif coalesced:
+        logger.info(f"🔗 Chunk {chunk_index} memakai hasil request identik yang sedang berjalan.")
+        METRICS.inc(COALESCED)
+
+    # Menyimpan File
+    _emit_audio(base_filename, pcm_data, chunk_index, audio_sink)
+    return from_cache or coalesced
+
+def _synthesize_chunk(
+    prompt: str,
+    voice: str | dict[str, str],
+    max_retries: int,
+    base_delay: int,
+    temperature: float = 0.7,
+    key_slots: KeySlots | None = None,
+    preferred_key_index: int = 0,
+    retry_policy: RetryPolicy | None = None,
+    hedge: HedgePolicy | None = None,
+    progress: dict | None = None
+) -> bytes:
+    """
+    Request TTS satu chunk dengan retry dan rotasi key (lihat `make_tts_request_with_retry`); mengembalikan PCM.
+    Jika `progress` diberikan, `progress['sent_at']` berisi waktu (monotonic)
+    request yang sedang berjalan dikirim, atau None; `progress['abandoned']`
+    menghentikan retry karena hasilnya sudah tidak dibutuhkan.
+    """
+    if not API_KEYS_LIST:
+        raise ValueError('Tidak ada API Key yang tersedia untuk digunakan.')
+
+    policy = retry_policy or RetryPolicy(max_attempts=max_retries, base_delay=base_delay)
+    state = RetryState(policy, len(API_KEYS_LIST), rate_limited=isinstance(key_slots, RateLimiterPool))
+    key_index = preferred_key_index % len(API_KEYS_LIST)
+    tokens = estimate_tokens(prompt)
+    attempt = 0
+    chunk_started = time.monotonic()
+    progress = {} if progress is None else progress
+
+    while True:
+        attempt += 1
+        if progress.get('abandoned'):
+            raise RetryExhausted('Chunk sudah dilayani request hedge.')
+        if key_slots is None:
+            api_key = get_current_api_key()
+            key_index = current_api_key_index
+            slot_index = None
+        else:
+            # Tunggu slot kosong (dan kuota, jika rate limiter), mulai dari key pilihan
+            waiting_since = time.monotonic()
+            key_index = key_slots.acquire(key_index, tokens=tokens, exclude=state.excluded)
+            METRICS.inc(SLEEP_SECONDS, time.monotonic() - waiting_since, reason='slot')
+            api_key = API_KEYS_LIST[key_index]
+            slot_index = key_index
+
+        try:
+            if not api_key:
+                logger.error("API Key saat ini tidak valid atau kosong.")
+                state.excluded.add(key_index)
+                if len(state.excluded) >= len(API_KEYS_LIST):
+                    raise ValueError('Semua API Key tidak valid.')
+                key_index = _next_key(key_index, key_slots, state.excluded)
+                continue
+
+            logger.info(f'Mencoba request ke Gemini dengan API Key index: {key_index} (Percobaan {attempt})')
+            progress['sent_at'] = time.monotonic()
+            data = _call_api(api_key, key_index, prompt, voice, temperature, tokens, hedge)
+            METRICS.observe(STAGE_SECONDS, time.monotonic() - chunk_started, stage='synthesize')
+            return data
 
-            
-            try:
-                data = response.candidates[0].content.parts[0].inline_data.data
-            except (AttributeError, IndexError) as e:
-                # Jika pengambilan data gagal, kita putar key dan coba lagi
-                logger.error(f'❌ Gagal mengambil data audio. Rotasi key. Error: {e}')
-                raise Exception("Gagal parsing respons audio.") # Lempar error API untuk memicu rotasi
-                
-            # Menyimpan File
-            save_audio_to_wav(base_filename, data, chunk_index)
-            return 
-
-        except APIError as e:
-            if "RESOURCE_EXHAUSTED" in str(e) or attempt == max_retries - 1:
-                # Jika kuota habis ATAU ini adalah upaya terakhir, ROTASI KEY
-                rotate_api_key()
-                logger.warning(f"⚠️ Kuota habis atau Gagal setelah {max_retries} upaya. Mencoba key baru...")
-                
-                # Jika kuota habis, loop akan berlanjut ke upaya berikutnya dengan key baru
-                # Jika ini adalah upaya terakhir, dan rotate_api_key tidak melempar error,
-                # maka loop akan keluar dan mencapai gagal total di bawah.
-                
-            else:
-                # Jika error sementara (bukan kuota), coba lagi dengan penundaan eksponensial
-                delay = base_delay * (2 ** attempt) 
-                logger.warning(f"⚠️ Error sementara ({e}). Mencoba lagi dalam {delay:.1f} detik.")
-                time.sleep(delay)
-                
         except Exception as e:
-            # Error non-API (misal: error I/O file, error parsing response)
-            logger.error(f'❌ Error tak terduga: {e}')
-            raise e
+            progress['sent_at'] = None
+            kind, rotate, delay = _handle_request_error(e, state, api_key, key_index, key_slots)
+            if rotate:
+                key_index = _next_key(key_index, key_slots, state.excluded)
+                continue
+            # Slot dilepas dulu agar key ini bisa dipakai chunk lain selama menunggu
+            if slot_index is not None:
+                key_slots.release(slot_index)
+                slot_index = None
+            time.sleep(delay)
+
+        finally:
+            if slot_index is not None:
+                key_slots.release(slot_index)
+
+def _call_api(
+    api_key: str,
+    key_index: int,
+    prompt: str,
+    voice: str | dict[str, str],
+    temperature: float,
+    tokens: int,
+    hedge: HedgePolicy | None = None
+) -> bytes:
+    """Satu request ke API dengan key tertentu, tanpa retry. Mengembalikan PCM."""
+    record_request_sent(prompt, tokens)
+
+    if KEY_LEDGER is not None:
+        # Request tetap dihitung server meskipun nanti gagal
+        KEY_LEDGER.record_usage(api_key, tokens)
+    if KEY_LEASES is not None:
+        KEY_LEASES.mark_used(key_index)
+
+    # Klien Gemini untuk key ini (dibuat sekali, lalu dipakai ulang)
+    client = CLIENT_POOL.get(api_key)
+
+    # Panggilan API
+    started = time.monotonic()
+    response = client.models.generate_content(
+        model=TTS_MODEL,
+        contents=prompt,
+        config=build_tts_config(chunk_voice(prompt, voice), temperature)
+    )
+
+    data = extract_audio_data(response)
+    latency = time.monotonic() - started
+    record_request_success(key_index, latency, data)
+    if hedge is not None:
+        hedge.observe(latency)
+    return data
+
+def _in_thread(fn, *args) -> Future:
+    """Menjalankan `fn(*args)` di thread baru; hasilnya di `Future` yang dikembalikan."""
+    future = Future()
+
+    def run():
+        future.set_running_or_notify_cancel()
+        try:
+            future.set_result(fn(*args))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, name='tts-hedge', daemon=True).start()
+    return future
+
+def _hedge_attempt(
+    key_index: int,
+    prompt: str,
+    voice: str | dict[str, str],
+    temperature: float,
+    key_slots: KeySlots,
+    hedge: HedgePolicy
+) -> bytes:
+    """Satu request cadangan pada key yang slotnya sudah diambil; tidak di-retry."""
+    api_key = API_KEYS_LIST[key_index]
+    try:
+        return _call_api(api_key, key_index, prompt, voice, temperature, estimate_tokens(prompt), hedge)
+    except Exception as e:
+        kind = classify_error(e)
+        if kind == QUOTA:
+            _record_quota_exhausted(e, api_key, key_index, key_slots)
+        elif kind != FATAL and KEY_HEALTH is not None:
+            KEY_HEALTH.record_failure(key_index, kind)
+        logger.warning(f"⚠️ Hedge pada API Key index {key_index} gagal ({kind}): {e}")
+        raise
+    finally:
+        key_slots.release(key_index)
+
+def _synthesize_hedged(
+    prompt: str,
+    voice: str | dict[str, str],
+    chunk_index: int,
+    max_retries: int,
+    base_delay: int,
+    temperature: float,
+    key_slots: KeySlots,
+    preferred_key_index: int,
+    retry_policy: RetryPolicy | None,
+    hedge: HedgePolicy
+) -> bytes:
+    """
+    Versi thread dari `async_tts._synthesize_hedged`: request utama berjalan
+    di thread sendiri; jika belum selesai setelah `hedge.hedge_delay()` detik
+    sejak dikirim, satu request cadangan dikirim ke key yang menganggur.
+    Hasil pertama yang berhasil dipakai. Request HTTP yang kalah tidak bisa
+    dibatalkan, tetapi retry-nya dihentikan dan slotnya dilepas begitu selesai.
+    """
+    progress = {}
+    primary = _in_thread(
+        _synthesize_chunk, prompt, voice, max_retries, base_delay, temperature, key_slots, preferred_key_index,
+        retry_policy, hedge, progress
+    )
+    try:
+        while not primary.done():
+            delay = hedge.hedge_delay()
+            sent_at = progress.get('sent_at')
+            if delay is None or sent_at is None or time.monotonic() < sent_at + delay:
+                timeout = HEDGE_POLL_INTERVAL if delay is None or sent_at is None else sent_at + delay - time.monotonic()
+                wait([primary], timeout=max(timeout, 0.0))
+                continue
+
+            # Jatah diambil sebelum slot: slot dari pool langsung dicatat ke kuota RPM/TPM/RPD key
+            if not hedge.consume():
+                break
+            key_index = key_slots.try_acquire_idle(estimate_tokens(prompt))
+            if key_index is None:
+                # Belum ada key yang menganggur: cek lagi nanti, chunk lain akan selesai
+                hedge.refund()
+                wait([primary], timeout=HEDGE_POLL_INTERVAL)
+                continue
+
+            logger.info(f"🪂 Chunk {chunk_index} belum selesai setelah {delay:.1f} detik, hedge dikirim ke API Key index {key_index}.")
+            backup = _in_thread(_hedge_attempt, key_index, prompt, voice, temperature, key_slots, hedge)
+            for future in as_completed([primary, backup]):
+                if future.exception() is None:
+                    if future is backup:
+                        hedge.record_win()
+                        logger.info(f"🪂 Chunk {chunk_index}: hedge lebih cepat, hasil request utama diabaikan.")
+                    return future.result()
+            # Keduanya gagal: error dari request utama yang dilaporkan
+            return primary.result()
+        return primary.result()
+    finally:
+        progress['abandoned'] = True
+
+def record_request_sent(prompt: str, tokens: int):
+    """Metrik teks yang dikirim ke API (setiap percobaan, termasuk retry)."""
+    METRICS.inc(CHARS_SENT, len(prompt))
+    METRICS.inc(TOKENS_SENT, tokens)
+
+def record_request_success(key_index: int, latency: float, pcm_data: bytes):
+    """Mencatat satu request yang berhasil ke skor kesehatan key dan metrik."""
+    if KEY_HEALTH is not None:
+        KEY_HEALTH.record_success(key_index, latency)
+    METRICS.inc(REQUESTS, key=key_index, outcome='ok')
+    METRICS.observe(REQUEST_SECONDS, latency, key=key_index)
+    METRICS.inc(PCM_BYTES, len(pcm_data))
+
+def _next_key(key_index: int, key_slots: KeySlots | None, excluded: set[int]) -> int:
+    """Rotasi ke key berikutnya yang belum dikeluarkan untuk chunk ini."""
+    METRICS.inc(KEY_ROTATIONS)
+    for _ in range(len(API_KEYS_LIST)):
+        key_index = _rotate_key(key_index, key_slots)
+        if key_index not in excluded:
+            break
+    return key_index
+
+def _handle_request_error(
+    error: Exception,
+    state: RetryState,
+    api_key: str,
+    key_index: int,
+    key_slots: KeySlots | None
+) -> tuple[str, bool, float]:
+    """
+    Mencatat error satu percobaan dan menentukan langkah berikutnya lewat
+    `state.on_error` (dipakai jalur sinkron maupun async). Error yang tidak
+    layak dicoba lagi dilempar dari sini.
+    """
+    kind = classify_error(error)
+    METRICS.inc(REQUESTS, key=key_index, outcome=kind)
+    # Kuota habis dicatat di _record_quota_exhausted; error FATAL bukan salah key
+    if KEY_HEALTH is not None and kind not in (QUOTA, FATAL):
+        KEY_HEALTH.record_failure(key_index, kind)
+
+    try:
+        kind, rotate, delay = state.on_error(error, key_index)
+    except RetryExhausted as exhausted:
+        logger.error(f'❌ {exhausted}')
+        raise
+    except Exception:
+        # Error non-API (misal: error I/O file) atau request yang memang salah
+        logger.error(f'❌ Error tak terduga: {error}')
+        raise
+
+    if kind == QUOTA:
+        _record_quota_exhausted(error, api_key, key_index, key_slots)
+        logger.warning(f"⚠️ Kuota API Key index {key_index} habis. Mencoba key lain...")
+    elif kind == INVALID_KEY:
+        logger.warning(f"⚠️ API Key index {key_index} tidak valid ({error}). Tidak dipakai lagi untuk chunk ini.")
+    else:
+        state.policy.record_wait(kind, delay)
+        METRICS.inc(SLEEP_SECONDS, delay, reason='retry')
+        logger.warning(f"⚠️ Error sementara ({kind}: {error}). Mencoba lagi dalam {delay:.1f} detik.")
+    METRICS.inc(RETRIES, kind=kind)
+    return kind, rotate, delay
 
 # --- Fungsi Penggabungan Audio ---
-def combine_audio_chunks(base_filename: str, output_filename: str = 'final_narasi.wav', delete_chunks: bool = True):
+def find_chunk_files(base_filename: str) -> list[str]:
+    """
+    Mencari file chunk (narasi_tts_01.wav, narasi_tts_02.wav, ...) dan
+    mengurutkannya berdasarkan nomor chunk, bukan urutan abjad, agar
+    chunk ke-100 tidak terselip sebelum chunk ke-11.
+    """
+    pattern = re.compile(rf"^{re.escape(os.path.basename(base_filename))}_(\d+)\.wav$")
+    matches = []
+    for file_path in glob.glob(f"{glob.escape(base_filename)}_*.wav"):
+        match = pattern.match(os.path.basename(file_path))
+        if match:
+            matches.append((int(match.group(1)), file_path))
+    return [file_path for _, file_path in sorted(matches)]
+
+def _join_chunk_files(file_list: list[str], output_filename: str, joiner: ChunkJoiner, pauses: dict[int, float]):
+    """
+    Menggabungkan file chunk lewat `joiner` (potong hening, samakan gain,
+    crossfade). Hening [JEDA] yang sudah ada di file ikut terpotong, jadi
+    ditambahkan lagi dari `pauses`. Hanya satu chunk yang dibaca sekaligus.
+    """
+    wav_params(file_list)  # Semua file harus punya format yang sama
+    with open_ordered_writer(output_filename) as writer:
+        for position, file_path in enumerate(file_list, start=1):
+            chunk_index = int(re.search(r'_(\d+)\.wav$', file_path).group(1))
+            with wave.open(file_path, 'rb') as wf:
+                pcm_data = wf.readframes(wf.getnframes())
+            writer.write_chunk(position, joiner.process(pcm_data, pauses.get(chunk_index, 0.0)))
+        writer.write_chunk(len(file_list) + 1, joiner.flush())
+
+def _copy_chunk_files(file_list: list[str], output_filename: str):
+    """Menulis file chunk apa adanya lewat `open_ordered_writer` (misal menjadi segmen playlist)."""
+    with open_ordered_writer(output_filename) as writer:
+        for position, file_path in enumerate(file_list, start=1):
+            with wave.open(file_path, 'rb') as wf:
+                writer.write_chunk(position, wf.readframes(wf.getnframes()))
+
+def combine_audio_chunks(
+    base_filename: str,
+    output_filename: str = 'final_narasi.wav',
+    delete_chunks: bool = True,
+    pauses: dict[int, float] | None = None,
+    smooth_joins: bool = False
+):
 
     """
     Menggabungkan semua file chunk audio (*_01.wav, *_02.wav, dst.) menjadi satu file.
+
+    Output WAV ditulis secara streaming dengan modul `wave` (tanpa FFmpeg,
+    memori konstan); output .m3u/.m3u8 menjadi segmen WAV plus playlist. Format lain (.mp3, .opus, .m4a, .flac) di-encode
+    langsung oleh satu proses FFmpeg yang menerima PCM lewat stdin, juga
+    blok demi blok, tanpa WAV gabungan perantara.
+
+    Jika `smooth_joins` (butuh NumPy), sambungan tidak lagi dipotong kasar:
+    hening di awal/akhir chunk dibuang, gain chunk disamakan, dan sambungan
+    di-crossfade (lihat audio_dsp.py).
     
     Args:
         base_filename: Nama dasar file yang dihasilkan (misal: 'narasi_tts').
         output_filename: Nama file output tunggal (misal: 'final_narasi.wav').
+        pauses: Jeda [JEDA] per chunk dari `generate_audio_for_chunks`.
+        smooth_joins: Haluskan sambungan antar chunk.
     """
     
     # Mencari semua file yang cocok dengan pola (contoh: narasi_tts_01.wav, narasi_tts_02.wav)
-    search_pattern = f"{base_filename}_*.wav"
-    file_list = sorted(glob.glob(search_pattern))
+    file_list = find_chunk_files(base_filename)
     
     if not file_list:
-        logger.error(f"❌ Tidak ditemukan file WAV yang cocok dengan pola '{search_pattern}'.")
+        logger.error(f"❌ Tidak ditemukan file WAV yang cocok dengan pola '{base_filename}_NN.wav'.")
         return
 
     logger.info(f"Ditemukan {len(file_list)} file untuk digabungkan.")
+
+    output_format = os.path.splitext(output_filename)[1].lstrip('.').lower() or 'wav'
     
-    combined_audio = AudioSegment.empty()
-    
+    joiner = create_chunk_joiner() if smooth_joins else None
+
     try:
-        for file_path in file_list:
-            logger.info(f"⏳ Menggabungkan: {file_path}")
-            # Memuat file WAV ke objek AudioSegment
-            chunk_audio = AudioSegment.from_wav(file_path)
-            # Menambahkan chunk ke audio gabungan
-            combined_audio += chunk_audio
-                
-        # Mengekspor audio gabungan ke file WAV baru
-        combined_audio.export(output_filename, format="wav")
+        with METRICS.stage('combine'):
+            if joiner is not None:
+                _join_chunk_files(file_list, output_filename, joiner, pauses or {})
+            elif output_format == 'wav':
+                concat_wav_files(file_list, output_filename)
+            elif f'.{output_format}' in PLAYLIST_EXTENSIONS:
+                _copy_chunk_files(file_list, output_filename)
+            else:
+                encode_wav_files(file_list, output_filename)
 
         if delete_chunks:
             # Hapus file chunk setelah gabungan berhasil
@@ -311,10 +1232,13 @@ def combine_audio_chunks(base_filename: str, output_filename: str = 'final_naras
         
         logger.info(f"✅ Penggabungan Selesai! File disimpan sebagai: {output_filename}")
         
-    except FileNotFoundError:
-        # Ini biasanya terjadi jika FFmpeg tidak ditemukan
-        logger.error("❌ Error: FFmpeg tidak ditemukan!")
-        logger.error("Pastikan FFmpeg terinstal dan PATH sistem telah dikonfigurasi dengan benar.")
+    except FileNotFoundError as e:
+        if output_format == 'wav':
+            logger.error(f"❌ File chunk tidak ditemukan: {e}")
+        else:
+            # Ini biasanya terjadi jika FFmpeg tidak ditemukan
+            logger.error("❌ Error: FFmpeg tidak ditemukan!")
+            logger.error("Pastikan FFmpeg terinstal dan PATH sistem telah dikonfigurasi dengan benar.")
     except Exception as e:
         logger.error(f"❌ Terjadi error saat memproses audio: {e}")
 
@@ -373,34 +1297,106 @@ Kamu relate sama yang mana? Coba komen di bawah.
 """
     
     VOICE_NAME = 'Zubenelgenubi'
+    # Mode dialog: suara per pembicara, misal {'Budi': 'Puck', 'Sari': 'Kore'}, dan FULL_TEXT_PROMPT
+    # berisi baris "Budi: ..." / "Sari: ...". Giliran berurutan dikirim dua pembicara per request.
+    DIALOGUE_VOICES = None
     BASE_OUTPUT_FILE = 'narasi_2_tts' # Nama file dasar
-    FINAL_OUTPUT_FILE = 'final_full_2_narasi.wav'
+    FINAL_OUTPUT_FILE = 'final_full_2_narasi.wav' # .mp3/.opus/.m4a/.flac langsung di-encode FFmpeg, .m3u = segmen + playlist
     # Konfigurasi Chunking (Memaksimalkan RPD)
     MAX_CHARS_PER_CHUNK = 4800 
+    # Batas token per request: 3 request/menit tetap muat dalam TPM tanpa saling menunggu
+    MAX_TOKENS_PER_CHUNK = FREE_TIER_TPM // FREE_TIER_RPM
     
     # Konfigurasi Retry (Memastikan Keberhasilan)
-    MAX_RETRIES = 5           # Jumlah upaya sebelum merotasi key/gagal
-    BASE_DELAY = 5            # Detik dasar untuk exponential backoff
+    MAX_RETRIES = 5           # Jumlah upaya untuk error sementara (5xx, timeout, respons kosong) sebelum chunk gagal
+    BASE_DELAY = 5            # Detik dasar untuk exponential backoff (+ jitter), kecuali server memberi jeda sendiri
+
+    # Konfigurasi Konkurensi (chunk dikirim paralel ke semua API key)
+    CONCURRENT_MODE = True
+    MAX_IN_FLIGHT_PER_KEY = 1 # Jumlah request bersamaan per API key
+
+    # Konfigurasi Rate Limiter (RPM/TPM/RPD per key, lihat README)
+    RATE_LIMIT = True
+    RATE_LIMIT_MAX_WAIT = 90  # Detik; lebih lama dari ini berarti kuota harian habis
+
+    # Hedged request: chunk yang belum selesai setelah latensi persentil ini (misal 0.95 = p95)
+    # dikirim juga ke key lain yang menganggur, memakai sisa kuota harian; None = tanpa hedging
+    HEDGE_AFTER = None
+
+    # Ledger kuota per key (tetap tersimpan meskipun program di-restart)
+    KEY_LEDGER_FILE = 'key-ledger.sqlite3'
+
+    # Beberapa proses main.py/batch_runner.py dengan api-keys.txt yang sama: isi dengan file lease
+    # bersama (misal 'key-leases.sqlite3') agar setiap proses memakai key yang berbeda; None = satu proses
+    KEY_LEASE_FILE = None
+
+    # Cache audio untuk chunk berulang (intro, outro, ajakan follow, dst.)
+    AUDIO_CACHE_DIR = '.tts-cache'
+    AUDIO_CACHE_MAX_MB = 512
+
+    # Lanjutkan job yang terputus: chunk yang sudah jadi tidak dikirim ulang
+    RESUME = True
+
+    # Mode pipeline: tulis PCM langsung ke FINAL_OUTPUT_FILE tanpa file chunk. File .wav/.m3u
+    # sudah bisa diputar sejak chunk pertama selesai, tanpa menunggu chunk lain.
+    # Tidak bisa digabung dengan RESUME (cache audio tetap membuat run ulang hemat kuota).
+    PIPELINE_MODE = False
+
+    # Kenyaringan target (dBFS) tiap chunk di mode pipeline; None = tanpa normalisasi
+    NORMALIZE_DBFS = -20.0
+
+    # Potong hening, samakan gain dan crossfade di sambungan chunk (butuh NumPy: uv sync --extra dsp)
+    SMOOTH_JOINS = True
+
+    # Metrik request dan tahap pipeline di akhir job: .prom (Prometheus) atau .json; None = tidak disimpan
+    METRICS_FILE = 'tts-metrics.prom'
+
+    # FULL_TEXT_PROMPT memakai format [INSTRUKSI_SUARA]/[TEKS_SCRIPT]/[JEDA]
+    SCRIPT_MODE = True
 
     try:
-        load_api_keys()
+        load_api_keys(ledger_path=KEY_LEDGER_FILE)
+        if KEY_LEASE_FILE:
+            init_key_leases(KEY_LEASE_FILE)
+        init_audio_cache(AUDIO_CACHE_DIR, AUDIO_CACHE_MAX_MB * 1024 * 1024)
 
         # Panggil fungsi iterasi utama dengan semua argumen
-        generate_audio_for_chunks(
+        pauses = generate_audio_for_chunks(
             full_prompt=FULL_TEXT_PROMPT, 
-            voice=VOICE_NAME, 
+            voice=DIALOGUE_VOICES or VOICE_NAME, 
             base_filename=BASE_OUTPUT_FILE,
             max_chars_per_chunk=MAX_CHARS_PER_CHUNK,
             max_retries=MAX_RETRIES,      # DARI SINI
             base_delay=BASE_DELAY,        # DARI SINI
-            temperature=0.7
+            temperature=0.7,
+            concurrent=CONCURRENT_MODE,
+            max_in_flight_per_key=MAX_IN_FLIGHT_PER_KEY,
+            rate_limit=RATE_LIMIT,
+            rate_limit_max_wait=RATE_LIMIT_MAX_WAIT,
+            resume=RESUME and not PIPELINE_MODE,
+            output_filename=FINAL_OUTPUT_FILE if PIPELINE_MODE else None,
+            script_mode=SCRIPT_MODE,
+            max_tokens_per_chunk=MAX_TOKENS_PER_CHUNK,
+            normalize_dbfs=NORMALIZE_DBFS,
+            smooth_joins=SMOOTH_JOINS,
+            hedge=HedgePolicy(HEDGE_AFTER) if HEDGE_AFTER else None
         )
 
         # --- 2. PANGGIL FUNGSI PENGGABUNGAN ---
-        combine_audio_chunks(
-            base_filename=BASE_OUTPUT_FILE,
-            output_filename=FINAL_OUTPUT_FILE
-        )
+        # (mode pipeline sudah menulis file final secara langsung)
+        if not PIPELINE_MODE:
+            combine_audio_chunks(
+                base_filename=BASE_OUTPUT_FILE,
+                output_filename=FINAL_OUTPUT_FILE,
+                pauses=pauses,
+                smooth_joins=SMOOTH_JOINS
+            )
 
     except Exception as e:
-        logger.critical(f"Gagal menjalankan proses utama: {e}")
\ No newline at end of file
+        logger.critical(f"Gagal menjalankan proses utama: {e}")
+
+    finally:
+        close_key_leases()
+        METRICS.report()
+        if METRICS_FILE:
+            METRICS.export(METRICS_FILE)
\ No newline at end of file
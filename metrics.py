@@ -0,0 +1,199 @@
+import bisect
+import json
+import os
+import threading
+import time
+import logging
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Batas bucket histogram (detik) untuk latensi request dan durasi tahap
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+# Nama metrik yang dicatat pipeline TTS
+REQUESTS = 'tts_requests_total'
+REQUEST_SECONDS = 'tts_request_seconds'
+PCM_BYTES = 'tts_pcm_bytes_total'
+CHARS_SENT = 'tts_chars_sent_total'
+TOKENS_SENT = 'tts_tokens_sent_total'
+RETRIES = 'tts_retries_total'
+KEY_ROTATIONS = 'tts_key_rotations_total'
+SLEEP_SECONDS = 'tts_sleep_seconds_total'
+CACHE_HITS = 'tts_cache_hits_total'
+COALESCED = 'tts_coalesced_total'
+STAGE_SECONDS = 'tts_stage_seconds'
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(label_key: tuple, extra: tuple = ()) -> str:
+    pairs = label_key + extra
+    if not pairs:
+        return ''
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+class Histogram:
+    """Histogram kumulatif ala Prometheus (jumlah, total, maksimum, dan hitungan per bucket)."""
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """Perkiraan persentil dari batas atas bucket (maksimum untuk bucket terakhir)."""
+        if not self.count:
+            return 0.0
+        target, seen = q * self.count, 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+
+class Metrics:
+    """
+    Counter dan histogram untuk request API dan tahap pipeline (split,
+    synthesize, save, post_process, combine). Aman dipakai dari banyak
+    thread. Di akhir job bisa diekspor ke file teks Prometheus (untuk
+    textfile collector node_exporter) atau ringkasan JSON, lihat `export`.
+
+    Label tidak boleh berisi API key; key dicatat sebagai indeks.
+    """
+
+    def __init__(self):
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1, **labels):
+        """Menambah counter `name` sebesar `value`."""
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        """Mencatat satu nilai ke histogram `name`."""
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            if key not in series:
+                series[key] = Histogram()
+            series[key].observe(value)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """Mencatat durasi blok `with` (detik) ke histogram `name`, juga jika blok gagal."""
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(name, time.monotonic() - started, **labels)
+
+    def stage(self, stage: str):
+        """Timer untuk satu tahap pipeline."""
+        return self.timer(STAGE_SECONDS, stage=stage)
+
+    def counter_value(self, name: str, **labels) -> float:
+        """Nilai counter `name` untuk kombinasi label yang persis sama (0 jika belum pernah dicatat)."""
+        with self._lock:
+            return self._counters.get(name, {}).get(_label_key(labels), 0)
+
+    def counter_total(self, name: str) -> float:
+        """Jumlah counter `name` dari semua label."""
+        with self._lock:
+            return sum(self._counters.get(name, {}).values())
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def snapshot(self) -> dict:
+        """Ringkasan semua metrik dalam bentuk dict yang bisa di-serialize ke JSON."""
+        with self._lock:
+            counters = {
+                name: [{'labels': dict(key), 'value': value} for key, value in sorted(series.items())]
+                for name, series in sorted(self._counters.items())
+            }
+            histograms = {
+                name: [
+                    {
+                        'labels': dict(key),
+                        'count': hist.count,
+                        'sum': round(hist.sum, 6),
+                        'mean': round(hist.sum / hist.count, 6) if hist.count else 0.0,
+                        'p50': hist.quantile(0.5),
+                        'p95': hist.quantile(0.95),
+                        'max': round(hist.max, 6),
+                    }
+                    for key, hist in sorted(series.items())
+                ]
+                for name, series in sorted(self._histograms.items())
+            }
+        return {'counters': counters, 'histograms': histograms}
+
+    def to_prometheus(self) -> str:
+        """Semua metrik dalam format teks eksposisi Prometheus."""
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                lines.append(f'# TYPE {name} counter')
+                for key, value in sorted(series.items()):
+                    lines.append(f'{name}{_format_labels(key)} {value:g}')
+            for name, series in sorted(self._histograms.items()):
+                lines.append(f'# TYPE {name} histogram')
+                for key, hist in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip(hist.buckets, hist.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{_format_labels(key, (("le", f"{bound:g}"),))} {cumulative}')
+                    lines.append(f'{name}_bucket{_format_labels(key, (("le", "+Inf"),))} {hist.count}')
+                    lines.append(f'{name}_sum{_format_labels(key)} {hist.sum:.6f}')
+                    lines.append(f'{name}_count{_format_labels(key)} {hist.count}')
+        return '\n'.join(lines) + '\n'
+
+    def export(self, path: str):
+        """
+        Menulis metrik ke `path`: ringkasan JSON jika berakhiran `.json`,
+        selain itu teks Prometheus (misal `tts.prom`). Ditulis ke file
+        sementara lalu diganti, agar pembaca tidak melihat file setengah jadi.
+        """
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            if path.lower().endswith('.json'):
+                json.dump(self.snapshot(), f, indent=2, ensure_ascii=False)
+            else:
+                f.write(self.to_prometheus())
+        os.replace(tmp_path, path)
+        logger.info(f"📈 Metrik disimpan ke: {path}")
+
+    def report(self):
+        """Mencatat ringkasan waktu per tahap dan request ke log."""
+        snapshot = self.snapshot()
+        for entry in snapshot['histograms'].get(STAGE_SECONDS, []):
+            logger.info(
+                f"📈 Tahap {entry['labels'].get('stage')}: {entry['count']}x, total {entry['sum']:.1f} detik, "
+                f"p95 {entry['p95']:.2f} detik."
+            )
+        requests = self.counter_total(REQUESTS)
+        if requests:
+            logger.info(
+                f"📈 Request API: {requests:g}, retry: {self.counter_total(RETRIES):g}, "
+                f"rotasi key: {self.counter_total(KEY_ROTATIONS):g}, menunggu total {self.counter_total(SLEEP_SECONDS):.1f} detik."
+            )
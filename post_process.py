@@ -0,0 +1,221 @@
+import math
+import operator
+import queue
+import sys
+import threading
+import warnings
+import logging
+from array import array
+
+import audio_dsp
+from wav_stream import MissingChunkError, silence_pcm
+
+# audioop (C) dipakai jika NumPy tidak ada; modul ini dihapus di Python 3.13
+with warnings.catch_warnings():
+    warnings.simplefilter('ignore', DeprecationWarning)
+    try:
+        import audioop
+    except ImportError:
+        audioop = None
+
+logger = logging.getLogger(__name__)
+
+# Target kenyaringan default (RMS, dBFS) untuk narasi
+DEFAULT_TARGET_DBFS = -20.0
+# Chunk yang lebih sunyi dari ini tidak dinormalisasi (agar noise tidak ikut dikuatkan)
+MIN_NORMALIZE_DBFS = -50.0
+MAX_SAMPLE = 32767
+
+
+def _samples(pcm_data: bytes) -> array:
+    samples = array('h')
+    samples.frombytes(pcm_data)
+    if sys.byteorder == 'big':
+        # PCM dari API little-endian
+        samples.byteswap()
+    return samples
+
+
+def _to_bytes(samples: array) -> bytes:
+    if sys.byteorder == 'big':
+        samples.byteswap()
+    return samples.tobytes()
+
+
+def validate_pcm(pcm_data: bytes, chunk_index: int, sampwidth: int = 2) -> bytes:
+    """
+    Memeriksa PCM 16-bit satu chunk: tidak boleh kosong, dan byte sisa di
+    akhir (sampel terpotong) dibuang agar tidak menggeser sampel chunk berikutnya.
+    """
+    if not pcm_data:
+        raise ValueError(f'Chunk {chunk_index}: data audio kosong.')
+    remainder = len(pcm_data) % sampwidth
+    if remainder:
+        logger.warning(f"⚠️ Chunk {chunk_index}: {remainder} byte sisa di akhir PCM dibuang.")
+        pcm_data = pcm_data[:-remainder]
+    return pcm_data
+
+
+def _native_pcm(pcm_data: bytes) -> bytes:
+    # audioop bekerja dengan urutan byte mesin, PCM dari API little-endian
+    return audioop.byteswap(pcm_data, 2) if sys.byteorder == 'big' else pcm_data
+
+
+def rms_dbfs(pcm_data: bytes) -> float:
+    """
+    Kenyaringan RMS PCM 16-bit dalam dBFS (-inf untuk hening total). Dihitung
+    dengan NumPy jika tersedia, lalu audioop, baru loop Python sebagai cadangan.
+    """
+    if len(pcm_data) < 2:
+        return -math.inf
+    if audio_dsp.numpy_available():
+        rms = audio_dsp.rms(audio_dsp.pcm_to_array(pcm_data))
+    elif audioop is not None:
+        rms = audioop.rms(_native_pcm(pcm_data), 2)
+    else:
+        samples = _samples(pcm_data)
+        rms = math.sqrt(sum(map(operator.mul, samples, samples)) / len(samples))
+    return 20 * math.log10(rms / MAX_SAMPLE) if rms else -math.inf
+
+
+def normalize_loudness(pcm_data: bytes, target_dbfs: float = DEFAULT_TARGET_DBFS) -> bytes:
+    """
+    Menyesuaikan gain PCM 16-bit agar RMS-nya mendekati `target_dbfs`, tanpa
+    melebihi puncak maksimal (tidak ada clipping). Chunk yang hampir hening
+    dibiarkan apa adanya.
+    """
+    current = rms_dbfs(pcm_data)
+    if current < MIN_NORMALIZE_DBFS:
+        return pcm_data
+    if audio_dsp.numpy_available():
+        samples = audio_dsp.pcm_to_array(pcm_data)
+        peak = max(int(samples.max()), -int(samples.min()))
+    elif audioop is not None:
+        native = _native_pcm(pcm_data)
+        peak = audioop.max(native, 2)
+    else:
+        samples = _samples(pcm_data)
+        peak = max(max(samples), -min(samples))
+    gain = min(10 ** ((target_dbfs - current) / 20), MAX_SAMPLE / peak)
+    if abs(gain - 1.0) < 0.01:
+        return pcm_data
+
+    if audio_dsp.numpy_available():
+        return audio_dsp.apply_gain(samples, gain).tobytes()
+    if audioop is not None:
+        return _native_pcm(audioop.mul(native, 2, gain))
+    scaled = array('h', (max(-MAX_SAMPLE - 1, min(MAX_SAMPLE, round(sample * gain))) for sample in samples))
+    return _to_bytes(scaled)
+
+
+class PostProcessor:
+    """
+    Pipeline producer/consumer untuk mode pipeline.
+
+    `submit(chunk_index, pcm_data)` dipakai sebagai `audio_sink`: PCM hanya
+    dimasukkan ke antrean sehingga thread/event loop yang memanggil API
+    langsung bisa lanjut ke request berikutnya. Satu thread worker lalu
+    memvalidasi, menormalisasi kenyaringan (jika `target_dbfs` diberikan),
+    menambahkan hening [JEDA], dan menulis chunk ke `writer`
+    (`wav_stream.OrderedWavWriter`, `SegmentedWavWriter`) selagi request lain masih berjalan.
+
+    Jika `joiner` (`audio_dsp.ChunkJoiner`) diberikan, worker menyusun chunk
+    sesuai urutan lebih dulu karena hening dipotong dan sambungan di-crossfade
+    dengan chunk sebelumnya; normalisasi dan [JEDA] lalu ditangani `joiner`.
+    Durasi pemrosesan tiap chunk dicatat ke `metrics` (`metrics.Metrics`), jika ada.
+    """
+
+    def __init__(
+        self,
+        writer,
+        pauses: dict[int, float] | None = None,
+        target_dbfs: float | None = None,
+        joiner=None,
+        first_chunk_index: int = 1,
+        metrics=None
+    ):
+        self.writer = writer
+        self.pauses = pauses or {}
+        self.target_dbfs = target_dbfs
+        self.joiner = joiner
+        self.metrics = metrics
+        self.error = None
+        self._next_index = first_chunk_index
+        self._pending = {}
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='post-process', daemon=True)
+        self._thread.start()
+
+    def submit(self, chunk_index: int, pcm_data: bytes):
+        """Menyerahkan PCM satu chunk ke worker (tidak menunggu pemrosesan)."""
+        if self.error is not None:
+            raise self.error
+        self._queue.put((chunk_index, pcm_data))
+
+    def process(self, chunk_index: int, pcm_data: bytes) -> bytes:
+        """Langkah pemrosesan satu chunk sebelum ditulis."""
+        if self.metrics is not None:
+            with self.metrics.stage('post_process'):
+                return self._process(chunk_index, pcm_data)
+        return self._process(chunk_index, pcm_data)
+
+    def _process(self, chunk_index: int, pcm_data: bytes) -> bytes:
+        pcm_data = validate_pcm(pcm_data, chunk_index)
+        if self.joiner is not None:
+            return self.joiner.process(pcm_data, self.pauses.get(chunk_index, 0.0))
+        if self.target_dbfs is not None:
+            pcm_data = normalize_loudness(pcm_data, self.target_dbfs)
+        if chunk_index in self.pauses:
+            pcm_data += silence_pcm(self.pauses[chunk_index])
+        return pcm_data
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            chunk_index, pcm_data = item
+            if self.error is not None:
+                continue
+            try:
+                if self.joiner is None:
+                    self.writer.write_chunk(chunk_index, self.process(chunk_index, pcm_data))
+                else:
+                    self._write_in_order(chunk_index, pcm_data)
+            except Exception as e:
+                logger.error(f"❌ Gagal memproses chunk {chunk_index}: {e}")
+                self.error = e
+
+    def _write_in_order(self, chunk_index: int, pcm_data: bytes):
+        self._pending[chunk_index] = pcm_data
+        while self._next_index in self._pending:
+            chunk_index = self._next_index
+            self.writer.write_chunk(chunk_index, self.process(chunk_index, self._pending.pop(chunk_index)))
+            self._next_index += 1
+
+    def close(self):
+        """
+        Menunggu semua chunk di antrean selesai diproses, lalu menutup `writer`.
+        `MissingChunkError` jika ada chunk yang tidak pernah diterima.
+        """
+        self._queue.put(None)
+        self._thread.join()
+        missing = None
+        if self.joiner is not None and self.error is None:
+            if self._pending:
+                missing = self._next_index
+                logger.error(f"❌ Chunk {missing} tidak pernah diterima; {len(self._pending)} chunk setelahnya tidak ditulis.")
+                self._pending.clear()
+            # Ekor chunk terakhir yang ditahan untuk crossfade
+            self.writer.write_chunk(self._next_index, self.joiner.flush())
+        self.writer.close()
+        if self.error is not None:
+            raise self.error
+        if missing is not None:
+            raise MissingChunkError(missing, self.writer.output_filename)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
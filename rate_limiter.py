@@ -0,0 +1,296 @@
+import asyncio
+import math
+import threading
+import time
+import logging
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# --- Limitasi API Key Gratis (lihat tabel di README) ---
+FREE_TIER_RPM = 3        # Requests Per Minute
+FREE_TIER_TPM = 10_000   # Tokens Per Minute
+FREE_TIER_RPD = 15       # Requests Per Day
+
+MINUTE_WINDOW = 60
+DAY_WINDOW = 24 * 60 * 60
+
+# Perkiraan kasar: satu token ~ 4 karakter teks input
+CHARS_PER_TOKEN = 4
+
+# Detik antar pengecekan ulang saat proses ini belum memegang lease key (lihat key_lease.py)
+LEASE_POLL_INTERVAL = 1.0
+
+
+class RateLimitExceeded(Exception):
+    """Dilempar jika tidak ada key yang bisa melayani request dalam batas waktu tunggu."""
+
+
+def estimate_tokens(text: str) -> int:
+    """Memperkirakan jumlah token input sebuah chunk sebelum dikirim."""
+    return max(1, math.ceil(len(text) / CHARS_PER_TOKEN))
+
+
+class KeySlots:
+    """
+    Membatasi jumlah request yang berjalan bersamaan (in-flight) per API key
+    untuk mode konkuren. Worker meminta slot pada key pilihannya; jika key
+    tersebut penuh, dipilih key berikutnya yang masih punya slot kosong.
+
+    Jika `health` (`key_health.KeyHealthTracker`) diberikan, key yang
+    dikarantina atau sedang diistirahatkan dilewati dan key yang paling
+    sehat didahulukan. Jika `leases` (`key_lease.KeyLeaseCoordinator`)
+    diberikan, hanya key yang sedang disewa proses ini yang dipakai.
+    Menunggu lebih lama dari `max_wait` detik (jika diberikan) dianggap
+    gagal dengan `RateLimitExceeded`.
+    """
+
+    def __init__(
+        self,
+        num_keys: int,
+        max_in_flight_per_key: int = 1,
+        health=None,
+        max_wait: float | None = None,
+        leases=None
+    ):
+        if num_keys <= 0:
+            raise ValueError('Tidak ada API Key yang tersedia untuk digunakan.')
+        self._limit = max(1, max_in_flight_per_key)
+        self._in_flight = [0] * num_keys
+        self._cond = threading.Condition()
+        self.health = health
+        self.max_wait = max_wait
+        self.leases = leases
+
+    @property
+    def num_keys(self) -> int:
+        return len(self._in_flight)
+
+    @property
+    def max_in_flight_per_key(self) -> int:
+        return self._limit
+
+    def _try_acquire(self, preferred_index: int, tokens: int, exclude=frozenset()) -> tuple[int | None, float | None]:
+        """
+        Mencoba mengambil slot tanpa menunggu (dipanggil dengan `_cond` terkunci).
+        Key di `exclude` tidak pernah dipilih.
+        Mengembalikan (indeks key, 0) jika berhasil, atau (None, detik tunggu);
+        detik tunggu None berarti menunggu sampai ada slot yang dilepas.
+        """
+        candidates = self._candidates(preferred_index, exclude)
+        for index in candidates:
+            if self._in_flight[index] < self._limit:
+                self._in_flight[index] += 1
+                return index, 0.0
+        return None, None if candidates else self._health_wait(exclude)
+
+    def _candidates(self, preferred_index: int, exclude) -> list[int]:
+        """Urutan key yang dicoba: mulai dari key pilihan, atau dari key tersehat jika ada `health`."""
+        order = [(preferred_index + offset) % self.num_keys for offset in range(self.num_keys)]
+        if self.health is not None:
+            order = self.health.rank(order)
+        if self.leases is not None:
+            held = self.leases.held
+            order = [index for index in order if index in held]
+        return [index for index in order if index not in exclude]
+
+    def _health_wait(self, exclude) -> float:
+        """Detik tunggu saat semua key yang boleh dipakai sedang diistirahatkan (atau belum ada key yang disewa)."""
+        if self.leases is not None:
+            held = self.leases.held
+            if not held - set(exclude):
+                # Key yang disewa bisa berganti di heartbeat berikutnya
+                return LEASE_POLL_INTERVAL
+            exclude = set(exclude) | (set(range(self.num_keys)) - held)
+        wait = self.health.seconds_until_available(exclude) if self.health is not None else None
+        if wait is None:
+            raise RateLimitExceeded('Tidak ada API Key yang bisa dipakai (semua dikarantina atau dikecualikan).')
+        if self.max_wait is not None and wait > self.max_wait:
+            raise RateLimitExceeded(f'Semua API Key sedang diistirahatkan. Key tercepat baru tersedia dalam {wait:.0f} detik.')
+        return max(wait, 0.01)
+
+    def acquire(self, preferred_index: int, tokens: int = 0, exclude=frozenset()) -> int:
+        """
+        Menunggu hingga ada slot kosong dan mengembalikan indeks key yang dipakai.
+        `tokens` tidak dipakai di sini, hanya oleh `RateLimiterPool`.
+        """
+        with self._cond:
+            while True:
+                index, wait = self._try_acquire(preferred_index, tokens, exclude)
+                if index is not None:
+                    return index
+                self._cond.wait(wait)
+
+    async def acquire_async(
+        self,
+        preferred_index: int,
+        tokens: int = 0,
+        exclude=frozenset(),
+        poll_interval: float = 0.05
+    ) -> int:
+        """Versi `acquire` untuk asyncio: menunggu dengan `asyncio.sleep` tanpa memblokir event loop."""
+        while True:
+            with self._cond:
+                index, wait = self._try_acquire(preferred_index, tokens, exclude)
+            if index is not None:
+                return index
+            await asyncio.sleep(poll_interval if wait is None else max(wait, poll_interval))
+
+    def try_acquire_idle(self, tokens: int = 0, exclude=frozenset()) -> int | None:
+        """
+        Mengambil slot pada key yang sedang tidak melayani request apa pun,
+        tanpa menunggu. Mengembalikan None jika tidak ada key seperti itu
+        (atau kuotanya belum siap).
+        """
+        with self._cond:
+            busy = {index for index, count in enumerate(self._in_flight) if count > 0}
+            try:
+                index, _ = self._try_acquire(0, tokens, busy | set(exclude))
+            except RateLimitExceeded:
+                return None
+            return index
+
+    def release(self, index: int):
+        """Mengembalikan slot key setelah request selesai."""
+        with self._cond:
+            self._in_flight[index] -= 1
+            self._cond.notify_all()
+
+
+class KeyRateLimiter:
+    """
+    Model kuota satu API key: RPM, TPM dan RPD.
+
+    Setiap request dicatat dalam jendela geser (sliding window) 1 menit dan
+    24 jam, sehingga `wait_time` bisa menghitung kapan key ini sanggup
+    melayani request berikutnya tanpa ditolak server.
+    """
+
+    def __init__(
+        self,
+        rpm: int = FREE_TIER_RPM,
+        tpm: int = FREE_TIER_TPM,
+        rpd: int = FREE_TIER_RPD
+    ):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.rpd = rpd
+        self._minute = deque()  # (timestamp, tokens)
+        self._day = deque()     # timestamp
+        self._blocked_until = 0.0
+
+    def _expire(self, now: float):
+        while self._minute and self._minute[0][0] <= now - MINUTE_WINDOW:
+            self._minute.popleft()
+        while self._day and self._day[0] <= now - DAY_WINDOW:
+            self._day.popleft()
+
+    def wait_time(self, tokens: int, now: float) -> float:
+        """Detik yang harus ditunggu sebelum request dengan `tokens` token boleh dikirim."""
+        self._expire(now)
+        wait = max(0.0, self._blocked_until - now)
+
+        if len(self._minute) >= self.rpm:
+            wait = max(wait, self._minute[-self.rpm][0] + MINUTE_WINDOW - now)
+
+        used_tokens = sum(t for _, t in self._minute)
+        if used_tokens + tokens > self.tpm:
+            # Tunggu sampai cukup banyak token lama keluar dari jendela 1 menit
+            freed = 0
+            for timestamp, t in self._minute:
+                freed += t
+                if used_tokens - freed + tokens <= self.tpm:
+                    wait = max(wait, timestamp + MINUTE_WINDOW - now)
+                    break
+
+        if len(self._day) >= self.rpd:
+            wait = max(wait, self._day[-self.rpd] + DAY_WINDOW - now)
+
+        return wait
+
+    def record(self, tokens: int, now: float):
+        """Mencatat request yang baru saja dikirim."""
+        self._minute.append((now, tokens))
+        self._day.append(now)
+
+    def block_until(self, timestamp: float):
+        """Menahan key sampai `timestamp` (misal setelah RESOURCE_EXHAUSTED)."""
+        self._blocked_until = max(self._blocked_until, timestamp)
+
+    def reset(self):
+        """Melupakan riwayat pemakaian (blokir yang sedang berjalan tetap berlaku)."""
+        self._minute.clear()
+        self._day.clear()
+
+
+class RateLimiterPool(KeySlots):
+    """
+    Penjadwal proaktif untuk semua API key. Selain membatasi request in-flight
+    seperti `KeySlots`, setiap request dijadwalkan ke key yang paling cepat
+    bisa melayaninya menurut budget RPM/TPM/RPD, sehingga tidak ada request
+    yang dikirim hanya untuk ditolak dengan 429.
+    """
+
+    def __init__(
+        self,
+        num_keys: int,
+        max_in_flight_per_key: int = 1,
+        rpm: int = FREE_TIER_RPM,
+        tpm: int = FREE_TIER_TPM,
+        rpd: int = FREE_TIER_RPD,
+        max_wait: float | None = None,
+        clock=time.time,
+        health=None,
+        leases=None
+    ):
+        super().__init__(num_keys, max_in_flight_per_key, health, max_wait, leases)
+        self.limiters = [KeyRateLimiter(rpm, tpm, rpd) for _ in range(num_keys)]
+        self._clock = clock
+
+    def _try_acquire(self, preferred_index: int, tokens: int, exclude=frozenset()) -> tuple[int | None, float | None]:
+        """
+        Memilih key yang paling cepat bisa melayani request; jika seri, key
+        pilihan (atau key tersehat, jika ada `health`) didahulukan. Jika key tersebut siap, pemakaiannya langsung dicatat.
+        """
+        now = self._clock()
+        candidates = self._candidates(preferred_index, exclude)
+        best_index, best_wait = None, math.inf
+        for index in candidates:
+            if self._in_flight[index] >= self._limit:
+                continue
+            wait = self.limiters[index].wait_time(tokens, now)
+            if wait < best_wait:
+                best_index, best_wait = index, wait
+
+        if best_index is None:
+            # Tanpa key bebas, tunggu sampai ada slot yang dilepas (atau key selesai diistirahatkan)
+            return None, None if candidates else self._health_wait(exclude)
+        if best_wait <= 0:
+            self.limiters[best_index].record(tokens, now)
+            self._in_flight[best_index] += 1
+            return best_index, 0.0
+        if self.max_wait is not None and best_wait > self.max_wait:
+            raise RateLimitExceeded(
+                f'Semua API Key kehabisan kuota. Key tercepat baru tersedia dalam {best_wait:.0f} detik.'
+            )
+        logger.info(f"⏳ Menunggu kuota API Key index {best_index} selama {best_wait:.1f} detik.")
+        return None, best_wait
+
+    def seed(self, index: int, events: list[tuple[float, int]], blocked_until: float = 0.0):
+        """
+        Mengisi riwayat pemakaian key (misal dari ledger). Riwayat lama diganti,
+        jadi aman dipanggil ulang saat key diambil alih dari proses lain.
+        """
+        with self._cond:
+            limiter = self.limiters[index]
+            limiter.reset()
+            for timestamp, tokens in events:
+                limiter.record(tokens, timestamp)
+            limiter.block_until(blocked_until)
+            self._cond.notify_all()
+
+    def block_key(self, index: int, seconds: float = MINUTE_WINDOW):
+        """Menahan key setelah server menolak request karena kuota habis."""
+        with self._cond:
+            self.limiters[index].block_until(self._clock() + seconds)
+            self._cond.notify_all()
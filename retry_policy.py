@@ -0,0 +1,174 @@
+import re
+import random
+import threading
+import logging
+from dataclasses import dataclass, field
+
+import httpx
+from google.genai.errors import APIError
+
+logger = logging.getLogger(__name__)
+
+# --- Jenis Error ---
+QUOTA = 'quota'              # 429 / RESOURCE_EXHAUSTED: pindah key, key ini ditahan
+INVALID_KEY = 'invalid_key'  # Key salah/dicabut: pindah key, jangan dipakai lagi
+TRANSIENT = 'transient'      # 5xx, timeout, koneksi putus: coba lagi dengan backoff
+PARSE = 'parse'              # Respons tanpa audio: coba lagi dengan backoff
+FATAL = 'fatal'              # Request-nya sendiri salah (4xx lain): percuma dicoba ulang
+
+RETRY_INFO_TYPE = 'type.googleapis.com/google.rpc.RetryInfo'
+RETRY_IN_PATTERN = re.compile(r'retry in ([\d.]+)\s*s', re.IGNORECASE)
+INVALID_KEY_MARKERS = ('API_KEY_INVALID', 'API key not valid', 'API key expired', 'PERMISSION_DENIED')
+
+
+class AudioParseError(Exception):
+    """Respons API berhasil, tetapi tidak berisi data audio."""
+
+
+class RetryExhausted(Exception):
+    """Semua percobaan untuk satu chunk gagal. Error terakhir ada di `__cause__`."""
+
+
+def classify_error(error: BaseException) -> str:
+    """Menentukan jenis error agar bisa ditangani dengan tepat (lihat konstanta di atas)."""
+    if isinstance(error, AudioParseError):
+        return PARSE
+    if isinstance(error, APIError):
+        text = str(error)
+        if error.code == 429 or 'RESOURCE_EXHAUSTED' in text:
+            return QUOTA
+        if error.code in (401, 403) or any(marker in text for marker in INVALID_KEY_MARKERS):
+            return INVALID_KEY
+        if error.code in (408, 499) or (error.code or 0) >= 500:
+            return TRANSIENT
+        return FATAL
+    if isinstance(error, (httpx.TransportError, TimeoutError, ConnectionError)):
+        return TRANSIENT
+    return FATAL
+
+
+def _parse_duration(value) -> float | None:
+    try:
+        return float(str(value).strip().rstrip('s'))
+    except ValueError:
+        return None
+
+
+def server_retry_delay(error: BaseException) -> float | None:
+    """
+    Jeda yang diminta server sebelum mencoba lagi, jika ada: dari detail
+    `RetryInfo` (misal `"retryDelay": "37s"`), header `Retry-After`, atau
+    teks "Please retry in 37.5s" di pesan error.
+    """
+    if not isinstance(error, APIError):
+        return None
+
+    details = error.details.get('error', error.details) if isinstance(error.details, dict) else {}
+    for detail in details.get('details', []) if isinstance(details, dict) else []:
+        if isinstance(detail, dict) and detail.get('@type') == RETRY_INFO_TYPE:
+            delay = _parse_duration(detail.get('retryDelay', ''))
+            if delay is not None:
+                return delay
+
+    headers = getattr(error.response, 'headers', None)
+    if headers is not None and headers.get('retry-after'):
+        delay = _parse_duration(headers.get('retry-after'))
+        if delay is not None:
+            return delay
+
+    match = RETRY_IN_PATTERN.search(str(error))
+    return float(match.group(1)) if match else None
+
+
+@dataclass
+class RetryPolicy:
+    """
+    Aturan retry untuk satu request chunk.
+
+    - `max_attempts`: batas percobaan ulang untuk error TRANSIENT/PARSE
+      (pindah key karena QUOTA/INVALID_KEY tidak dihitung, dibatasi oleh
+      jumlah key).
+    - Backoff eksponensial `base_delay * 2**n` (maksimal `max_delay`) dengan
+      jitter acak ±`jitter` bagian, agar worker yang gagal bersamaan tidak
+      mencoba lagi bersamaan. Jeda dari server (retry-after) adalah batas
+      bawah: jitter-nya hanya ke atas, tidak pernah mempercepat retry.
+    - `quota_hits_per_key`: berapa kali satu key boleh kena QUOTA dalam satu
+      request sebelum tidak dipakai lagi (rate limiter menunggu reset kuota
+      di antaranya).
+
+    Total waktu menunggu dicatat per jenis error di `waited`.
+    """
+    max_attempts: int = 5
+    base_delay: float = 5.0
+    max_delay: float = 60.0
+    jitter: float = 0.5
+    quota_hits_per_key: int = 2
+    waited: dict[str, float] = field(default_factory=dict)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def backoff(self, attempt: int, error: BaseException | None = None) -> float:
+        """Detik tunggu sebelum percobaan ke-`attempt` (mulai 0) berikutnya."""
+        delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+        spread = delay * self.jitter
+        delay = max(0.0, delay + random.uniform(-spread, spread))
+        server_delay = server_retry_delay(error) if error is not None else None
+        if server_delay is None:
+            return delay
+        return max(server_delay * (1 + random.uniform(0, self.jitter)), delay)
+
+    def record_wait(self, kind: str, seconds: float):
+        """Mencatat waktu yang dihabiskan untuk menunggu karena error `kind`."""
+        with self._lock:
+            self.waited[kind] = self.waited.get(kind, 0.0) + seconds
+
+    def total_waited(self) -> float:
+        with self._lock:
+            return sum(self.waited.values())
+
+    def report(self):
+        """Mencatat ringkasan waktu tunggu retry ke log (jika ada)."""
+        with self._lock:
+            waited = dict(self.waited)
+        if waited:
+            summary = ', '.join(f'{kind} {seconds:.1f} detik' for kind, seconds in sorted(waited.items()))
+            logger.info(f"⏱️ Total waktu menunggu retry: {sum(waited.values()):.1f} detik ({summary}).")
+
+
+class RetryState:
+    """
+    Status retry satu chunk: key yang tidak dipakai lagi (`excluded`) dan
+    jumlah percobaan ulang. `on_error` memutuskan langkah berikutnya.
+    """
+
+    def __init__(self, policy: RetryPolicy, num_keys: int, rate_limited: bool = False):
+        self.policy = policy
+        self.num_keys = num_keys
+        # Dengan rate limiter, key yang kena QUOTA ditahan sampai kuotanya pulih, bukan langsung dibuang
+        self.rate_limited = rate_limited
+        self.excluded = set()
+        self.retries = 0
+        self._quota_hits = {}
+
+    def on_error(self, error: BaseException, key_index: int) -> tuple[str, bool, float]:
+        """
+        Mengembalikan (jenis error, pindah key?, detik tunggu sebelum mencoba lagi).
+        Melempar ulang `error` jika tidak layak dicoba lagi, atau `RetryExhausted`
+        jika percobaan/key sudah habis.
+        """
+        kind = classify_error(error)
+        if kind == FATAL:
+            raise error
+
+        if kind in (QUOTA, INVALID_KEY):
+            hits = self._quota_hits[key_index] = self._quota_hits.get(key_index, 0) + 1
+            if kind == INVALID_KEY or not self.rate_limited or hits >= self.policy.quota_hits_per_key:
+                self.excluded.add(key_index)
+            if len(self.excluded) >= self.num_keys:
+                raise RetryExhausted('Semua API Key kehabisan kuota atau tidak valid.') from error
+            # Pindah key tanpa menunggu; rate limiter (jika ada) yang menunggu kuota pulih
+            return kind, True, 0.0
+
+        self.retries += 1
+        if self.retries >= self.policy.max_attempts:
+            raise RetryExhausted(f'Gagal setelah {self.retries} percobaan: {error}') from error
+        return kind, False, self.policy.backoff(self.retries - 1, error)
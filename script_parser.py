@@ -0,0 +1,157 @@
+import re
+import logging
+from dataclasses import dataclass
+
+from chunk_packer import SENTENCE_BOUNDARY, UnitCosts, char_budget, pack_balanced, split_long_sentence
+
+logger = logging.getLogger(__name__)
+
+INSTRUCTION_PATTERN = re.compile(r'^\[INSTRUKSI_SUARA:\s*(.*?)\s*\]$', re.IGNORECASE)
+TEXT_MARKER_PATTERN = re.compile(r'^\[TEKS_SCRIPT\]$', re.IGNORECASE)
+PAUSE_PATTERN = re.compile(r'^\[JEDA:\s*([\d.,]+)\s*(?:detik|s)?\s*\]$', re.IGNORECASE)
+# Baris penanda yang tidak ikut dibacakan
+IGNORED_LINES = {'---', 'START_SCRIPT', 'END_SCRIPT'}
+
+
+@dataclass
+class ScriptSegment:
+    """Potongan teks dengan instruksi suara yang berlaku dan jeda setelahnya."""
+    instruction: str | None
+    text: str
+    pause_after: float = 0.0
+
+
+@dataclass
+class ScriptChunk:
+    """Satu request TTS: teks siap kirim (sudah berisi instruksi suara) dan jeda hening setelahnya."""
+    text: str
+    pause_after: float = 0.0
+
+
+def parse_script(script: str) -> list[ScriptSegment]:
+    """
+    Mengurai script berformat [INSTRUKSI_SUARA: ...], [TEKS_SCRIPT] dan
+    [JEDA: N detik] menjadi daftar segmen. Instruksi suara tetap berlaku
+    untuk teks berikutnya sampai ada instruksi baru.
+    """
+    segments = []
+    instruction = None
+    lines = []
+
+    def flush(pause: float = 0.0):
+        text = ' '.join(' '.join(lines).split())
+        lines.clear()
+        if text:
+            segments.append(ScriptSegment(instruction, text, pause))
+        elif pause and segments:
+            # Jeda tanpa teks baru: tambahkan ke segmen sebelumnya
+            segments[-1].pause_after += pause
+
+    for raw_line in script.splitlines():
+        line = raw_line.strip()
+        if not line or line in IGNORED_LINES or TEXT_MARKER_PATTERN.match(line):
+            continue
+
+        match = INSTRUCTION_PATTERN.match(line)
+        if match:
+            flush()
+            instruction = match.group(1) or None
+            continue
+
+        match = PAUSE_PATTERN.match(line)
+        if match:
+            flush(float(match.group(1).replace(',', '.')))
+            continue
+
+        lines.append(line)
+
+    flush()
+    return segments
+
+
+def _header(instruction: str | None) -> str:
+    return f'[INSTRUKSI_SUARA: {instruction}]\n[TEKS_SCRIPT]\n' if instruction else ''
+
+
+def _render(units: list[tuple[str | None, str, int]]) -> str:
+    """
+    Menyusun teks chunk dari unit (instruksi, kalimat, nomor segmen).
+    Instruksi ditulis di awal chunk dan setiap kali berganti; pergantian
+    segmen di dalam chunk (bekas [JEDA]) menjadi baris kosong.
+    """
+    parts = []
+    current_instruction = object()
+    current_segment = None
+    for instruction, sentence, segment_id in units:
+        if instruction != current_instruction:
+            if parts:
+                parts.append('\n\n')
+            parts.append(_header(instruction))
+            current_instruction = instruction
+        elif segment_id != current_segment:
+            parts.append('\n\n')
+        elif parts:
+            parts.append(' ')
+        parts.append(sentence)
+        current_segment = segment_id
+    return ''.join(parts)
+
+
+def _unit_costs(units: list[tuple[str | None, str, int]]) -> UnitCosts:
+    """Biaya karakter tiap unit, konsisten dengan panjang hasil `_render`."""
+    join_costs = []
+    for i, (instruction, _, segment_id) in enumerate(units):
+        if i == 0:
+            join_costs.append(0)
+            continue
+        previous_instruction, _, previous_segment = units[i - 1]
+        if instruction != previous_instruction:
+            join_costs.append(2 + len(_header(instruction)))
+        elif segment_id != previous_segment:
+            join_costs.append(2)
+        else:
+            join_costs.append(1)
+    return UnitCosts(
+        [len(sentence) for _, sentence, _ in units],
+        join_costs,
+        [len(_header(instruction)) for instruction, _, _ in units]
+    )
+
+
+def split_script_into_chunks(
+    script: str,
+    max_chars_per_chunk: int,
+    max_tokens_per_chunk: int | None = None
+) -> list[ScriptChunk]:
+    """
+    Membagi script menjadi chunk dengan jumlah request paling sedikit dan
+    ukuran seimbang (lihat `chunk_packer.pack_balanced`), masing-masing tidak
+    melebihi `max_chars_per_chunk` karakter maupun `max_tokens_per_chunk`
+    token, tanpa pernah memisahkan instruksi suara dari teks yang diaturnya.
+
+    Penanda [JEDA] tidak dikirim ke model: jeda yang jatuh di batas chunk
+    menjadi `pause_after` (hening yang dibuat lokal), jeda di dalam chunk
+    menjadi baris kosong.
+    """
+    segments = parse_script(script)
+    limit = char_budget(max_chars_per_chunk, max_tokens_per_chunk)
+
+    units = []
+    pauses = {}
+    for segment_id, segment in enumerate(segments):
+        # Sisakan tempat untuk header instruksi yang ditempel ulang di setiap chunk
+        sentence_limit = max(1, limit - len(_header(segment.instruction)))
+        for sentence in SENTENCE_BOUNDARY.split(segment.text):
+            for piece in split_long_sentence(sentence, sentence_limit):
+                units.append((segment.instruction, piece, segment_id))
+        pauses[segment_id] = segment.pause_after
+
+    result = []
+    for start, end in pack_balanced(_unit_costs(units), limit):
+        last_segment = units[end - 1][2]
+        # Jeda hanya dipakai jika chunk ini benar-benar menutup segmennya
+        ends_segment = end == len(units) or units[end][2] != last_segment
+        result.append(ScriptChunk(_render(units[start:end]), pauses[last_segment] if ends_segment else 0.0))
+
+    logger.info(f"Script dibagi menjadi {len(result)} chunk dari {len(segments)} segmen (Max {limit} karakter/chunk).")
+    return result
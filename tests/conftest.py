@@ -0,0 +1,24 @@
+import pytest
+
+import main
+from benchmarks.mock_gemini import MockGeminiServer
+from client_pool import ClientPool
+from key_health import KeyHealthTracker
+
+
+@pytest.fixture
+def mock_api(request, monkeypatch):
+    """
+    Server Gemini tiruan dengan dua API key, tanpa ledger, lease dan cache.
+    Latensi respons diatur lewat `MOCK_LATENCY` di modul test (default 0.05 detik).
+    """
+    with MockGeminiServer(latency=getattr(request.module, 'MOCK_LATENCY', 0.05)) as server:
+        pool = ClientPool(server.http_options)
+        monkeypatch.setattr(main, 'CLIENT_POOL', pool)
+        monkeypatch.setattr(main, 'API_KEYS_LIST', ['key-a', 'key-b'])
+        monkeypatch.setattr(main, 'KEY_HEALTH', KeyHealthTracker(2))
+        monkeypatch.setattr(main, 'KEY_LEDGER', None)
+        monkeypatch.setattr(main, 'KEY_LEASES', None)
+        monkeypatch.setattr(main, 'AUDIO_CACHE', None)
+        yield server
+        pool.close()
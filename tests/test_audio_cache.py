@@ -0,0 +1,42 @@
+import os
+
+from audio_cache import AudioCache, cache_key
+
+
+def test_cache_key_depends_on_every_parameter():
+    base = cache_key('Halo', 'Kore', 1.0, 'model-a')
+    assert base == cache_key('Halo', 'Kore', 1.0, 'model-a')
+    assert base != cache_key('Halo', 'Puck', 1.0, 'model-a')
+    assert base != cache_key('Halo', 'Kore', 0.5, 'model-a')
+    assert base != cache_key('Halo', 'Kore', 1.0, 'model-b')
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path):
+    cache = AudioCache(str(tmp_path), max_bytes=250)
+    cache.put('aa1', b'a' * 100)
+    cache.put('bb2', b'b' * 100)
+    assert cache.get('aa1') == b'a' * 100
+    cache.put('cc3', b'c' * 100)
+
+    assert cache.get('bb2') is None
+    assert cache.get('aa1') == b'a' * 100
+    assert cache.get('cc3') == b'c' * 100
+    assert not os.path.exists(cache._path('bb2'))
+
+
+def test_entry_larger_than_cache_is_skipped(tmp_path):
+    cache = AudioCache(str(tmp_path), max_bytes=10)
+    cache.put('aa1', b'a' * 11)
+    assert not cache.contains('aa1')
+
+
+def test_index_is_rebuilt_from_disk(tmp_path):
+    cache = AudioCache(str(tmp_path), max_bytes=1000)
+    cache.put('aa1', b'a' * 100)
+    cache.put('bb2', b'b' * 100)
+    # Tidak ada file sementara yang tertinggal
+    assert sorted(name for _, _, names in os.walk(tmp_path) for name in names) == ['aa1.pcm', 'bb2.pcm']
+
+    reopened = AudioCache(str(tmp_path), max_bytes=1000)
+    assert reopened.get('bb2') == b'b' * 100
+    assert reopened._total_bytes == 200
@@ -0,0 +1,91 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from audio_dsp import MAX_GAIN, ChunkJoiner, crossfade, pcm_to_array, rms, trim_silence
+
+RATE = 24000
+
+
+def _constant(value, seconds):
+    return np.full(int(RATE * seconds), value, dtype='<i2')
+
+
+def _tone(amplitude, seconds):
+    # Gelombang kotak: RMS sama dengan amplitudonya
+    samples = np.full(int(RATE * seconds), amplitude, dtype='<i2')
+    samples[1::2] = -amplitude
+    return samples
+
+
+def test_trim_silence_keeps_margin_around_voice():
+    samples = np.concatenate([_constant(0, 0.5), _tone(3000, 0.2), _constant(0, 0.5)])
+    trimmed = trim_silence(samples, RATE, threshold_dbfs=-45.0, keep_ms=60.0)
+    assert len(trimmed) == int(RATE * (0.2 + 2 * 0.06))
+    assert rms(trimmed[int(RATE * 0.06):-int(RATE * 0.06)]) == 3000
+
+
+def test_trim_threshold_decides_what_is_silence():
+    # -40 dBFS: bersuara untuk ambang -45, hening untuk ambang -35
+    quiet = _tone(328, 0.2)
+    samples = np.concatenate([_constant(0, 0.1), quiet, _constant(0, 0.1)])
+    assert len(trim_silence(samples, RATE, threshold_dbfs=-45.0, keep_ms=0)) == len(quiet)
+    assert len(trim_silence(samples, RATE, threshold_dbfs=-35.0, keep_ms=0)) == 0
+
+
+def test_pcm_to_array_is_a_view():
+    pcm_data = _tone(1000, 0.01).tobytes()
+    samples = pcm_to_array(pcm_data)
+    assert not samples.flags.owndata
+    assert samples.tobytes() == pcm_data
+
+
+def test_gain_matches_first_voiced_chunk():
+    joiner = ChunkJoiner(RATE, crossfade_ms=0)
+    # Chunk hening tidak menjadi acuan kenyaringan
+    assert joiner.process(_constant(0, 0.2).tobytes()) == b''
+    first = pcm_to_array(joiner.process(_tone(2000, 0.2).tobytes()))
+    second = pcm_to_array(joiner.process(_tone(4000, 0.2).tobytes()))
+    assert rms(first) == 2000
+    assert rms(second) == pytest.approx(2000, rel=0.01)
+
+
+def test_gain_is_limited():
+    joiner = ChunkJoiner(RATE, crossfade_ms=0)
+    joiner.process(_tone(8000, 0.2).tobytes())
+    quiet = pcm_to_array(joiner.process(_tone(500, 0.2).tobytes()))
+    assert rms(quiet) == pytest.approx(500 * MAX_GAIN, rel=0.01)
+
+
+def test_target_dbfs_sets_level():
+    joiner = ChunkJoiner(RATE, target_dbfs=-20.0, crossfade_ms=0)
+    out = pcm_to_array(joiner.process(_tone(1000, 0.2).tobytes()))
+    assert 20 * np.log10(rms(out) / 32767) == pytest.approx(-20.0, abs=0.1)
+
+
+def test_crossfade_ramps_between_chunks():
+    mixed = crossfade(_constant(1000, 0.01), _constant(3000, 0.01))
+    assert len(mixed) == int(RATE * 0.01)
+    assert mixed[0] == 1000 and mixed[-1] == 3000
+    assert np.all(np.diff(mixed.astype(np.int32)) >= 0)
+
+
+def test_joined_chunks_overlap_by_crossfade_length():
+    joiner = ChunkJoiner(RATE, crossfade_ms=15)
+    fade = int(RATE * 0.015)
+    first = _constant(1000, 0.2)
+    second = _constant(-1000, 0.2)
+    out = joiner.process(first.tobytes()) + joiner.process(second.tobytes()) + joiner.flush()
+
+    samples = pcm_to_array(out).astype(np.int32)
+    assert len(samples) == len(first) + len(second) - fade
+    # Tanpa crossfade sambungan melompat 2000; dengan crossfade perubahannya bertahap
+    assert np.abs(np.diff(samples)).max() <= 2000 / (fade - 1) + 1
+
+
+def test_pause_is_appended_without_crossfade():
+    joiner = ChunkJoiner(RATE, crossfade_ms=15)
+    first = _constant(1000, 0.2)
+    out = pcm_to_array(joiner.process(first.tobytes(), pause_after=0.5) + joiner.process(_constant(1000, 0.2).tobytes()))
+    assert np.array_equal(out[:len(first)], first)
+    assert not out[len(first):len(first) + int(RATE * 0.5)].any()
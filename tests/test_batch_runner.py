@@ -0,0 +1,61 @@
+import json
+import wave
+
+import pytest
+
+import batch_runner
+
+
+def _write_jobs(path, lines):
+    path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+    return str(path)
+
+
+def test_load_jobs_applies_defaults_and_skips_blank_lines(tmp_path):
+    jobs_file = _write_jobs(tmp_path / 'jobs.jsonl', [
+        json.dumps({'id': 'ep01', 'text': 'Halo.', 'voice': 'Kore', 'output': 'ep01.wav'}),
+        '',
+        json.dumps({'text': 'Budi: Halo.', 'voice': {'Budi': 'Puck'}, 'output': 'ep02.wav', 'temperature': 1, 'script_mode': True}),
+    ])
+    first, second = batch_runner.load_jobs(jobs_file)
+    assert (first.id, first.temperature, first.script_mode) == ('ep01', 0.7, False)
+    # Tanpa `id`, nomor baris yang dipakai
+    assert (second.id, second.voice, second.temperature, second.script_mode) == ('3', {'Budi': 'Puck'}, 1.0, True)
+
+
+@pytest.mark.parametrize('line', [
+    '{"text": "Halo.", "voice": "Kore"}',
+    '{"text": "Halo.", "voice": "Kore", "output": "a.wav", "temperature": "panas"}',
+    '{"text": "Halo.", "voice": "Kore", "output": "a.wav"',
+    '["bukan", "objek"]',
+])
+def test_invalid_job_line_is_reported_with_its_number(tmp_path, line):
+    jobs_file = _write_jobs(tmp_path / 'jobs.jsonl', [
+        json.dumps({'text': 'Halo.', 'voice': 'Kore', 'output': 'ok.wav'}),
+        line,
+    ])
+    with pytest.raises(ValueError, match='baris 2'):
+        batch_runner.load_jobs(jobs_file)
+
+
+def test_failing_jobs_do_not_stop_the_others(mock_api, tmp_path):
+    jobs = [
+        batch_runner.BatchJob('ep01', 'Halo semua. Selamat datang di episode pertama.', 'Kore', str(tmp_path / 'ep01.wav')),
+        batch_runner.BatchJob('kosong', '   ', 'Kore', str(tmp_path / 'kosong.wav')),
+        batch_runner.BatchJob('rusak', 'Folder output tidak ada.', 'Puck', str(tmp_path / 'tidak-ada' / 'rusak.wav')),
+        batch_runner.BatchJob('ep02', 'Sampai jumpa di episode berikutnya.', 'Puck', str(tmp_path / 'ep02.wav')),
+    ]
+    status_path = tmp_path / 'status.jsonl'
+    counts = batch_runner.run_batch(jobs, str(status_path), max_chars_per_chunk=25, rate_limit=False, base_delay=0)
+
+    assert counts == {'done': 2, 'failed': 2}
+    records = {record['id']: record for record in map(json.loads, status_path.read_text().splitlines())}
+    assert len(records) == 4
+    assert {job_id: record['status'] for job_id, record in records.items()} == {
+        'ep01': 'done', 'kosong': 'failed', 'rusak': 'failed', 'ep02': 'done'
+    }
+    assert records['kosong']['error'] == 'Teks kosong.'
+    assert records['ep01']['chunks'] > 1 and 'error' not in records['ep01']
+    for job_id in ('ep01', 'ep02'):
+        with wave.open(records[job_id]['output'], 'rb') as wf:
+            assert wf.getnframes() > 0
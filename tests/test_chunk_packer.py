@@ -0,0 +1,75 @@
+import itertools
+import random
+
+from chunk_packer import (
+    UnitCosts, char_budget, pack_balanced, pack_greedy, pack_sentences, split_long_sentence, split_sentences
+)
+from rate_limiter import CHARS_PER_TOKEN
+
+
+def _costs(lengths):
+    return UnitCosts(lengths, [1] * len(lengths), [0] * len(lengths))
+
+
+def _all_splits(count):
+    """Semua pembagian berurutan unit [0, count) menjadi span."""
+    for cuts in itertools.product((False, True), repeat=count - 1):
+        bounds = [0] + [i + 1 for i, cut in enumerate(cuts) if cut] + [count]
+        yield list(zip(bounds, bounds[1:]))
+
+
+def test_char_budget_uses_tighter_limit():
+    assert char_budget(4800) == 4800
+    assert char_budget(4800, 100) == 100 * CHARS_PER_TOKEN
+    assert char_budget(10, 100) == 10
+
+
+def test_unit_costs_match_joined_text():
+    sentences = ['Satu.', 'Dua dua.', 'Tiga tiga tiga.']
+    costs = _costs([len(s) for s in sentences])
+    for start in range(3):
+        for end in range(start + 1, 4):
+            assert costs.cost(start, end) == len(' '.join(sentences[start:end]))
+
+
+def test_balanced_packing_is_optimal():
+    rng = random.Random(7)
+    for _ in range(200):
+        lengths = [rng.randint(1, 30) for _ in range(rng.randint(1, 9))]
+        limit = rng.randint(max(lengths), 80)
+        costs = _costs(lengths)
+        spans = pack_balanced(costs, limit)
+
+        valid = [split for split in _all_splits(len(lengths)) if all(costs.cost(s, e) <= limit for s, e in split)]
+        fewest = min(len(split) for split in valid)
+        assert len(spans) == fewest == len(pack_greedy(costs, limit))
+        best_largest = min(max(costs.cost(s, e) for s, e in split) for split in valid if len(split) == fewest)
+        assert max(costs.cost(s, e) for s, e in spans) == best_largest
+
+
+def test_balanced_packing_avoids_tiny_last_chunk():
+    sentences = ['a' * 40, 'b' * 40, 'c' * 40, 'd' * 10]
+    assert pack_greedy(_costs([40, 40, 40, 10]), 100) == [(0, 2), (2, 4)]
+    chunks = pack_sentences(sentences, 100)
+    assert len(chunks) == 2
+    assert max(map(len, chunks)) <= 100
+    assert ' '.join(chunks) == ' '.join(sentences)
+
+
+def test_oversized_sentence_is_cut_on_spaces():
+    sentence = 'kata ' * 30
+    pieces = split_long_sentence(sentence.strip(), 24)
+    assert all(len(piece) <= 24 for piece in pieces)
+    assert ' '.join(pieces) == sentence.strip()
+
+
+def test_word_longer_than_limit_is_cut_hard():
+    assert split_long_sentence('x' * 25, 10) == ['x' * 10, 'x' * 10, 'x' * 5]
+
+
+def test_split_sentences_keeps_punctuation():
+    assert split_sentences('Halo! Apa kabar? Baik.', 100) == ['Halo!', 'Apa kabar?', 'Baik.']
+
+
+def test_pack_sentences_empty():
+    assert pack_sentences([], 100) == []
@@ -0,0 +1,46 @@
+import threading
+import time
+
+import pytest
+
+from coalesce import InFlightRequests
+
+
+def test_identical_calls_run_once():
+    in_flight = InFlightRequests()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return b'pcm'
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(in_flight.run('chunk', fetch)))
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=lambda: results.append(in_flight.run('chunk', fetch)))
+    follower.start()
+    # Beri waktu pemanggil kedua masuk dan menunggu hasil pemanggil pertama
+    time.sleep(0.2)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+
+    assert len(calls) == 1
+    assert sorted(results, key=lambda result: result[1]) == [(b'pcm', False), (b'pcm', True)]
+    assert len(in_flight) == 0
+
+
+def test_error_is_raised_and_key_released():
+    in_flight = InFlightRequests()
+
+    def fail():
+        raise RuntimeError('gagal')
+
+    with pytest.raises(RuntimeError):
+        in_flight.run('chunk', fail)
+    assert in_flight.run('chunk', lambda: b'pcm') == (b'pcm', False)
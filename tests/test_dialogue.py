@@ -0,0 +1,52 @@
+import pytest
+
+from dialogue import chunk_speakers, parse_dialogue, speaker_voices, split_dialogue_into_chunks
+
+VOICES = {'Budi': 'Puck', 'Sari': 'Kore'}
+
+
+def test_parse_dialogue_turns_and_pause():
+    turns = parse_dialogue("Budi: Halo semua.\nSari: Hai Budi!\n[JEDA: 1,5 detik]\nBudi: Lanjut.", VOICES)
+    assert [(t.speaker, t.text, t.pause_after) for t in turns] == [
+        ('Budi', 'Halo semua.', 0.0),
+        ('Sari', 'Hai Budi!', 1.5),
+        ('Budi', 'Lanjut.', 0.0),
+    ]
+
+
+def test_colon_continuation_lines_stay_in_turn():
+    script = (
+        "Budi: Ini pengumuman.\n"
+        "Catatan penting: jangan lupa follow.\n"
+        "https://example.com/episode-1\n"
+        "Sari: Siap!"
+    )
+    turns = parse_dialogue(script, VOICES)
+    assert [t.speaker for t in turns] == ['Budi', 'Sari']
+    assert turns[0].text == 'Ini pengumuman. Catatan penting: jangan lupa follow. https://example.com/episode-1'
+
+
+def test_colon_continuation_lines_do_not_block_planning():
+    script = "Budi: Ini pengumuman.\nCatatan penting: jangan lupa follow.\nhttps://example.com\nSari: Siap!"
+    chunks = split_dialogue_into_chunks(script, VOICES, 4800)
+    assert len(chunks) == 1
+    assert chunks[0].speakers == ['Budi', 'Sari']
+    assert chunk_speakers(chunks[0].text) == ['Budi', 'Sari']
+    assert speaker_voices(chunks[0].text, VOICES) == VOICES
+
+
+def test_line_before_first_speaker_is_rejected():
+    with pytest.raises(ValueError):
+        parse_dialogue("Catatan: belum ada pembicara.\nBudi: Halo.", VOICES)
+
+
+def test_single_speaker_chunk_is_padded_to_two_voices():
+    text = split_dialogue_into_chunks("Sari: Sendirian saja.", VOICES, 4800)[0].text
+    assert speaker_voices(text, VOICES) == {'Sari': 'Kore', 'Budi': 'Puck'}
+
+
+def test_chunks_hold_at_most_two_speakers():
+    voices = {'A': 'Puck', 'B': 'Kore', 'C': 'Zephyr'}
+    chunks = split_dialogue_into_chunks("A: satu.\nB: dua.\nC: tiga.\nA: empat.", voices, 4800)
+    assert all(len(chunk.speakers) <= 2 for chunk in chunks)
+    assert [chunk.speakers for chunk in chunks] == [['A', 'B'], ['C', 'A']]
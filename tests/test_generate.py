@@ -0,0 +1,80 @@
+import asyncio
+import os
+import threading
+import wave
+
+import pytest
+
+import async_tts
+import main
+from async_tts import generate_audio_for_chunks_async
+
+
+def test_resume_with_output_filename_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        main.generate_audio_for_chunks(
+            'Halo.', 'Kore', str(tmp_path / 'out'), 4800, 1, 0,
+            resume=True, output_filename=str(tmp_path / 'final.wav')
+        )
+
+
+def test_resume_with_output_filename_is_rejected_async(tmp_path):
+    with pytest.raises(ValueError):
+        asyncio.run(generate_audio_for_chunks_async(
+            'Halo.', 'Kore', str(tmp_path / 'out'), 4800, 1, 0,
+            resume=True, output_filename=str(tmp_path / 'final.wav')
+        ))
+
+
+@pytest.mark.parametrize('max_in_flight_per_key', [1, 2])
+def test_concurrent_chunks_are_saved_in_chunk_order(mock_api, tmp_path, max_in_flight_per_key):
+    # Chunk panjang dijawab lebih lambat, jadi urutan selesai berbeda dengan urutan chunk
+    mock_api.latency_per_char = 0.004
+    text = (
+        'Kalimat pembuka ini dibuat cukup panjang. Pendek saja. '
+        'Kalimat ketiga lumayan panjang isinya. Singkat. '
+        'Kalimat penutup dibuat sedikit lebih panjang. Dah.'
+    )
+    text_chunks, _ = main.prepare_chunks(text, 45, None, False)
+    assert len(text_chunks) > 3 and len(set(map(len, text_chunks))) == len(text_chunks)
+
+    base_filename = str(tmp_path / 'narasi.wav')
+    main.generate_audio_for_chunks(
+        text, 'Kore', base_filename, 45, 1, 0, concurrent=True, max_in_flight_per_key=max_in_flight_per_key
+    )
+
+    # Panjang audio tiruan sebanding dengan teks, jadi setiap file bisa dicocokkan dengan chunk-nya
+    for chunk_index, chunk in enumerate(text_chunks, start=1):
+        with wave.open(main.chunk_output_path(base_filename, chunk_index), 'rb') as wf:
+            assert wf.getnframes() == int(max(0.1, len(chunk) * mock_api.seconds_per_char) * 24000)
+    assert not os.path.exists(main.chunk_output_path(base_filename, len(text_chunks) + 1))
+    stats = mock_api.stats()
+    assert stats['succeeded'] == len(text_chunks)
+    assert 1 <= stats['max_in_flight_per_key'] <= max_in_flight_per_key
+    assert len(mock_api.peak_in_flight) == 2
+
+
+def test_async_chunk_files_are_written_off_the_event_loop(mock_api, tmp_path, monkeypatch):
+    writers = []
+    save_audio_to_wav = main.save_audio_to_wav
+
+    def recording_save(filename, pcm_data, chunk_index):
+        writers.append(threading.current_thread())
+        save_audio_to_wav(filename, pcm_data, chunk_index)
+
+    monkeypatch.setattr(main, 'save_audio_to_wav', recording_save)
+    base_filename = str(tmp_path / 'narasi.wav')
+
+    async def run():
+        loop_thread = threading.current_thread()
+        await async_tts.run_and_close(generate_audio_for_chunks_async(
+            'Kalimat pertama di sini. Kalimat kedua di sana.', 'Kore', base_filename, 30, 1, 0
+        ))
+        return loop_thread
+
+    loop_thread = asyncio.run(run())
+    assert len(writers) == 2
+    assert loop_thread not in writers
+    for chunk_index in (1, 2):
+        with wave.open(main.chunk_output_path(base_filename, chunk_index), 'rb') as wf:
+            assert wf.getnframes() > 0
@@ -0,0 +1,100 @@
+import asyncio
+import time
+
+import async_tts
+import main
+from hedging import HedgePolicy
+from rate_limiter import KeySlots, RateLimiterPool
+
+
+def test_slow_chunk_is_hedged_to_an_idle_key(monkeypatch):
+    monkeypatch.setattr(main, 'API_KEYS_LIST', ['key-slow', 'key-fast'])
+    monkeypatch.setattr(main, 'KEY_HEALTH', None)
+    monkeypatch.setattr(main, 'KEY_LEDGER', None)
+    monkeypatch.setattr(main, 'KEY_LEASES', None)
+
+    def fake_call_api(api_key, key_index, prompt, voice, temperature, tokens, hedge=None):
+        time.sleep(1.0 if api_key == 'key-slow' else 0.01)
+        return api_key.encode()
+
+    monkeypatch.setattr(main, '_call_api', fake_call_api)
+    hedge = HedgePolicy(percentile=0.5, min_samples=1)
+    hedge.set_budget(5)
+    hedge.observe(0.05)
+    key_slots = KeySlots(2)
+
+    started = time.monotonic()
+    data = main._synthesize_hedged('Halo.', 'Kore', 1, 1, 0, 0.7, key_slots, 0, None, hedge)
+
+    assert data == b'key-fast'
+    assert time.monotonic() - started < 0.8
+    assert (hedge.launched, hedge.won, hedge.budget) == (1, 1, 4)
+
+
+def test_fast_chunk_is_not_hedged(monkeypatch):
+    monkeypatch.setattr(main, 'API_KEYS_LIST', ['key-a', 'key-b'])
+    monkeypatch.setattr(main, 'KEY_HEALTH', None)
+    monkeypatch.setattr(main, 'KEY_LEDGER', None)
+    monkeypatch.setattr(main, 'KEY_LEASES', None)
+    monkeypatch.setattr(main, '_call_api', lambda api_key, *args, **kwargs: api_key.encode())
+    hedge = HedgePolicy(percentile=0.5, min_samples=1)
+    hedge.set_budget(5)
+    hedge.observe(1.0)
+
+    assert main._synthesize_hedged('Halo.', 'Kore', 1, 1, 0, 0.7, KeySlots(2), 0, None, hedge) == b'key-a'
+    assert hedge.launched == 0
+
+
+def _slow_primary(monkeypatch, keys):
+    monkeypatch.setattr(main, 'API_KEYS_LIST', keys)
+    monkeypatch.setattr(main, 'KEY_HEALTH', None)
+    monkeypatch.setattr(main, 'KEY_LEDGER', None)
+    monkeypatch.setattr(main, 'KEY_LEASES', None)
+
+    def fake_call_api(api_key, key_index, prompt, voice, temperature, tokens, hedge=None):
+        time.sleep(0.3)
+        return api_key.encode()
+
+    monkeypatch.setattr(main, '_call_api', fake_call_api)
+    hedge = HedgePolicy(percentile=0.5, min_samples=1)
+    hedge.set_budget(1)
+    hedge.observe(0.01)
+    return hedge
+
+
+def test_spent_budget_does_not_touch_idle_key_quota(monkeypatch):
+    hedge = _slow_primary(monkeypatch, ['key-a', 'key-b'])
+    # Jatah terakhir diambil chunk lain di antara hedge_delay() dan consume()
+    monkeypatch.setattr(hedge, 'consume', lambda: False)
+    pool = RateLimiterPool(2, rpm=1)
+
+    assert main._synthesize_hedged('Halo.', 'Kore', 1, 1, 0, 0.7, pool, 0, None, hedge) == b'key-a'
+    assert pool.limiters[1].wait_time(0, time.time()) == 0
+    assert pool.try_acquire_idle() == 1
+
+
+def test_budget_is_refunded_while_no_key_is_idle(monkeypatch):
+    hedge = _slow_primary(monkeypatch, ['key-a'])
+
+    assert main._synthesize_hedged('Halo.', 'Kore', 1, 1, 0, 0.7, KeySlots(1), 0, None, hedge) == b'key-a'
+    assert (hedge.launched, hedge.budget) == (0, 1)
+
+
+def test_spent_budget_does_not_touch_idle_key_quota_async(monkeypatch):
+    hedge = HedgePolicy(percentile=0.5, min_samples=1)
+    hedge.set_budget(1)
+    hedge.observe(0.01)
+    monkeypatch.setattr(hedge, 'consume', lambda: False)
+    pool = RateLimiterPool(2, rpm=1)
+    progress = {'sent_at': time.monotonic()}
+
+    async def primary():
+        await asyncio.sleep(0.3)
+        return b'key-a'
+
+    async def run():
+        return await async_tts._synthesize_hedged(primary(), progress, 'Halo.', 'Kore', 0.7, 1, pool, hedge)
+
+    assert asyncio.run(run()) == b'key-a'
+    assert pool.try_acquire_idle() == 0
+    assert pool.try_acquire_idle() == 1
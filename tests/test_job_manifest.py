@@ -0,0 +1,48 @@
+import wave
+
+from job_manifest import STATUS_DONE, STATUS_FAILED, JobManifest
+
+
+def _write_wav(path, frames=10):
+    with wave.open(str(path), 'wb') as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(24000)
+        wav_file.writeframes(b'\x00\x00' * frames)
+
+
+def test_done_chunk_survives_reopen(tmp_path):
+    path = str(tmp_path / 'job.manifest.json')
+    chunk = tmp_path / 'job_01.wav'
+    _write_wav(chunk)
+    JobManifest.open(path).mark(1, 'hash-1', STATUS_DONE, str(chunk))
+    JobManifest.open(path).mark(2, 'hash-2', STATUS_FAILED, str(tmp_path / 'job_02.wav'))
+
+    manifest = JobManifest.open(path)
+    assert manifest.is_done(1, 'hash-1')
+    assert not manifest.is_done(1, 'teks-berubah')
+    assert not manifest.is_done(2, 'hash-2')
+
+
+def test_missing_or_broken_output_is_not_done(tmp_path):
+    manifest = JobManifest.open(str(tmp_path / 'job.manifest.json'))
+    broken = tmp_path / 'job_01.wav'
+    broken.write_bytes(b'RIFF')
+    manifest.mark(1, 'hash-1', STATUS_DONE, str(broken))
+    manifest.mark(2, 'hash-2', STATUS_DONE, str(tmp_path / 'hilang.wav'))
+    assert not manifest.is_done(1, 'hash-1')
+    assert not manifest.is_done(2, 'hash-2')
+
+
+def test_truncate_returns_stale_outputs(tmp_path):
+    manifest = JobManifest.open(str(tmp_path / 'job.manifest.json'))
+    for index in (1, 2, 3):
+        manifest.mark(index, f'hash-{index}', STATUS_DONE, f'job_0{index}.wav')
+    assert manifest.truncate(1) == ['job_02.wav', 'job_03.wav']
+    assert list(JobManifest.open(manifest.path).chunks) == ['1']
+
+
+def test_unreadable_manifest_starts_over(tmp_path):
+    path = tmp_path / 'job.manifest.json'
+    path.write_text('{rusak')
+    assert JobManifest.open(str(path)).chunks == {}
@@ -0,0 +1,156 @@
+import time
+
+import pytest
+
+import main
+from key_health import KeyHealthTracker
+from key_ledger import KeyLedger
+from rate_limiter import MINUTE_WINDOW, KeySlots, RateLimitExceeded
+from retry_policy import INVALID_KEY, QUOTA, TRANSIENT
+
+
+class _Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_invalid_key_is_quarantined():
+    health = KeyHealthTracker(3, clock=_Clock())
+    health.record_failure(1, INVALID_KEY)
+    assert health.keys[1].quarantined
+    assert health.rank([0, 1, 2]) == [0, 2]
+
+
+def test_quota_cooldown_expires():
+    clock = _Clock()
+    health = KeyHealthTracker(2, clock=clock)
+    health.record_failure(0, QUOTA, cooldown=30)
+    assert health.rank([0, 1]) == [1]
+    # Kuota habis tidak dihitung sebagai error key
+    assert health.keys[0].error_rate == 0.0
+
+    clock.now += 30
+    assert health.rank([0, 1]) == [0, 1]
+
+
+def test_default_cooldown_is_one_minute():
+    clock = _Clock()
+    health = KeyHealthTracker(1, clock=clock)
+    health.record_failure(0, QUOTA)
+    assert health.seconds_until_available() == MINUTE_WINDOW
+
+
+def test_rank_prefers_fast_and_reliable_keys():
+    health = KeyHealthTracker(3, clock=_Clock())
+    health.record_success(0, 2.0)
+    health.record_success(1, 1.0)
+    health.record_success(2, 0.5)
+    assert health.rank([0, 1, 2]) == [2, 1, 0]
+
+    # Satu kegagalan: skor 0.5 * (1 + 4 * 0.3) = 1.1, lebih buruk dari key 1
+    health.record_failure(2, TRANSIENT)
+    assert health.keys[2].error_rate == pytest.approx(0.3)
+    assert health.rank([0, 1, 2]) == [1, 2, 0]
+
+
+def test_latency_is_exponentially_weighted():
+    health = KeyHealthTracker(1, alpha=0.5, clock=_Clock())
+    health.record_success(0, 1.0)
+    health.record_success(0, 3.0)
+    assert health.keys[0].latency == pytest.approx(2.0)
+
+
+def test_unknown_keys_rank_as_average_and_keep_order():
+    health = KeyHealthTracker(3, clock=_Clock())
+    health.record_success(0, 3.0)
+    health.record_success(1, 1.0)
+    assert health.rank([2, 0, 1]) == [1, 2, 0]
+    assert KeyHealthTracker(3).rank([1, 2, 0]) == [1, 2, 0]
+
+
+def test_seconds_until_available():
+    clock = _Clock()
+    health = KeyHealthTracker(3, clock=clock)
+    health.record_failure(0, INVALID_KEY)
+    health.record_failure(1, QUOTA, cooldown=20)
+    health.cool_down(2, clock.now + 10)
+    assert health.seconds_until_available() == 10
+    assert health.seconds_until_available(exclude={2}) == 20
+
+    health.record_failure(1, INVALID_KEY)
+    health.record_failure(2, INVALID_KEY)
+    assert health.seconds_until_available() is None
+
+
+def test_slots_fail_fast_when_every_key_is_quarantined():
+    health = KeyHealthTracker(2, clock=_Clock())
+    health.record_failure(0, INVALID_KEY)
+    health.record_failure(1, INVALID_KEY)
+    with pytest.raises(RateLimitExceeded):
+        KeySlots(2, health=health).acquire(0)
+
+
+def test_slots_skip_cooling_key_and_respect_max_wait():
+    clock = _Clock()
+    health = KeyHealthTracker(2, clock=clock)
+    health.record_failure(0, QUOTA, cooldown=30)
+    health.record_failure(1, QUOTA, cooldown=5)
+    slots = KeySlots(2, health=health, max_wait=10)
+    clock.now += 5
+    assert slots.acquire(0) == 1
+    slots.release(1)
+
+    # Kedua key baru tersedia setelah lebih dari 20 detik: lebih lama dari max_wait
+    health.record_failure(1, QUOTA, cooldown=30)
+    with pytest.raises(RateLimitExceeded):
+        slots.acquire(0)
+
+
+@pytest.fixture
+def sequential_keys(monkeypatch):
+    clock = _Clock()
+    health = KeyHealthTracker(2, clock=clock)
+    monkeypatch.setattr(main, 'API_KEYS_LIST', ['key-a', 'key-b'])
+    monkeypatch.setattr(main, 'KEY_HEALTH', health)
+    monkeypatch.setattr(main, 'KEY_LEDGER', None)
+    monkeypatch.setattr(main, 'KEY_LEASES', None)
+    monkeypatch.setattr(main, 'current_api_key_index', 0)
+    slept = []
+
+    def fake_sleep(seconds):
+        slept.append(seconds)
+        clock.now += seconds
+
+    monkeypatch.setattr(main.time, 'sleep', fake_sleep)
+    return health, clock, slept
+
+
+def test_sequential_key_waits_for_earliest_cooldown(sequential_keys):
+    health, clock, slept = sequential_keys
+    health.record_failure(0, QUOTA, cooldown=40)
+    health.record_failure(1, QUOTA, cooldown=25)
+    assert main.get_current_api_key() == 'key-b'
+    assert slept == [25]
+    assert main.current_api_key_index == 1
+
+
+def test_sequential_key_reports_quota_when_ledger_is_exhausted(sequential_keys, tmp_path, monkeypatch):
+    health, clock, slept = sequential_keys
+    ledger = KeyLedger(str(tmp_path / 'ledger.sqlite3'))
+    monkeypatch.setattr(main, 'KEY_LEDGER', ledger)
+    ledger.record_exhausted('key-a', time.time() + 3600, daily=True)
+    health.record_failure(1, INVALID_KEY)
+    with pytest.raises(RateLimitExceeded):
+        main.get_current_api_key()
+    assert slept == []
+    ledger.close()
+
+
+def test_sequential_key_is_none_when_all_quarantined(sequential_keys):
+    health, clock, slept = sequential_keys
+    health.record_failure(0, INVALID_KEY)
+    health.record_failure(1, INVALID_KEY)
+    assert main.get_current_api_key() is None
@@ -0,0 +1,86 @@
+import time
+import weakref
+
+import main
+from key_ledger import KeyLedger
+from key_lease import KeyLeaseCoordinator
+from rate_limiter import RateLimiterPool
+
+
+def test_takeover_reseeds_running_rate_limiter(tmp_path, monkeypatch):
+    ledger = KeyLedger(str(tmp_path / 'ledger.sqlite3'), rpd=3)
+    rate_limiter = RateLimiterPool(2, rpd=3)
+    monkeypatch.setattr(main, 'API_KEYS_LIST', ['key-a', 'key-b'])
+    monkeypatch.setattr(main, 'KEY_LEDGER', ledger)
+    monkeypatch.setattr(main, 'KEY_HEALTH', None)
+    monkeypatch.setattr(main, 'RATE_LIMITERS', weakref.WeakSet([rate_limiter]))
+    now = time.time()
+
+    # Proses lain memakai key-b setelah penjadwal ini dibuat
+    ledger.record_usage('key-b', timestamp=now - 300)
+    ledger.record_usage('key-b', timestamp=now - 200)
+    main._on_key_leased(1, now - 200)
+    assert rate_limiter.limiters[1].wait_time(0, now) == 0
+    # Seed ulang mengganti riwayat; riwayat ganda (4 request) akan melewati RPD 3
+    main._on_key_leased(1, now - 200)
+    assert rate_limiter.limiters[1].wait_time(0, now) == 0
+
+    ledger.record_usage('key-b', timestamp=now - 100)
+    main._on_key_leased(1, now - 100)
+    assert rate_limiter.limiters[1].wait_time(0, now) > 23 * 3600
+    assert rate_limiter.try_acquire_idle(exclude={0}) is None
+    assert rate_limiter.try_acquire_idle() == 0
+    ledger.close()
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_keys_are_handed_over_between_workers(tmp_path):
+    path = str(tmp_path / 'leases.sqlite3')
+    keys = ['key-0', 'key-1', 'key-2', 'key-3']
+    clock = _Clock()
+    acquired_b = []
+    a = KeyLeaseCoordinator(path, keys, ttl=30, clock=clock)
+    b = KeyLeaseCoordinator(path, keys, ttl=30, clock=clock, on_acquire=lambda i, t: acquired_b.append((i, t)))
+
+    a.rebalance()
+    assert a.held == {0, 1, 2, 3}
+    a.mark_used(3)
+    # B terdaftar, tetapi semua key masih disewa A
+    assert b.rebalance() == (set(), set())
+
+    clock.now += 5
+    assert a.rebalance() == (set(), {2, 3})
+    b.rebalance()
+    assert a.held == {0, 1} and b.held == {2, 3}
+    # Key yang dilepas membawa waktu pemakaian terakhirnya
+    assert sorted(acquired_b) == [(2, 0.0), (3, 1000.0)]
+
+    a.close()
+    clock.now += 5
+    b.rebalance()
+    assert b.held == {0, 1, 2, 3}
+    b.close()
+
+
+def test_expired_lease_of_dead_worker_is_taken_over(tmp_path):
+    path = str(tmp_path / 'leases.sqlite3')
+    clock = _Clock()
+    dead = KeyLeaseCoordinator(path, ['key-0', 'key-1'], ttl=30, clock=clock)
+    dead.rebalance()
+    alive = KeyLeaseCoordinator(path, ['key-0', 'key-1'], ttl=30, clock=clock)
+    alive.rebalance()
+    assert alive.held == frozenset()
+
+    # Worker pertama berhenti memperpanjang lease
+    clock.now += 31
+    alive.rebalance()
+    assert alive.held == {0, 1}
+    alive.close()
+    dead._conn.close()
@@ -0,0 +1,80 @@
+import time
+
+import main
+from key_ledger import KeyLedger
+
+
+def test_short_block_is_not_daily_exhaustion(tmp_path):
+    ledger = KeyLedger(str(tmp_path / 'ledger.sqlite3'))
+    now = time.time()
+    ledger.record_exhausted('key-a', now + 60)
+    assert ledger.blocked_until('key-a') == now + 60
+    assert not ledger.is_exhausted('key-a')
+
+    ledger.record_exhausted('key-a', now + 86400, daily=True)
+    assert ledger.is_exhausted('key-a')
+    assert ledger.blocked_until('key-a', daily_only=True) == now + 86400
+    ledger.close()
+
+
+def test_rpd_used_up_is_exhausted(tmp_path):
+    ledger = KeyLedger(str(tmp_path / 'ledger.sqlite3'), rpd=2)
+    ledger.record_usage('key-a')
+    assert not ledger.is_exhausted('key-a')
+    ledger.record_usage('key-a')
+    assert ledger.is_exhausted('key-a')
+    ledger.close()
+
+
+def test_load_api_keys_leaves_short_blocks_to_the_scheduler(tmp_path, monkeypatch):
+    keys_file = tmp_path / 'api-keys.txt'
+    keys_file.write_text('key-a\nkey-b\n')
+    ledger_path = str(tmp_path / 'ledger.sqlite3')
+    ledger = KeyLedger(ledger_path)
+    now = time.time()
+    ledger.record_exhausted('key-a', now + 40)
+    ledger.record_exhausted('key-b', now + 20)
+    ledger.close()
+
+    slept = []
+    monkeypatch.setattr(main.time, 'sleep', slept.append)
+    for name in ('API_KEYS_LIST', 'KEY_HEALTH', 'KEY_LEDGER', 'current_api_key_index'):
+        monkeypatch.setattr(main, name, getattr(main, name))
+    main.load_api_keys(str(keys_file), ledger_path)
+    main.KEY_LEDGER.close()
+
+    assert slept == []
+    assert main.current_api_key_index == 1
+    # Kedua key tetap dimuat, hanya diistirahatkan sampai blokirnya selesai
+    assert main.KEY_HEALTH.rank([0, 1]) == []
+    assert 15 < main.KEY_HEALTH.seconds_until_available() <= 20
+
+
+def test_usage_and_exhaustion_survive_reopen(tmp_path):
+    path = str(tmp_path / 'ledger.sqlite3')
+    now = time.time()
+    ledger = KeyLedger(path, rpd=2)
+    ledger.record_usage('key-a', tokens=10, timestamp=now - 60)
+    ledger.record_usage('key-a', tokens=20, timestamp=now - 30)
+    ledger.record_exhausted('key-b', now + 3600, daily=True)
+    ledger.close()
+
+    reopened = KeyLedger(path, rpd=2)
+    assert reopened.usage_events('key-a') == [(now - 60, 10), (now - 30, 20)]
+    assert reopened.is_exhausted('key-a')
+    assert reopened.is_exhausted('key-b')
+    assert reopened.blocked_until('key-b', daily_only=True) == now + 3600
+    reopened.close()
+
+
+def test_old_events_are_pruned_on_open(tmp_path):
+    path = str(tmp_path / 'ledger.sqlite3')
+    now = time.time()
+    ledger = KeyLedger(path)
+    ledger.record_usage('key-a', timestamp=now - 2 * 86400)
+    ledger.record_usage('key-a', timestamp=now - 60)
+    ledger.close()
+
+    reopened = KeyLedger(path)
+    assert reopened.usage_events('key-a') == [(now - 60, 0)]
+    reopened.close()
@@ -0,0 +1,56 @@
+import json
+
+import pytest
+
+from metrics import REQUESTS, STAGE_SECONDS, Histogram, Metrics
+
+
+def test_counters_by_label():
+    metrics = Metrics()
+    metrics.inc(REQUESTS, key=0, outcome='ok')
+    metrics.inc(REQUESTS, key=0, outcome='ok')
+    metrics.inc(REQUESTS, key=1, outcome='error')
+
+    assert metrics.counter_value(REQUESTS, key=0, outcome='ok') == 2
+    assert metrics.counter_value(REQUESTS, outcome='error', key=1) == 1
+    assert metrics.counter_value(REQUESTS, key=2, outcome='ok') == 0
+    assert metrics.counter_total(REQUESTS) == 3
+
+
+def test_histogram_quantile():
+    hist = Histogram((0.1, 1.0, 10.0))
+    for value in (0.05, 0.5, 0.5, 5.0):
+        hist.observe(value)
+    assert hist.quantile(0.5) == 1.0
+    assert hist.quantile(1.0) == 5.0
+    assert Histogram().quantile(0.95) == 0.0
+
+
+def test_stage_timer_records_failures():
+    metrics = Metrics()
+    with pytest.raises(RuntimeError):
+        with metrics.stage('combine'):
+            raise RuntimeError('gagal')
+    assert metrics.snapshot()['histograms'][STAGE_SECONDS][0]['count'] == 1
+
+
+def test_prometheus_format_escapes_labels():
+    metrics = Metrics()
+    metrics.inc(REQUESTS, reason='a"b')
+    metrics.observe('tts_request_seconds', 0.2, key=0)
+    text = metrics.to_prometheus()
+    assert 'tts_requests_total{reason="a\\"b"} 1' in text
+    assert 'tts_request_seconds_bucket{key="0",le="0.25"} 1' in text
+    assert 'tts_request_seconds_bucket{key="0",le="+Inf"} 1' in text
+    assert 'tts_request_seconds_count{key="0"} 1' in text
+
+
+def test_export_json_and_prometheus(tmp_path):
+    metrics = Metrics()
+    metrics.inc(REQUESTS, key=0, outcome='ok')
+    metrics.export(str(tmp_path / 'm.json'))
+    metrics.export(str(tmp_path / 'm.prom'))
+    snapshot = json.loads((tmp_path / 'm.json').read_text())
+    assert snapshot['counters'][REQUESTS] == [{'labels': {'key': '0', 'outcome': 'ok'}, 'value': 1}]
+    assert (tmp_path / 'm.prom').read_text().startswith('# TYPE tts_requests_total counter')
+    assert not list(tmp_path.glob('*.tmp'))
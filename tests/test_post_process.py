@@ -0,0 +1,72 @@
+import math
+import struct
+
+import pytest
+
+import audio_dsp
+import post_process
+from post_process import normalize_loudness, rms_dbfs, validate_pcm
+from wav_stream import MissingChunkError, OrderedWavWriter
+
+
+def _pcm(samples):
+    return struct.pack(f'<{len(samples)}h', *samples)
+
+
+def _values(pcm_data):
+    return struct.unpack(f'<{len(pcm_data) // 2}h', pcm_data)
+
+
+@pytest.fixture(params=['numpy', 'audioop', 'python'])
+def backend(request, monkeypatch):
+    if request.param == 'numpy' and not audio_dsp.numpy_available():
+        pytest.skip('NumPy tidak terpasang')
+    if request.param == 'audioop' and post_process.audioop is None:
+        pytest.skip('audioop tidak tersedia')
+    if request.param != 'numpy':
+        monkeypatch.setattr(audio_dsp, 'np', None)
+    if request.param == 'python':
+        monkeypatch.setattr(post_process, 'audioop', None)
+    return request.param
+
+
+def test_rms_dbfs(backend):
+    assert rms_dbfs(b'') == -math.inf
+    assert rms_dbfs(_pcm([0] * 100)) == -math.inf
+    assert rms_dbfs(_pcm([3277, -3277] * 50)) == pytest.approx(-20.0, abs=0.01)
+
+
+def test_normalize_loudness_reaches_target(backend):
+    quiet = _pcm([1000, -1000, 500, -500] * 250)
+    louder = normalize_loudness(quiet, -20.0)
+    assert rms_dbfs(louder) == pytest.approx(-20.0, abs=0.1)
+
+
+def test_normalize_loudness_never_clips(backend):
+    # Satu puncak tinggi membatasi gain walau RMS masih di bawah target
+    pcm = _pcm([30000] + [100, -100] * 500)
+    assert max(abs(value) for value in _values(normalize_loudness(pcm, -3.0))) <= 32767
+
+
+def test_normalize_loudness_leaves_silence(backend):
+    hiss = _pcm([1, -1] * 100)
+    assert normalize_loudness(hiss) == hiss
+
+
+def test_validate_pcm_drops_trailing_byte():
+    assert validate_pcm(b'\x01\x00\x02', 1) == b'\x01\x00'
+    with pytest.raises(ValueError):
+        validate_pcm(b'', 1)
+
+
+@pytest.mark.parametrize('smooth_joins', [False, True])
+def test_post_processor_reports_missing_chunk(tmp_path, smooth_joins):
+    if smooth_joins and not audio_dsp.numpy_available():
+        pytest.skip('NumPy tidak terpasang')
+    joiner = audio_dsp.ChunkJoiner() if smooth_joins else None
+    processor = post_process.PostProcessor(OrderedWavWriter(str(tmp_path / 'out.wav')), joiner=joiner)
+    processor.submit(1, _pcm([1000, -1000] * 2400))
+    processor.submit(3, _pcm([1000, -1000] * 2400))
+    with pytest.raises(MissingChunkError) as error:
+        processor.close()
+    assert error.value.chunk_index == 2
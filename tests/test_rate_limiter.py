@@ -0,0 +1,91 @@
+import pytest
+
+from rate_limiter import DAY_WINDOW, MINUTE_WINDOW, KeyRateLimiter, RateLimiterPool, RateLimitExceeded
+
+
+class _Clock:
+    def __init__(self, now=10_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_rpm_window_slides():
+    limiter = KeyRateLimiter(rpm=2, tpm=1_000_000, rpd=100)
+    limiter.record(1, 100.0)
+    limiter.record(1, 110.0)
+    assert limiter.wait_time(1, 120.0) == pytest.approx(100.0 + MINUTE_WINDOW - 120.0)
+    # Setelah request pertama keluar dari jendela 1 menit, key siap lagi
+    assert limiter.wait_time(1, 160.0) == 0
+
+
+def test_tpm_waits_until_enough_tokens_expire():
+    limiter = KeyRateLimiter(rpm=100, tpm=1000, rpd=100)
+    limiter.record(600, 100.0)
+    limiter.record(300, 130.0)
+    assert limiter.wait_time(100, 140.0) == 0
+    assert limiter.wait_time(200, 140.0) == pytest.approx(100.0 + MINUTE_WINDOW - 140.0)
+    assert limiter.wait_time(800, 140.0) == pytest.approx(130.0 + MINUTE_WINDOW - 140.0)
+
+
+def test_rpd_window_slides():
+    limiter = KeyRateLimiter(rpm=100, tpm=1_000_000, rpd=2)
+    limiter.record(1, 0.0)
+    limiter.record(1, 3600.0)
+    assert limiter.wait_time(1, 7200.0) == pytest.approx(DAY_WINDOW - 7200.0)
+    assert limiter.wait_time(1, DAY_WINDOW) == 0
+
+
+def test_block_until_only_extends():
+    limiter = KeyRateLimiter()
+    limiter.block_until(200.0)
+    limiter.block_until(150.0)
+    assert limiter.wait_time(1, 100.0) == 100.0
+    assert limiter.wait_time(1, 200.0) == 0
+
+
+def test_pool_picks_soonest_key_and_records_usage():
+    clock = _Clock()
+    pool = RateLimiterPool(2, max_in_flight_per_key=5, rpm=1, clock=clock)
+    assert pool.acquire(0) == 0
+    # Key pilihan (0) baru siap 60 detik lagi; key 1 siap sekarang
+    assert pool.acquire(0) == 1
+    assert pool.try_acquire_idle() is None
+
+    clock.now += MINUTE_WINDOW
+    assert pool.limiters[0].wait_time(0, clock.now) == 0
+
+
+def test_pool_prefers_requested_key_when_tied():
+    pool = RateLimiterPool(3, clock=_Clock())
+    assert pool.acquire(2) == 2
+
+
+def test_block_key_moves_requests_to_other_keys():
+    clock = _Clock()
+    pool = RateLimiterPool(2, max_in_flight_per_key=5, rpm=10, clock=clock)
+    pool.block_key(0, 30)
+    assert pool.acquire(0) == 1
+    assert pool.limiters[0].wait_time(0, clock.now) == 30
+
+
+def test_wait_longer_than_max_wait_raises():
+    clock = _Clock()
+    pool = RateLimiterPool(1, rpd=1, max_wait=60, clock=clock)
+    pool.acquire(0)
+    pool.release(0)
+    with pytest.raises(RateLimitExceeded):
+        pool.acquire(0)
+
+
+def test_seed_replaces_history():
+    clock = _Clock()
+    pool = RateLimiterPool(1, rpm=2, clock=clock)
+    pool.seed(0, [(clock.now - 10, 1), (clock.now - 5, 1)])
+    assert pool.limiters[0].wait_time(0, clock.now) == pytest.approx(MINUTE_WINDOW - 10)
+
+    pool.seed(0, [(clock.now - 5, 1)])
+    assert pool.limiters[0].wait_time(0, clock.now) == 0
+    pool.seed(0, [], blocked_until=clock.now + 20)
+    assert pool.limiters[0].wait_time(0, clock.now) == 20
@@ -0,0 +1,50 @@
+import httpx
+import pytest
+from google.genai.errors import APIError
+
+from retry_policy import (
+    FATAL, QUOTA, TRANSIENT, RetryExhausted, RetryPolicy, RetryState, classify_error, server_retry_delay
+)
+
+
+def _error(code, status, retry_delay=None):
+    details = [{'@type': 'type.googleapis.com/google.rpc.RetryInfo', 'retryDelay': retry_delay}] if retry_delay else []
+    return APIError(code, {'error': {'code': code, 'message': status, 'status': status, 'details': details}})
+
+
+def test_classify_error():
+    assert classify_error(_error(429, 'RESOURCE_EXHAUSTED')) == QUOTA
+    assert classify_error(_error(503, 'UNAVAILABLE')) == TRANSIENT
+    assert classify_error(_error(400, 'INVALID_ARGUMENT')) == FATAL
+    assert classify_error(httpx.ConnectTimeout('timeout')) == TRANSIENT
+
+
+def test_server_retry_delay_from_retry_info():
+    assert server_retry_delay(_error(503, 'UNAVAILABLE', '37s')) == 37.0
+    assert server_retry_delay(_error(503, 'UNAVAILABLE')) is None
+
+
+def test_backoff_never_undercuts_server_delay():
+    policy = RetryPolicy(base_delay=1.0, jitter=0.5)
+    error = _error(503, 'UNAVAILABLE', '30s')
+    delays = [policy.backoff(0, error) for _ in range(200)]
+    assert min(delays) >= 30.0
+    assert max(delays) <= 45.0
+
+
+def test_backoff_keeps_exponential_delay_above_short_server_delay():
+    policy = RetryPolicy(base_delay=10.0, max_delay=60.0, jitter=0.0)
+    assert policy.backoff(2, _error(503, 'UNAVAILABLE', '1s')) == 40.0
+
+
+def test_backoff_jitter_without_server_delay():
+    policy = RetryPolicy(base_delay=4.0, jitter=0.5)
+    delays = [policy.backoff(0) for _ in range(200)]
+    assert 2.0 <= min(delays) and max(delays) <= 6.0
+
+
+def test_retry_state_gives_up_after_max_attempts():
+    state = RetryState(RetryPolicy(max_attempts=2, base_delay=0.0), num_keys=1)
+    assert state.on_error(_error(503, 'UNAVAILABLE'), 0)[0] == TRANSIENT
+    with pytest.raises(RetryExhausted):
+        state.on_error(_error(503, 'UNAVAILABLE'), 0)
@@ -0,0 +1,65 @@
+from script_parser import parse_script, split_script_into_chunks
+
+SCRIPT = """
+START_SCRIPT
+[INSTRUKSI_SUARA: Ceria]
+[TEKS_SCRIPT]
+Halo semua. Selamat datang.
+[JEDA: 0,5 detik]
+Hari ini kita bahas kuota.
+---
+[INSTRUKSI_SUARA: Tenang]
+[TEKS_SCRIPT]
+Sampai jumpa.
+[JEDA: 1 detik]
+[JEDA: 2s]
+END_SCRIPT
+"""
+
+
+def test_parse_script_segments():
+    segments = parse_script(SCRIPT)
+    assert [(s.instruction, s.text, s.pause_after) for s in segments] == [
+        ('Ceria', 'Halo semua. Selamat datang.', 0.5),
+        ('Ceria', 'Hari ini kita bahas kuota.', 0.0),
+        ('Tenang', 'Sampai jumpa.', 3.0),
+    ]
+
+
+def test_single_chunk_keeps_instructions_and_drops_markers():
+    chunks = split_script_into_chunks(SCRIPT, 4800)
+    assert len(chunks) == 1
+    assert chunks[0].text == (
+        '[INSTRUKSI_SUARA: Ceria]\n[TEKS_SCRIPT]\nHalo semua. Selamat datang.\n\nHari ini kita bahas kuota.'
+        '\n\n[INSTRUKSI_SUARA: Tenang]\n[TEKS_SCRIPT]\nSampai jumpa.'
+    )
+    assert '[JEDA' not in chunks[0].text
+    assert chunks[0].pause_after == 3.0
+
+
+def test_pause_at_chunk_boundary_becomes_silence():
+    chunks = split_script_into_chunks(SCRIPT, 70)
+    assert [(chunk.text, chunk.pause_after) for chunk in chunks] == [
+        ('[INSTRUKSI_SUARA: Ceria]\n[TEKS_SCRIPT]\nHalo semua. Selamat datang.', 0.5),
+        ('[INSTRUKSI_SUARA: Ceria]\n[TEKS_SCRIPT]\nHari ini kita bahas kuota.', 0.0),
+        ('[INSTRUKSI_SUARA: Tenang]\n[TEKS_SCRIPT]\nSampai jumpa.', 3.0),
+    ]
+
+
+def test_oversized_sentence_is_split_with_header_repeated():
+    script = '[INSTRUKSI_SUARA: Datar]\n[TEKS_SCRIPT]\n' + ' '.join(['panjang'] * 40) + '.'
+    chunks = split_script_into_chunks(script, 100)
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert len(chunk.text) <= 100
+        assert chunk.text.startswith('[INSTRUKSI_SUARA: Datar]\n[TEKS_SCRIPT]\n')
+
+
+def test_token_limit_applies():
+    chunks = split_script_into_chunks('Kalimat satu. Kalimat dua. Kalimat tiga.', 4800, max_tokens_per_chunk=4)
+    assert len(chunks) > 1
+
+
+def test_plain_text_without_instruction():
+    chunks = split_script_into_chunks('Tanpa instruksi apa pun.', 4800)
+    assert [chunk.text for chunk in chunks] == ['Tanpa instruksi apa pun.']
@@ -0,0 +1,100 @@
+import http.client
+import json
+import os
+import socket
+import threading
+import time
+import wave
+
+import pytest
+
+import main
+import tts_server
+
+
+# Cukup lama agar dua job identik sempat berjalan bersamaan
+MOCK_LATENCY = 0.5
+
+
+@pytest.fixture
+def service(mock_api, tmp_path):
+    service = tts_server.SynthesisService(str(tmp_path), workers=2, rate_limit=False, base_delay=0).start()
+    server = tts_server.create_http_server(service, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield service, server.server_address[1]
+    server.shutdown()
+    server.server_close()
+    service.stop()
+
+
+def _request(port, method, path, body=None):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    conn.request(method, path, body=None if body is None else json.dumps(body))
+    response = conn.getresponse()
+    data = response.read()
+    conn.close()
+    return response.status, data
+
+
+def _wait_done(port, job_id, timeout=20.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status, data = _request(port, 'GET', f'/jobs/{job_id}')
+        job = json.loads(data)
+        if job['status'] not in (tts_server.STATUS_QUEUED, tts_server.STATUS_RUNNING):
+            return job
+        time.sleep(0.05)
+    raise TimeoutError(job_id)
+
+
+def test_job_is_synthesized_and_served(service, tmp_path):
+    _, port = service
+    status, data = _request(port, 'POST', '/jobs', {'id': 'ep01', 'text': 'Halo semua, apa kabar?', 'voice': 'Kore'})
+    assert status == 202
+    assert _wait_done(port, 'ep01')['status'] == tts_server.STATUS_DONE
+
+    status, audio = _request(port, 'GET', '/jobs/ep01/audio')
+    assert status == 200
+    path = tmp_path / 'downloaded.wav'
+    path.write_bytes(audio)
+    with wave.open(str(path)) as wav_file:
+        assert wav_file.getframerate() == 24000 and wav_file.getnframes() > 0
+
+
+def test_identical_jobs_share_one_upstream_call(service, mock_api):
+    _, port = service
+    text = 'Jangan lupa follow dan nyalakan notifikasi.'
+    for job_id in ('a', 'b'):
+        assert _request(port, 'POST', '/jobs', {'id': job_id, 'text': text, 'voice': 'Kore'})[0] == 202
+    assert _wait_done(port, 'a')['status'] == tts_server.STATUS_DONE
+    assert _wait_done(port, 'b')['status'] == tts_server.STATUS_DONE
+    assert mock_api.stats()['requests'] == 1
+
+
+@pytest.mark.parametrize('length', ['abc', '-5'])
+def test_bad_content_length_is_rejected(service, length):
+    _, port = service
+    with socket.create_connection(('127.0.0.1', port), timeout=5) as sock:
+        sock.sendall(f'POST /jobs HTTP/1.1\r\nHost: x\r\nContent-Length: {length}\r\n\r\n'.encode())
+        response = sock.recv(4096).decode()
+    assert response.startswith('HTTP/1.1 400')
+
+
+def test_invalid_job_is_rejected(service):
+    _, port = service
+    assert _request(port, 'POST', '/jobs', {'text': 'Halo', 'voice': 'Kore', 'format': 'xyz'})[0] == 400
+
+
+def test_finished_jobs_expire_with_their_output(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, 'API_KEYS_LIST', ['key-a'])
+    service = tts_server.SynthesisService(str(tmp_path), rate_limit=False, job_ttl=60)
+    old = tts_server.parse_job({'id': 'old', 'text': 'Halo', 'voice': 'Kore'}, str(tmp_path))
+    service.submit(old)
+    open(old.output, 'wb').close()
+    old.status, old.finished = tts_server.STATUS_DONE, time.time() - 61
+    queued = service.submit(tts_server.parse_job({'id': 'new', 'text': 'Halo', 'voice': 'Kore'}, str(tmp_path)))
+
+    assert service.get('old') is None
+    assert not os.path.exists(old.output)
+    assert service.jobs() == [queued]
@@ -0,0 +1,43 @@
+import json
+import os
+import wave
+
+import main
+import voice_sweep
+
+
+def test_writer_is_opened_only_for_variants_that_receive_audio(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, 'API_KEYS_LIST', ['key-a'])
+    monkeypatch.setattr(main, 'KEY_HEALTH', None)
+    monkeypatch.setattr(main, 'KEY_LEDGER', None)
+    monkeypatch.setattr(main, 'KEY_LEASES', None)
+    monkeypatch.setattr(main, 'AUDIO_CACHE', None)
+
+    def fake_request(prompt, voice, chunk_index, audio_sink, **kwargs):
+        if voice == 'Puck':
+            raise RuntimeError('suara ditolak')
+        audio_sink(chunk_index, b'\x01\x00' * 100)
+        return False
+
+    opened = []
+    create_post_processor = main.create_post_processor
+
+    def counting_post_processor(output_filename, *args, **kwargs):
+        opened.append(output_filename)
+        return create_post_processor(output_filename, *args, **kwargs)
+
+    monkeypatch.setattr(main, 'make_tts_request_with_retry', fake_request)
+    monkeypatch.setattr(main, 'create_post_processor', counting_post_processor)
+    report = voice_sweep.run_sweep(
+        'Kalimat satu. Kalimat dua.', ['Kore', 'Puck'], [0.7], str(tmp_path),
+        max_chars_per_chunk=15, rate_limit=False
+    )
+
+    kore = voice_sweep.sweep_output_path(str(tmp_path), 'Kore', 0.7)
+    puck = voice_sweep.sweep_output_path(str(tmp_path), 'Puck', 0.7)
+    assert opened == [kore]
+    assert [entry['status'] for entry in report['variants']] == ['done', 'failed']
+    with wave.open(kore, 'rb') as wf:
+        assert wf.getnframes() == 200
+    assert not os.path.exists(puck)
+    assert json.loads((tmp_path / voice_sweep.REPORT_FILENAME).read_text())['chunks'] == 2
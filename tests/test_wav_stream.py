@@ -0,0 +1,73 @@
+import wave
+
+import pytest
+
+from wav_stream import MissingChunkError, OrderedPcmWriter, OrderedWavWriter, SegmentedWavWriter
+
+
+def _read_frames(path):
+    with wave.open(str(path), 'rb') as wf:
+        return wf.readframes(wf.getnframes())
+
+
+def test_header_is_valid_after_every_chunk(tmp_path):
+    output = tmp_path / 'out.wav'
+    writer = OrderedWavWriter(str(output))
+    writer.write_chunk(1, b'\x01\x00' * 100)
+    # File yang masih ditulis sudah bisa dibaca dengan panjang yang benar
+    assert _read_frames(output) == b'\x01\x00' * 100
+    writer.write_chunk(2, b'\x02\x00' * 50)
+    assert _read_frames(output) == b'\x01\x00' * 100 + b'\x02\x00' * 50
+    writer.close()
+    assert _read_frames(output) == b'\x01\x00' * 100 + b'\x02\x00' * 50
+    assert writer.time_to_first_audio is not None
+
+
+def test_out_of_order_chunks_are_written_in_order(tmp_path):
+    output = tmp_path / 'out.wav'
+    with OrderedWavWriter(str(output)) as writer:
+        writer.write_chunk(3, b'\x03\x00')
+        writer.write_chunk(2, b'\x02\x00')
+        writer.write_chunk(1, b'\x01\x00')
+    assert _read_frames(output) == b'\x01\x00\x02\x00\x03\x00'
+
+
+def test_duplicate_chunk_is_rejected(tmp_path):
+    with OrderedWavWriter(str(tmp_path / 'out.wav')) as writer:
+        writer.write_chunk(1, b'\x01\x00')
+        with pytest.raises(ValueError):
+            writer.write_chunk(1, b'\x01\x00')
+
+
+def test_gap_stops_output_at_missing_chunk(tmp_path):
+    output = tmp_path / 'out.wav'
+    writer = OrderedWavWriter(str(output))
+    writer.write_chunk(1, b'\x01\x00')
+    writer.write_chunk(3, b'\x03\x00')
+    with pytest.raises(MissingChunkError) as error:
+        writer.close()
+    assert error.value.chunk_index == 2
+    # File tetap ditutup dengan header yang valid, berhenti di celah
+    assert _read_frames(output) == b'\x01\x00'
+
+
+def test_base_writer_is_abstract(tmp_path):
+    with pytest.raises(TypeError):
+        OrderedPcmWriter(str(tmp_path / 'out.pcm'))
+
+
+def test_odd_data_is_padded(tmp_path):
+    output = tmp_path / 'out.wav'
+    with OrderedWavWriter(str(output), sampwidth=1) as writer:
+        writer.write_chunk(1, b'\x80\x80\x80')
+    assert output.stat().st_size == 44 + 4
+
+
+def test_segmented_writer_playlist(tmp_path):
+    output = tmp_path / 'out.m3u'
+    with SegmentedWavWriter(str(output)) as writer:
+        writer.write_chunk(2, b'\x00\x00' * 12000)
+        assert output.read_text() == '#EXTM3U\n'
+        writer.write_chunk(1, b'\x00\x00' * 24000)
+    assert output.read_text() == '#EXTM3U\n#EXTINF:1.000,\nout_seg_001.wav\n#EXTINF:0.500,\nout_seg_002.wav\n'
+    assert len(_read_frames(tmp_path / 'out_seg_002.wav')) == 24000
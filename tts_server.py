@@ -0,0 +1,474 @@
+"""
+Layanan HTTP lokal untuk membuat narasi tanpa mengedit FULL_TEXT_PROMPT di main.py.
+
+Proses tetap hidup, sehingga pool API key, client Gemini (koneksi
+keep-alive), rate limiter dan cache audio dipakai bersama oleh semua job.
+Job masuk antrean berprioritas (`priority` lebih besar dikerjakan lebih
+dulu, lalu sesuai urutan masuk) dan maksimal `--workers` job berjalan
+bersamaan lewat satu pool key. Chunk identik dari job berbeda yang sedang
+diminta bersamaan hanya dikirim sekali ke API (lihat coalesce.py). Setiap
+job ditulis langsung ke file output-nya (mode pipeline).
+
+Endpoint:
+
+    POST   /jobs             {"text": "...", "voice": "Kore", "format": "wav", "priority": 0}
+    GET    /jobs             daftar job
+    GET    /jobs/<id>        status satu job
+    GET    /jobs/<id>/audio  file hasil (setelah status "done")
+    DELETE /jobs/<id>        membatalkan job yang masih antre
+    GET    /health           jumlah key, antrean, job dan chunk yang sedang berjalan
+    GET    /metrics          metrik format Prometheus
+
+Field job lain (opsional): `id`, `temperature`, `script_mode`. Untuk dialog,
+`voice` diisi suara per pembicara seperti di batch_runner.py.
+
+Penggunaan:
+
+    uv run tts_server.py --port 8080 --output-dir tts-jobs
+    curl -X POST localhost:8080/jobs -d '{"text": "Halo semua!", "voice": "Kore"}'
+
+Uji lokal tanpa kuota dengan server tiruan (key apa saja):
+
+    uv run benchmarks/mock_gemini.py --port 8765
+    uv run tts_server.py --base-url http://127.0.0.1:8765 --keys test-keys.txt
+"""
+import argparse
+import itertools
+import json
+import os
+import queue
+import re
+import threading
+import time
+import uuid
+import logging
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from google.genai import types
+
+import main
+from client_pool import ClientPool
+from rate_limiter import FREE_TIER_RPM, FREE_TIER_TPM
+from retry_policy import RetryPolicy
+from hedging import HedgePolicy
+
+logger = logging.getLogger(__name__)
+
+STATUS_QUEUED = 'queued'
+STATUS_RUNNING = 'running'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+STATUS_CANCELLED = 'cancelled'
+
+JOB_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+AUDIO_TYPES = {
+    'wav': 'audio/wav',
+    'mp3': 'audio/mpeg',
+    'opus': 'audio/ogg',
+    'm4a': 'audio/mp4',
+    'flac': 'audio/flac',
+}
+MAX_BODY_BYTES = 1024 * 1024
+# Job yang sudah selesai (beserta file output-nya) dihapus setelah sekian detik
+DEFAULT_JOB_TTL = 3600.0
+# Ukuran blok saat mengirim file audio
+SEND_BLOCK_BYTES = 256 * 1024
+
+
+@dataclass
+class SynthesisJob:
+    """Satu narasi di antrean layanan."""
+    id: str
+    text: str
+    voice: str | dict[str, str]
+    output: str
+    temperature: float = 0.7
+    script_mode: bool = False
+    priority: int = 0
+    status: str = STATUS_QUEUED
+    submitted: float = field(default_factory=time.time)
+    started: float | None = None
+    finished: float | None = None
+    error: str | None = None
+
+    def to_dict(self) -> dict:
+        return {
+            'id': self.id,
+            'status': self.status,
+            'priority': self.priority,
+            'voice': self.voice,
+            'temperature': self.temperature,
+            'format': os.path.splitext(self.output)[1].lstrip('.'),
+            'submitted': self.submitted,
+            'started': self.started,
+            'finished': self.finished,
+            'elapsed': round(self.finished - self.started, 3) if self.started and self.finished else None,
+            'error': self.error,
+        }
+
+
+def parse_job(payload: dict, output_dir: str) -> SynthesisJob:
+    """Membuat job dari body JSON `POST /jobs`. Field yang tidak valid menghasilkan ValueError."""
+    if not isinstance(payload, dict):
+        raise ValueError('Body harus berupa objek JSON.')
+    text = payload.get('text')
+    if not isinstance(text, str) or not text.strip():
+        raise ValueError('`text` wajib diisi.')
+    voice = payload.get('voice')
+    if not (isinstance(voice, str) and voice) and not (
+        isinstance(voice, dict) and voice and all(isinstance(v, str) for v in voice.values())
+    ):
+        raise ValueError('`voice` harus nama suara atau {pembicara: suara}.')
+    job_id = str(payload.get('id') or uuid.uuid4().hex[:12])
+    if not JOB_ID_PATTERN.match(job_id):
+        raise ValueError('`id` hanya boleh berisi huruf, angka, "-" dan "_" (maksimal 64 karakter).')
+    output_format = str(payload.get('format', 'wav')).lstrip('.').lower()
+    if output_format not in AUDIO_TYPES:
+        raise ValueError(f"`format` harus salah satu dari: {', '.join(AUDIO_TYPES)}.")
+    try:
+        temperature = float(payload.get('temperature', 0.7))
+        priority = int(payload.get('priority', 0))
+    except (TypeError, ValueError) as e:
+        raise ValueError(f'`temperature`/`priority` tidak valid: {e}') from e
+    return SynthesisJob(
+        id=job_id,
+        text=text,
+        voice=voice,
+        output=os.path.join(output_dir, f'{job_id}.{output_format}'),
+        temperature=temperature,
+        script_mode=bool(payload.get('script_mode', False)),
+        priority=priority
+    )
+
+
+class SynthesisService:
+    """
+    Antrean job berprioritas di atas `main.generate_audio_for_chunks`.
+
+    Semua job berbagi satu pool slot/rate limiter key dan client Gemini yang
+    sudah dibuat saat layanan dimulai; setiap job punya `RetryPolicy` sendiri
+    agar ringkasan waktu tunggu retry di log milik job itu saja. `workers`
+    menentukan berapa job yang boleh berjalan bersamaan; chunk dari job-job
+    itu tetap dibatasi kuota key yang sama.
+
+    Job yang sudah selesai, gagal atau dibatalkan dihapus beserta file
+    output-nya setelah `job_ttl` detik (None = disimpan selamanya), agar
+    proses yang hidup lama tidak terus menumpuk job dan file audio. Jika `hedge_after` diberikan
+    (persentil latensi, misal 0.95), chunk yang lambat dikirim juga ke key
+    lain yang menganggur (lihat hedging.py).
+    """
+
+    def __init__(
+        self,
+        output_dir: str,
+        workers: int = 2,
+        max_chars_per_chunk: int = 4800,
+        max_tokens_per_chunk: int | None = FREE_TIER_TPM // FREE_TIER_RPM,
+        max_retries: int = 5,
+        base_delay: int = 5,
+        max_in_flight_per_key: int = 1,
+        rate_limit: bool = True,
+        rate_limit_max_wait: float | None = None,
+        normalize_dbfs: float | None = None,
+        smooth_joins: bool = False,
+        hedge_after: float | None = None,
+        job_ttl: float | None = DEFAULT_JOB_TTL
+    ):
+        self.output_dir = output_dir
+        self.max_chars_per_chunk = max_chars_per_chunk
+        self.max_tokens_per_chunk = max_tokens_per_chunk
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.normalize_dbfs = normalize_dbfs
+        self.smooth_joins = smooth_joins
+        self.key_slots = main.create_key_slots(max_in_flight_per_key, rate_limit, rate_limit_max_wait)
+        self.job_ttl = job_ttl
+        self.hedge = HedgePolicy(hedge_after) if hedge_after else None
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._queue = queue.PriorityQueue()
+        self._order = itertools.count()
+        self._workers = [
+            threading.Thread(target=self._work, name=f'tts-job-{i}', daemon=True) for i in range(max(1, workers))
+        ]
+        os.makedirs(output_dir, exist_ok=True)
+
+    def start(self) -> 'SynthesisService':
+        # Client per key dibuat di depan, agar job pertama tidak menanggung biayanya
+        for api_key in main.API_KEYS_LIST:
+            if api_key:
+                main.CLIENT_POOL.get(api_key)
+        for worker in self._workers:
+            worker.start()
+        logger.info(f"🚀 Layanan TTS siap: {len(main.API_KEYS_LIST)} API Key, {len(self._workers)} job bersamaan.")
+        return self
+
+    def stop(self, wait: bool = True):
+        """Menghentikan worker setelah job yang sedang berjalan selesai; job yang masih antre tidak dikerjakan."""
+        for _ in self._workers:
+            self._queue.put((float('-inf'), next(self._order), None))
+        if wait:
+            for worker in self._workers:
+                worker.join()
+
+    def _evict_expired(self):
+        """Menghapus job selesai yang lebih tua dari `job_ttl` beserta file output-nya. Dipanggil dengan `_lock`."""
+        if self.job_ttl is None:
+            return
+        deadline = time.time() - self.job_ttl
+        expired = [
+            job for job in self._jobs.values()
+            if job.status in (STATUS_DONE, STATUS_FAILED, STATUS_CANCELLED) and job.finished is not None and job.finished < deadline
+        ]
+        for job in expired:
+            del self._jobs[job.id]
+            try:
+                os.remove(job.output)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"⚠️ File output job {job.id} gagal dihapus: {e}")
+        if expired:
+            logger.info(f"🧹 {len(expired)} job lama dihapus dari daftar (lebih dari {self.job_ttl:.0f} detik).")
+
+    def submit(self, job: SynthesisJob) -> SynthesisJob:
+        with self._lock:
+            self._evict_expired()
+            if job.id in self._jobs:
+                raise ValueError(f"Job '{job.id}' sudah ada.")
+            self._jobs[job.id] = job
+        self._queue.put((-job.priority, next(self._order), job.id))
+        logger.info(f"📥 Job {job.id} masuk antrean (prioritas {job.priority}).")
+        return job
+
+    def get(self, job_id: str) -> SynthesisJob | None:
+        with self._lock:
+            self._evict_expired()
+            return self._jobs.get(job_id)
+
+    def jobs(self) -> list[SynthesisJob]:
+        with self._lock:
+            self._evict_expired()
+            return list(self._jobs.values())
+
+    def cancel(self, job_id: str) -> bool:
+        """Membatalkan job yang belum mulai. Mengembalikan False jika job sudah berjalan atau selesai."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status != STATUS_QUEUED:
+                return False
+            job.status = STATUS_CANCELLED
+            job.finished = time.time()
+        logger.info(f"🚫 Job {job_id} dibatalkan.")
+        return True
+
+    def health(self) -> dict:
+        with self._lock:
+            self._evict_expired()
+            statuses = [job.status for job in self._jobs.values()]
+        return {
+            'keys': len(main.API_KEYS_LIST),
+            'queued': statuses.count(STATUS_QUEUED),
+            'running': statuses.count(STATUS_RUNNING),
+            'done': statuses.count(STATUS_DONE),
+            'failed': statuses.count(STATUS_FAILED),
+            'in_flight_chunks': len(main.IN_FLIGHT),
+            'remaining_daily_requests': main.remaining_daily_requests(),
+        }
+
+    def _work(self):
+        while True:
+            _, _, job_id = self._queue.get()
+            if job_id is None:
+                return
+            with self._lock:
+                job = self._jobs[job_id]
+                if job.status != STATUS_QUEUED:
+                    continue
+                job.status = STATUS_RUNNING
+                job.started = time.time()
+            self._run(job)
+
+    def _run(self, job: SynthesisJob):
+        logger.info(f"▶️ Job {job.id} mulai diproses.")
+        error = None
+        try:
+            main.generate_audio_for_chunks(
+                full_prompt=job.text,
+                voice=job.voice,
+                base_filename=os.path.splitext(job.output)[0],
+                max_chars_per_chunk=self.max_chars_per_chunk,
+                max_retries=self.max_retries,
+                base_delay=self.base_delay,
+                temperature=job.temperature,
+                concurrent=True,
+                output_filename=job.output,
+                script_mode=job.script_mode,
+                max_tokens_per_chunk=self.max_tokens_per_chunk,
+                retry_policy=RetryPolicy(max_attempts=self.max_retries, base_delay=self.base_delay),
+                normalize_dbfs=self.normalize_dbfs,
+                smooth_joins=self.smooth_joins,
+                key_slots=self.key_slots,
+                hedge=self.hedge
+            )
+        except Exception as e:
+            error = e
+        with self._lock:
+            job.finished = time.time()
+            job.status = STATUS_FAILED if error is not None else STATUS_DONE
+            job.error = None if error is None else str(error)
+        if error is None:
+            logger.info(f"✅ Job {job.id} selesai dalam {job.finished - job.started:.1f} detik: {job.output}")
+        else:
+            logger.error(f"❌ Job {job.id} gagal: {error}")
+
+
+def create_http_server(service: SynthesisService, host: str = '127.0.0.1', port: int = 8080) -> ThreadingHTTPServer:
+    """Server HTTP untuk `service` (belum dijalankan; panggil `serve_forever`)."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def _send_json(self, status: int, body):
+            data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _send_error(self, status: int, message: str):
+            self._send_json(status, {'error': message})
+
+        def _parts(self) -> list[str]:
+            return [part for part in self.path.split('?')[0].split('/') if part]
+
+        def do_POST(self):
+            if self._parts() != ['jobs']:
+                return self._send_error(404, f'Tidak ditemukan: {self.path}')
+            try:
+                length = int(self.headers.get('Content-Length', 0))
+            except ValueError:
+                length = -1
+            if length < 0 or length > MAX_BODY_BYTES:
+                # Body tidak dibaca, jadi koneksi tidak bisa dipakai ulang
+                self.close_connection = True
+            if length < 0:
+                return self._send_error(400, 'Header Content-Length tidak valid.')
+            if length > MAX_BODY_BYTES:
+                return self._send_error(413, f'Body maksimal {MAX_BODY_BYTES} byte.')
+            try:
+                job = service.submit(parse_job(json.loads(self.rfile.read(length) or b'{}'), service.output_dir))
+            except ValueError as e:
+                return self._send_error(400, str(e))
+            self._send_json(202, job.to_dict())
+
+        def do_GET(self):
+            parts = self._parts()
+            if parts == ['health']:
+                return self._send_json(200, service.health())
+            if parts == ['metrics']:
+                data = main.METRICS.to_prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+                return
+            if parts == ['jobs']:
+                return self._send_json(200, [job.to_dict() for job in service.jobs()])
+            if len(parts) in (2, 3) and parts[0] == 'jobs' and parts[2:] in ([], ['audio']):
+                job = service.get(parts[1])
+                if job is None:
+                    return self._send_error(404, f"Job '{parts[1]}' tidak ditemukan.")
+                if len(parts) == 2:
+                    return self._send_json(200, job.to_dict())
+                if job.status != STATUS_DONE:
+                    return self._send_error(409, f"Job '{job.id}' belum selesai (status: {job.status}).")
+                return self._send_file(job.output)
+            self._send_error(404, f'Tidak ditemukan: {self.path}')
+
+        def do_DELETE(self):
+            parts = self._parts()
+            if len(parts) != 2 or parts[0] != 'jobs':
+                return self._send_error(404, f'Tidak ditemukan: {self.path}')
+            if service.get(parts[1]) is None:
+                return self._send_error(404, f"Job '{parts[1]}' tidak ditemukan.")
+            if not service.cancel(parts[1]):
+                return self._send_error(409, f"Job '{parts[1]}' sudah berjalan atau selesai.")
+            self._send_json(200, service.get(parts[1]).to_dict())
+
+        def _send_file(self, path: str):
+            self.send_response(200)
+            self.send_header('Content-Type', AUDIO_TYPES.get(os.path.splitext(path)[1].lstrip('.'), 'application/octet-stream'))
+            self.send_header('Content-Length', str(os.path.getsize(path)))
+            self.end_headers()
+            with open(path, 'rb') as f:
+                while True:
+                    block = f.read(SEND_BLOCK_BYTES)
+                    if not block:
+                        break
+                    self.wfile.write(block)
+
+        def log_message(self, format, *args):
+            logger.debug(f"{self.address_string()} {format % args}")
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    return server
+
+
+def cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--output-dir', default='tts-jobs')
+    parser.add_argument('--workers', type=int, default=2, help='Jumlah job yang boleh berjalan bersamaan')
+    parser.add_argument('--keys', default='api-keys.txt')
+    parser.add_argument('--ledger', default='key-ledger.sqlite3')
+    parser.add_argument('--leases', default=None, help='File lease bersama agar beberapa proses memakai key yang berbeda (lihat key_lease.py)')
+    parser.add_argument('--cache-dir', default='.tts-cache')
+    parser.add_argument('--cache-max-mb', type=int, default=512)
+    parser.add_argument('--max-chars', type=int, default=4800)
+    parser.add_argument('--max-in-flight-per-key', type=int, default=1)
+    parser.add_argument('--max-wait', type=float, default=90, help='Detik maksimal menunggu kuota sebelum chunk dianggap gagal')
+    parser.add_argument('--normalize-dbfs', type=float, default=None, help='Kenyaringan target tiap chunk (misal -20); default tanpa normalisasi')
+    parser.add_argument('--smooth-joins', action='store_true', help='Haluskan sambungan chunk (butuh NumPy)')
+    parser.add_argument('--hedge-after', type=float, default=None, help='Kirim hedge untuk chunk yang lebih lambat dari latensi persentil ini (misal 0.95); default tanpa hedging')
+    parser.add_argument('--job-ttl', type=float, default=DEFAULT_JOB_TTL, help='Detik sebelum job selesai dan file output-nya dihapus')
+    parser.add_argument('--base-url', default=None, help='Endpoint API lain, misal server tiruan benchmarks/mock_gemini.py')
+    args = parser.parse_args()
+
+    if args.base_url:
+        main.CLIENT_POOL = ClientPool(types.HttpOptions(base_url=args.base_url))
+    main.load_api_keys(args.keys, ledger_path=args.ledger)
+    if args.leases:
+        main.init_key_leases(args.leases)
+    main.init_audio_cache(args.cache_dir, args.cache_max_mb * 1024 * 1024)
+    service = SynthesisService(
+        args.output_dir,
+        workers=args.workers,
+        max_chars_per_chunk=args.max_chars,
+        max_in_flight_per_key=args.max_in_flight_per_key,
+        rate_limit_max_wait=args.max_wait,
+        normalize_dbfs=args.normalize_dbfs,
+        smooth_joins=args.smooth_joins,
+        hedge_after=args.hedge_after,
+        job_ttl=args.job_ttl
+    ).start()
+    server = create_http_server(service, args.host, args.port)
+    logger.info(f"🌐 Mendengarkan di http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop(wait=False)
+        main.close_key_leases()
+        main.CLIENT_POOL.close()
+
+
+if __name__ == '__main__':
+    cli()
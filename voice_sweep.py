@@ -0,0 +1,278 @@
+"""
+Merender satu script dengan beberapa suara dan temperature sekaligus (A/B).
+
+Teks hanya dibagi menjadi chunk sekali, lalu grid (chunk x suara x
+temperature) dijadwalkan lewat satu pool API key dan satu rate limiter yang
+sama. Chunk dikirim berselang-seling antar varian (chunk 1 semua suara, lalu
+chunk 2, ...) sehingga awal setiap varian sudah bisa didengar lebih dulu.
+Output disimpan per suara:
+
+    <output_dir>/<suara>/<nama>_t<temperature>.wav
+
+beserta laporan biaya/latensi seluruh grid di `<output_dir>/sweep-report.json`.
+
+Penggunaan:
+
+    uv run voice_sweep.py script.txt --voices Kore,Puck,Zephyr --temperatures 0.7,1.0 --script-mode
+"""
+import argparse
+import json
+import math
+import os
+import statistics
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+
+import main
+from metrics import REQUESTS, TOKENS_SENT
+from rate_limiter import FREE_TIER_RPM, FREE_TIER_TPM
+from retry_policy import RetryPolicy
+from post_process import PostProcessor
+
+logger = logging.getLogger(__name__)
+
+REPORT_FILENAME = 'sweep-report.json'
+# PCM dari API: 24kHz mono 16-bit
+BYTES_PER_SECOND = 24000 * 2
+
+
+@dataclass
+class SweepVariant:
+    """Satu kombinasi suara dan temperature di dalam grid."""
+    voice: str
+    temperature: float
+    output: str
+    total_chunks: int
+    pauses: dict = field(default_factory=dict)
+    normalize_dbfs: float | None = None
+    predicted_requests: int = 0
+    remaining: int = 0
+    from_cache: int = 0
+    audio_bytes: int = 0
+    started: float | None = None
+    finished: float | None = None
+    latencies: list[float] = field(default_factory=list)
+    error: Exception | None = None
+    writer: PostProcessor | None = None
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def write_chunk(self, chunk_index: int, pcm_data: bytes):
+        # Writer (file output, thread worker, encoder) baru dibuka saat chunk pertama varian ini datang
+        with self.lock:
+            self.audio_bytes += len(pcm_data)
+            if self.writer is None:
+                self.writer = main.create_post_processor(self.output, self.pauses, self.normalize_dbfs)
+        self.writer.submit(chunk_index, pcm_data)
+
+    def report(self) -> dict:
+        latencies = sorted(self.latencies)
+        return {
+            'voice': self.voice,
+            'temperature': self.temperature,
+            'output': self.output,
+            'status': 'failed' if self.error is not None else 'done',
+            'chunks': self.total_chunks,
+            'from_cache': self.from_cache,
+            'predicted_requests': self.predicted_requests,
+            'audio_seconds': round(self.audio_bytes / BYTES_PER_SECOND, 2),
+            'elapsed': round(self.finished - self.started, 3) if self.started and self.finished else None,
+            'chunk_latency_mean': round(statistics.mean(latencies), 3) if latencies else None,
+            'chunk_latency_p95': round(latencies[min(len(latencies) - 1, math.ceil(len(latencies) * 0.95) - 1)], 3) if latencies else None,
+            'error': None if self.error is None else str(self.error),
+        }
+
+
+def sweep_output_path(output_dir: str, voice: str, temperature: float, name: str = 'sweep', extension: str = '.wav') -> str:
+    """Lokasi file output satu varian: satu folder per suara."""
+    return os.path.join(output_dir, voice, f"{name}_t{temperature:g}{extension}")
+
+
+def run_sweep(
+    full_prompt: str,
+    voices: list[str],
+    temperatures: list[float],
+    output_dir: str,
+    name: str = 'sweep',
+    extension: str = '.wav',
+    script_mode: bool = False,
+    max_chars_per_chunk: int = 4800,
+    max_tokens_per_chunk: int | None = FREE_TIER_TPM // FREE_TIER_RPM,
+    max_retries: int = 5,
+    base_delay: int = 5,
+    max_in_flight_per_key: int = 1,
+    rate_limit: bool = True,
+    rate_limit_max_wait: float | None = None,
+    retry_policy: RetryPolicy | None = None,
+    normalize_dbfs: float | None = None
+) -> dict:
+    """
+    Merender `full_prompt` untuk setiap kombinasi `voices` x `temperatures`.
+    Varian yang gagal tidak menghentikan varian lain. Mengembalikan laporan
+    grid (juga disimpan ke `<output_dir>/sweep-report.json`).
+    """
+    # Chunking sekali untuk semua varian, tanpa panggilan API
+    with main.METRICS.stage('split'):
+        text_chunks, pauses = main.prepare_chunks(full_prompt, max_chars_per_chunk, max_tokens_per_chunk, script_mode)
+    if not text_chunks:
+        raise ValueError('Teks kosong.')
+
+    key_slots = main.create_key_slots(max_in_flight_per_key, rate_limit, rate_limit_max_wait)
+    retry_policy = retry_policy or RetryPolicy(max_attempts=max_retries, base_delay=base_delay)
+    # Metrik global dipakai bersama job lain, jadi yang dilaporkan selisihnya
+    requests_before = main.METRICS.counter_total(REQUESTS)
+    tokens_before = main.METRICS.counter_total(TOKENS_SENT)
+
+    variants = []
+    for voice in voices:
+        os.makedirs(os.path.join(output_dir, voice), exist_ok=True)
+        for temperature in temperatures:
+            output = sweep_output_path(output_dir, voice, temperature, name, extension)
+            variant = SweepVariant(
+                voice, temperature, output, len(text_chunks), pauses, normalize_dbfs, remaining=len(text_chunks)
+            )
+            variant.predicted_requests = main.predict_request_count(text_chunks, voice, temperature)
+            variants.append(variant)
+
+    predicted = sum(variant.predicted_requests for variant in variants)
+    logger.info(
+        f"📋 Rencana sweep: {len(text_chunks)} chunk x {len(variants)} varian "
+        f"({len(voices)} suara, {len(temperatures)} temperature), perkiraan {predicted} request ke API."
+    )
+
+    # Berselang-seling per chunk agar semua varian maju bersamaan
+    tasks = [(variant, chunk_index, chunk) for chunk_index, chunk in enumerate(text_chunks, start=1) for variant in variants]
+    num_keys = key_slots.num_keys
+    max_workers = max(1, min(len(tasks), num_keys * key_slots.max_in_flight_per_key))
+    started = time.time()
+
+    def render(variant: SweepVariant, chunk_index: int, chunk: str, task_number: int) -> bool:
+        chunk_started = time.time()
+        with variant.lock:
+            variant.started = variant.started or chunk_started
+        from_cache = main.make_tts_request_with_retry(
+            prompt=chunk,
+            voice=variant.voice,
+            base_filename=variant.output,
+            chunk_index=chunk_index,
+            max_retries=max_retries,
+            base_delay=base_delay,
+            temperature=variant.temperature,
+            key_slots=key_slots,
+            preferred_key_index=task_number % num_keys,
+            audio_sink=variant.write_chunk,
+            retry_policy=retry_policy
+        )
+        with variant.lock:
+            variant.latencies.append(time.time() - chunk_started)
+        return from_cache
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='sweep') as executor:
+        futures = {
+            executor.submit(render, variant, chunk_index, chunk, task_number): variant
+            for task_number, (variant, chunk_index, chunk) in enumerate(tasks)
+        }
+        for future in as_completed(futures):
+            variant = futures[future]
+            error = future.exception()
+            if error is not None:
+                variant.error = variant.error or error
+            elif future.result():
+                variant.from_cache += 1
+            variant.remaining -= 1
+            if variant.remaining == 0:
+                _finish(variant)
+
+    retry_policy.report()
+    if main.KEY_HEALTH is not None:
+        main.KEY_HEALTH.report()
+
+    report = {
+        'chunks': len(text_chunks),
+        'variants': [variant.report() for variant in variants],
+        'predicted_requests': predicted,
+        'requests': main.METRICS.counter_total(REQUESTS) - requests_before,
+        'tokens_sent': main.METRICS.counter_total(TOKENS_SENT) - tokens_before,
+        'retry_wait_seconds': round(retry_policy.total_waited(), 1),
+        'elapsed': round(time.time() - started, 3),
+    }
+    report_path = os.path.join(output_dir, REPORT_FILENAME)
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    _log_report(report)
+    logger.info(f"📄 Laporan sweep disimpan ke: {report_path}")
+    return report
+
+
+def _finish(variant: SweepVariant):
+    if variant.writer is not None:
+        try:
+            variant.writer.close()
+        except Exception as e:
+            variant.error = variant.error or e
+    variant.finished = time.time()
+    if variant.error is None:
+        logger.info(f"✅ Varian {variant.voice} (t={variant.temperature:g}) selesai: {variant.output}")
+    else:
+        logger.error(f"❌ Varian {variant.voice} (t={variant.temperature:g}) gagal: {variant.error}")
+
+
+def _log_report(report: dict):
+    for entry in report['variants']:
+        logger.info(
+            f"🎙️ {entry['voice']:<16} t={entry['temperature']:<4g} {entry['status']:<6} "
+            f"audio {entry['audio_seconds']:.1f} dtk | waktu {entry['elapsed'] or 0:.1f} dtk | "
+            f"latensi chunk rata-rata {entry['chunk_latency_mean'] or 0:.2f} dtk | cache {entry['from_cache']}/{entry['chunks']}"
+        )
+    logger.info(
+        f"📊 Grid: {len(report['variants'])} varian x {report['chunks']} chunk, {report['requests']:g} request "
+        f"(perkiraan {report['predicted_requests']}), ~{report['tokens_sent']:g} token, {report['elapsed']:.1f} detik."
+    )
+
+
+def cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('script', help='File teks/script yang dirender')
+    parser.add_argument('--voices', required=True, help='Daftar suara dipisah koma (lihat README)')
+    parser.add_argument('--temperatures', default='0.7', help='Daftar temperature dipisah koma')
+    parser.add_argument('--output-dir', default='sweep')
+    parser.add_argument('--name', default=None, help='Nama dasar file output (default: nama file script)')
+    parser.add_argument('--format', default='wav', help='Format output: wav, mp3, opus, m4a, flac')
+    parser.add_argument('--script-mode', action='store_true', help='Script memakai format [INSTRUKSI_SUARA]/[TEKS_SCRIPT]/[JEDA]')
+    parser.add_argument('--keys', default='api-keys.txt')
+    parser.add_argument('--ledger', default='key-ledger.sqlite3')
+    parser.add_argument('--cache-dir', default='.tts-cache')
+    parser.add_argument('--cache-max-mb', type=int, default=512)
+    parser.add_argument('--max-chars', type=int, default=4800)
+    parser.add_argument('--max-in-flight-per-key', type=int, default=1)
+    parser.add_argument('--max-wait', type=float, default=90, help='Detik maksimal menunggu kuota sebelum chunk dianggap gagal')
+    parser.add_argument('--normalize-dbfs', type=float, default=None, help='Kenyaringan target tiap chunk (misal -20); default tanpa normalisasi')
+    args = parser.parse_args()
+
+    with open(args.script, 'r', encoding='utf-8') as f:
+        full_prompt = f.read()
+    voices = [voice.strip() for voice in args.voices.split(',') if voice.strip()]
+    temperatures = [float(value) for value in args.temperatures.split(',') if value.strip()]
+
+    main.load_api_keys(args.keys, ledger_path=args.ledger)
+    main.init_audio_cache(args.cache_dir, args.cache_max_mb * 1024 * 1024)
+    report = run_sweep(
+        full_prompt,
+        voices,
+        temperatures,
+        args.output_dir,
+        name=args.name or os.path.splitext(os.path.basename(args.script))[0],
+        extension=f".{args.format.lstrip('.')}",
+        script_mode=args.script_mode,
+        max_chars_per_chunk=args.max_chars,
+        max_in_flight_per_key=args.max_in_flight_per_key,
+        rate_limit_max_wait=args.max_wait,
+        normalize_dbfs=args.normalize_dbfs
+    )
+    raise SystemExit(1 if any(entry['status'] == 'failed' for entry in report['variants']) else 0)
+
+
+if __name__ == '__main__':
+    cli()
@@ -0,0 +1,262 @@
+import os
+import struct
+import threading
+import time
+import wave
+import logging
+from abc import ABC, abstractmethod
+
+logger = logging.getLogger(__name__)
+
+# Jumlah frame yang dibaca per blok (~2.7 detik audio 24kHz)
+BLOCK_FRAMES = 64 * 1024
+# Ukuran header WAV PCM standar (RIFF + fmt + awal chunk data)
+WAV_HEADER_SIZE = 44
+# Ekstensi output yang ditulis sebagai segmen WAV + playlist
+PLAYLIST_EXTENSIONS = ('.m3u', '.m3u8')
+
+
+def silence_pcm(seconds: float, nchannels: int = 1, sampwidth: int = 2, framerate: int = 24000) -> bytes:
+    """PCM hening sepanjang `seconds` detik, dibuat lokal tanpa request ke API."""
+    return b'\x00' * (int(round(seconds * framerate)) * nchannels * sampwidth)
+
+
+def wav_header(data_bytes: int, nchannels: int = 1, sampwidth: int = 2, framerate: int = 24000) -> bytes:
+    """Header WAV PCM 44 byte untuk `data_bytes` byte audio."""
+    block_align = nchannels * sampwidth
+    return struct.pack(
+        '<4sI4s4sIHHIIHH4sI',
+        b'RIFF', WAV_HEADER_SIZE - 8 + data_bytes, b'WAVE',
+        b'fmt ', 16, 1, nchannels, framerate, framerate * block_align, block_align, sampwidth * 8,
+        b'data', data_bytes
+    )
+
+
+def wav_params(file_list: list[str]) -> tuple[tuple[int, int, int], int]:
+    """
+    Membaca header semua file WAV. Mengembalikan (channel, sample width,
+    sample rate) yang sama untuk semua file dan jumlah frame totalnya.
+    """
+    if not file_list:
+        raise ValueError('Tidak ada file WAV untuk digabungkan.')
+
+    params = None
+    total_frames = 0
+    for file_path in file_list:
+        with wave.open(file_path, 'rb') as wf:
+            file_params = (wf.getnchannels(), wf.getsampwidth(), wf.getframerate())
+            if params is None:
+                params = file_params
+            elif file_params != params:
+                raise ValueError(f"Format '{file_path}' {file_params} berbeda dengan chunk pertama {params}.")
+            total_frames += wf.getnframes()
+    return params, total_frames
+
+
+def iter_wav_blocks(file_list: list[str], block_frames: int = BLOCK_FRAMES):
+    """Menghasilkan PCM semua file WAV berurutan, blok demi blok (memori konstan)."""
+    for file_path in file_list:
+        logger.info(f"⏳ Menggabungkan: {file_path}")
+        with wave.open(file_path, 'rb') as wf:
+            while True:
+                block = wf.readframes(block_frames)
+                if not block:
+                    break
+                yield block
+
+
+def concat_wav_files(file_list: list[str], output_filename: str, block_frames: int = BLOCK_FRAMES) -> int:
+    """
+    Menggabungkan file WAV PCM secara streaming, blok demi blok, ke satu file output.
+
+    Memori yang dipakai konstan (satu blok) berapa pun panjang narasinya, dan
+    tidak butuh FFmpeg. Jumlah frame total dihitung dulu dari header setiap
+    file sehingga header output langsung benar dan tidak perlu ditulis ulang.
+    Semua file harus memiliki format yang sama (channel, sample width, sample rate).
+
+    Returns:
+        Jumlah frame audio yang ditulis.
+    """
+    (nchannels, sampwidth, framerate), total_frames = wav_params(file_list)
+    with wave.open(output_filename, 'wb') as out:
+        out.setnchannels(nchannels)
+        out.setsampwidth(sampwidth)
+        out.setframerate(framerate)
+        out.setnframes(total_frames)
+        for block in iter_wav_blocks(file_list, block_frames):
+            out.writeframesraw(block)
+
+    return total_frames
+
+
+class MissingChunkError(Exception):
+    """Output ditutup padahal ada chunk yang tidak pernah diterima; isinya terpotong di chunk itu."""
+
+    def __init__(self, chunk_index: int, output_filename: str):
+        super().__init__(f'Chunk {chunk_index} tidak pernah diterima; {output_filename} tidak lengkap.')
+        self.chunk_index = chunk_index
+        self.output_filename = output_filename
+
+
+class OrderedPcmWriter(ABC):
+    """
+    Dasar penulis PCM chunk sesuai urutan chunk.
+
+    Chunk boleh datang tidak berurutan (mode konkuren): chunk yang datang
+    lebih awal disimpan sementara di memori sampai semua chunk sebelumnya
+    tertulis. Subclass menentukan ke mana PCM ditulis (`_write_pcm`) dan
+    cara menutupnya (`_finish`).
+
+    Jika saat ditutup masih ada chunk yang tertahan karena chunk sebelumnya
+    tidak pernah datang, output ditutup seperti biasa (isinya berhenti di
+    celah itu) lalu `MissingChunkError` dilempar.
+    """
+
+    def __init__(self, output_filename: str, first_chunk_index: int = 1):
+        self.output_filename = output_filename
+        self._next_index = first_chunk_index
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._opened = time.monotonic()
+        self.time_to_first_audio = None
+
+    @abstractmethod
+    def _write_pcm(self, pcm_data: bytes):
+        """Menulis PCM satu chunk yang sudah gilirannya."""
+
+    @abstractmethod
+    def _finish(self):
+        """Menutup output setelah chunk terakhir."""
+
+    def write_chunk(self, chunk_index: int, pcm_data: bytes):
+        """Menerima PCM satu chunk; ditulis segera jika gilirannya, atau ditahan dulu."""
+        with self._lock:
+            if chunk_index < self._next_index or chunk_index in self._pending:
+                raise ValueError(f'Chunk {chunk_index} sudah pernah ditulis.')
+            self._pending[chunk_index] = pcm_data
+            while self._next_index in self._pending:
+                self._write_pcm(self._pending.pop(self._next_index))
+                logger.debug(f"Chunk {self._next_index} ditulis ke {self.output_filename}")
+                self._next_index += 1
+                if self.time_to_first_audio is None:
+                    self.time_to_first_audio = time.monotonic() - self._opened
+                    logger.info(f"🔊 Audio pertama sudah bisa diputar setelah {self.time_to_first_audio:.1f} detik: {self.output_filename}")
+
+    def close(self):
+        """Menutup output; `MissingChunkError` jika ada chunk yang tertahan karena celah."""
+        with self._lock:
+            missing = self._next_index if self._pending else None
+            if missing is not None:
+                logger.error(
+                    f"❌ Chunk {missing} tidak pernah diterima; "
+                    f"{len(self._pending)} chunk setelahnya tidak ditulis ke {self.output_filename}."
+                )
+                self._pending.clear()
+            self._finish()
+        if missing is not None:
+            raise MissingChunkError(missing, self.output_filename)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class OrderedWavWriter(OrderedPcmWriter):
+    """
+    Menulis PCM dari setiap chunk langsung ke satu file WAV final sesuai
+    urutan chunk (lihat `OrderedPcmWriter`). Tidak ada file chunk perantara.
+
+    Header ditulis ulang setelah setiap chunk (atau paling sering setiap
+    `header_interval` detik), jadi file yang masih bertambah selalu valid dan
+    sudah bisa diputar (atau disalin) sejak chunk pertama selesai; header
+    final ditulis saat `close()`.
+    """
+
+    def __init__(
+        self,
+        output_filename: str,
+        first_chunk_index: int = 1,
+        nchannels: int = 1,
+        sampwidth: int = 2,
+        framerate: int = 24000,
+        header_interval: float = 0.0
+    ):
+        super().__init__(output_filename, first_chunk_index)
+        self._format = (nchannels, sampwidth, framerate)
+        self._header_interval = header_interval
+        self._header_written = None
+        self._data_bytes = 0
+        self._f = open(output_filename, 'wb')
+        self._f.write(wav_header(0, *self._format))
+
+    def _update_header(self):
+        self._f.seek(0)
+        self._f.write(wav_header(self._data_bytes, *self._format))
+        self._f.seek(0, os.SEEK_END)
+        self._f.flush()
+        self._header_written = time.monotonic()
+
+    def _write_pcm(self, pcm_data: bytes):
+        self._f.write(pcm_data)
+        self._data_bytes += len(pcm_data)
+        if self._header_written is None or time.monotonic() - self._header_written >= self._header_interval:
+            self._update_header()
+
+    def _finish(self):
+        # Chunk data WAV harus berukuran genap
+        if self._data_bytes % 2:
+            self._f.write(b'\x00')
+        self._update_header()
+        self._f.close()
+
+
+class SegmentedWavWriter(OrderedPcmWriter):
+    """
+    Menulis setiap chunk (sesuai urutan) sebagai file WAV segmen tersendiri
+    (`<nama>_seg_001.wav`, ...) di samping playlist M3U `output_filename`.
+    Playlist diganti secara atomik setiap kali satu segmen selesai, jadi
+    pemutar yang membuka playlist langsung bisa memutar segmen yang sudah ada.
+    """
+
+    def __init__(
+        self,
+        output_filename: str,
+        first_chunk_index: int = 1,
+        nchannels: int = 1,
+        sampwidth: int = 2,
+        framerate: int = 24000
+    ):
+        super().__init__(output_filename, first_chunk_index)
+        self._format = (nchannels, sampwidth, framerate)
+        self._base = os.path.splitext(output_filename)[0]
+        self._entries = []
+        self._write_playlist()
+
+    def segment_path(self, number: int) -> str:
+        return f"{self._base}_seg_{number:03d}.wav"
+
+    def _write_playlist(self):
+        tmp_path = f"{self.output_filename}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write('#EXTM3U\n')
+            for duration, file_name in self._entries:
+                f.write(f'#EXTINF:{duration:.3f},\n{file_name}\n')
+        os.replace(tmp_path, self.output_filename)
+
+    def _write_pcm(self, pcm_data: bytes):
+        if not pcm_data:
+            return
+        nchannels, sampwidth, framerate = self._format
+        segment = self.segment_path(len(self._entries) + 1)
+        with wave.open(segment, 'wb') as wf:
+            wf.setnchannels(nchannels)
+            wf.setsampwidth(sampwidth)
+            wf.setframerate(framerate)
+            wf.writeframes(pcm_data)
+        self._entries.append((len(pcm_data) / (nchannels * sampwidth * framerate), os.path.basename(segment)))
+        self._write_playlist()
+
+    def _finish(self):
+        logger.info(f"📃 Playlist {self.output_filename}: {len(self._entries)} segmen.")